@@ -1,26 +1,43 @@
 import asyncio
 import os 
 import json
-import fitz  # PyMuPDF
+import time
+import uuid
 from datetime import datetime
 from typing import AsyncIterable, Optional
 
 from dotenv import load_dotenv
 from google.adk.runners import Runner  
-from google.adk.sessions import DatabaseSessionService
 from google.adk.agents.run_config import RunConfig
 from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect
 from google.adk.agents.live_request_queue import LiveRequestQueue
 from google.adk.events.event import Event
+from google.adk.sessions import Session
 from google.genai import types
 
 from pathlib import Path
 from manager.agent import root_agent
+from manager.tools import metrics
+from manager.tools.pdf_extraction import (
+    ExtractionQueueFull,
+    ExtractionTimeout,
+    PdfExtractionStage,
+)
+from manager.tools.report_cache import document_id_for, record_upload, report_cache
+from manager.tools.document_compactor import compact_pages, describe_deferred
+from manager.tools.chunked_upload import UploadError, UploadRegistry
+from manager.tools.session_store import create_session_service
+from manager.tools.write_behind import with_write_behind
+from manager.tools.session_compaction import run_compaction_forever
+from manager.tools.provider_index import get_provider_index
 
 load_dotenv()
 
-db_url = "sqlite:///./my_agent_data.db"
-session_service = DatabaseSessionService(db_url=db_url)
+# SESSION_BACKEND / SESSION_DB_URL pick the store (see session_store.py);
+# event writes are batched on top of it (see write_behind.py)
+session_service = with_write_behind(create_session_service())
+pdf_extraction_stage = PdfExtractionStage()
+upload_registry = UploadRegistry(pdf_extraction_stage)
 
 # Track pending binary messages
 class BinaryMessageTracker:
@@ -35,16 +52,15 @@ class BinaryMessageTracker:
         self.pending_metadata = None
         return metadata
 
-async def start_agent_session(email_id, is_audio=False):
-    """Starts an agent session"""
-    APP_NAME = "HealthManagerAgent"
-    initial_state = {"user_id": email_id}
-    session = await session_service.create_session(
-        app_name=APP_NAME, user_id=email_id, state=initial_state
-    )
-    runner = Runner(
-        agent=root_agent, app_name=APP_NAME, session_service=session_service
-    )
+APP_NAME = "HealthManagerAgent"
+
+# Built once per worker process and shared by every connection
+runner = Runner(
+    agent=root_agent, app_name=APP_NAME, session_service=session_service
+)
+
+def build_run_config(is_audio: bool) -> RunConfig:
+    """Run config for a text or audio connection"""
     modality = "AUDIO" if is_audio else "TEXT"
     speech_config = types.SpeechConfig(
         language_code="hi-IN",
@@ -55,17 +71,58 @@ async def start_agent_session(email_id, is_audio=False):
     config = {"response_modalities": [modality], "speech_config": speech_config}
     if is_audio:
         config["output_audio_transcription"] = {}
-    run_config = RunConfig(**config)
-    live_request_queue = LiveRequestQueue()
-    live_events = runner.run_live(
-        session=session, live_request_queue=live_request_queue, run_config=run_config
+        # run_live sets this for multi-agent graphs anyway; preset it so the
+        # shared config is never mutated per connection
+        config["input_audio_transcription"] = {}
+    return RunConfig(**config)
+
+RUN_CONFIGS = {True: build_run_config(True), False: build_run_config(False)}
+
+async def get_or_create_session(email_id):
+    """Resumes the user's most recent session, or creates one"""
+    existing = await session_service.list_sessions(app_name=APP_NAME, user_id=email_id)
+    if existing.sessions:
+        latest = max(existing.sessions, key=lambda s: s.last_update_time)
+        session = await session_service.get_session(
+            app_name=APP_NAME, user_id=email_id, session_id=latest.id
+        )
+        if session:
+            metrics.incr("session.resumed")
+            return session
+    initial_state = {"user_id": email_id}
+    metrics.incr("session.created")
+    return await session_service.create_session(
+        app_name=APP_NAME, user_id=email_id, state=initial_state
     )
-    return live_events, live_request_queue
+
+async def start_agent_session(email_id, is_audio=False):
+    """Starts an agent session"""
+    with metrics.timer("session.setup_ms"):
+        session = await get_or_create_session(email_id)
+        if hasattr(session_service, "attach"):
+            session_service.attach(session)
+        live_request_queue = LiveRequestQueue()
+        live_events = runner.run_live(
+            session=session,
+            live_request_queue=live_request_queue,
+            run_config=RUN_CONFIGS[is_audio],
+        )
+    return live_events, live_request_queue, session
     
 async def agent_to_client_messaging(
-    websocket: WebSocket, live_events: AsyncIterable[Event]
+    websocket: WebSocket, live_events: AsyncIterable[Event], connected_at: float
 ):
     """Agent to client communication"""
+    first_token_sent = False
+
+    def record_first_token():
+        nonlocal first_token_sent
+        if not first_token_sent:
+            first_token_sent = True
+            metrics.observe(
+                "session.connect_to_first_token_ms", (time.perf_counter() - connected_at) * 1000
+            )
+
     while True:
         try:
             async for event in live_events:
@@ -87,6 +144,7 @@ async def agent_to_client_messaging(
                         "type": "text", "mime_type": "text/plain", "data": part.text, "role": "model"
                     }
                     await websocket.send_text(json.dumps(message))
+                    record_first_token()
                     print(f"[AGENT TO CLIENT]: text/plain: {part.text}")
                 is_audio = (
                     part.inline_data
@@ -99,6 +157,7 @@ async def agent_to_client_messaging(
                         metadata = {"type": "binary", "mime_type": "audio/pcm", "role": "model"}
                         await websocket.send_text(json.dumps(metadata))
                         await websocket.send_bytes(audio_data)
+                        record_first_token()
                         print(f"[AGENT TO CLIENT]: audio/pcm: {len(audio_data)} bytes.")
         except WebSocketDisconnect:
             print("Client disconnected from agent_to_client_messaging")
@@ -107,10 +166,108 @@ async def agent_to_client_messaging(
             print(f"Error in agent_to_client_messaging: {e}")
             break
 
-async def client_to_agent_messaging(
-    websocket: WebSocket, live_request_queue: LiveRequestQueue
+def send_text_to_agent(live_request_queue: LiveRequestQueue, text: str, role: str):
+    """Queues a text turn for the agent"""
+    content = types.Content(role=role, parts=[types.Part(text=text)])
+    live_request_queue.send_content(content=content)
+
+async def send_pdf_to_agent(
+    websocket: WebSocket,
+    live_request_queue: LiveRequestQueue,
+    binary_data: bytes,
+    filename: str,
+    role: str,
+    session: Session,
+    known_pages: Optional[list] = None,
+):
+    """Extracts an uploaded PDF off the event loop and forwards its text to the agent"""
+    print(f"[CLIENT TO AGENT]: Received PDF '{filename}'. Extracting text...")
+    try:
+        document_id = await asyncio.to_thread(document_id_for, binary_data)
+        # Lets this session's tools read and save this document id, and only this session's
+        await record_upload(session_service, session, document_id, filename)
+        cached = await asyncio.to_thread(report_cache.get, document_id)
+        lab_report = cached and cached.get("lab_report")
+        if lab_report:
+            # Same file was analysed before: skip both extraction and model re-extraction
+            print(f"[CLIENT TO AGENT]: Report cache hit for '{filename}' ({document_id}).")
+        elif cached and cached.get("pages"):
+            pages = cached["pages"]
+        else:
+            extraction = await pdf_extraction_stage.extract(binary_data, known_pages)
+            pages = extraction["pages"]
+            lab_report = extraction["lab_report"]
+            await asyncio.to_thread(report_cache.put_pages, document_id, pages)
+            if lab_report:
+                await asyncio.to_thread(report_cache.put_lab_report, document_id, lab_report)
+    except ExtractionQueueFull:
+        print(f"PDF extraction queue full, rejecting '{filename}'")
+        error_message = f"I'm processing a lot of documents right now. Please upload '{filename}' again in a moment."
+    except ExtractionTimeout:
+        print(f"Timed out extracting PDF file '{filename}'")
+        error_message = f"Sorry, reading the file '{filename}' took too long. Please try a smaller file."
+    except Exception as pdf_error:
+        print(f"Error processing PDF file '{filename}': {pdf_error}")
+        error_message = f"Sorry, I was unable to read the file '{filename}'. It might be corrupted or in an unsupported format."
+    else:
+        if lab_report:
+            # Compact structured JSON instead of the raw page text
+            context_prompt = (
+                f"The user has uploaded the file '{filename}' (document id: {document_id}). "
+                "It has already been extracted; here is its labReport JSON "
+                "(the `patient` object pre-fills personalInfo):\n\n"
+                f"{json.dumps(lab_report, separators=(',', ':'))}\n\n"
+                "Use it as-is, do not extract it again or call save_lab_report. "
+                "Acknowledge that you have received and understood this document. "
+                "Wait for the user's next question about it."
+            )
+        else:
+            # Boilerplate-free, token-budgeted text; the rest stays retrievable
+            compacted = await asyncio.to_thread(compact_pages, pages)
+            deferred_note = ""
+            if compacted["deferred"]:
+                deferred_note = (
+                    "These sections were left out to save space; call read_report_section "
+                    "with the document id and section number if they are needed:\n"
+                    f"{describe_deferred(compacted)}\n\n"
+                )
+            context_prompt = (
+                f"The user has uploaded the file '{filename}' (document id: {document_id}). "
+                f"Here is the text content from that file:\n\n---\n\n"
+                f"{compacted['text']}\n\n---\n\n"
+                f"{deferred_note}"
+                "Acknowledge that you have received and understood this document. "
+                "Wait for the user's next question about it."
+            )
+            print(
+                f"[CLIENT TO AGENT]: Compacted '{filename}' from {compacted['original_tokens']} "
+                f"to {compacted['compacted_tokens']} tokens ({len(compacted['deferred'])} sections deferred)."
+            )
+        send_text_to_agent(live_request_queue, context_prompt, role)
+        print(f"[CLIENT TO AGENT]: Sent {'labReport' if lab_report else 'extracted text'} from '{filename}' to the agent.")
+        return
+
+    message = {"type": "text", "mime_type": "text/plain", "data": error_message, "role": "model"}
+    try:
+        await websocket.send_text(json.dumps(message))
+    except Exception as send_error:
+        print(f"Could not report PDF error to client: {send_error}")
+
+def upload_error_reply(upload_id, error: UploadError) -> dict:
+    """Builds the upload_error message for a rejected upload step"""
+    reply = {"type": "upload_error", "upload_id": upload_id, "message": str(error)}
+    if error.next_chunk is not None:
+        reply["next_chunk"] = error.next_chunk
+    return reply
+
+async def receive_client_messages(
+    websocket: WebSocket,
+    live_request_queue: LiveRequestQueue,
+    user_id: str,
+    connection_id: str,
+    start_pdf_task,
 ):
-    """Client to agent communication"""
+    """Relays client messages to the agent until the client disconnects"""
     binary_tracker = BinaryMessageTracker()
     
     while True:
@@ -125,15 +282,46 @@ async def client_to_agent_messaging(
                     content = types.Content(role=role, parts=[types.Part(text=data)])
                     live_request_queue.send_content(content=content)
                     print(f"[CLIENT TO AGENT]: text: {data}")
-                elif parsed_message.get("type") == "binary":
+                elif parsed_message.get("type") in ("binary", "upload_chunk"):
                     binary_tracker.set_metadata(parsed_message)
-                    print(f"[CLIENT TO AGENT]: Binary metadata received: {parsed_message}")
+                    if parsed_message["type"] == "binary":
+                        print(f"[CLIENT TO AGENT]: Binary metadata received: {parsed_message}")
+                elif parsed_message.get("type") == "upload_start":
+                    try:
+                        upload = upload_registry.start(user_id, connection_id, parsed_message)
+                        reply = upload.ack()
+                        print(f"[CLIENT TO AGENT]: Upload '{upload.filename}' ({upload.total_size} bytes) at chunk {upload.next_chunk}")
+                    except UploadError as e:
+                        reply = upload_error_reply(parsed_message.get("upload_id"), e)
+                    await websocket.send_text(json.dumps(reply))
+                elif parsed_message.get("type") == "upload_finalize":
+                    upload_id = parsed_message.get("upload_id")
+                    try:
+                        upload = upload_registry.get(user_id, upload_id)
+                        pdf_bytes, known_pages = upload_registry.finish(upload)
+                    except UploadError as e:
+                        reply = upload_error_reply(upload_id, e)
+                    else:
+                        reply = upload.ack(complete=True)
+                        print(f"[CLIENT TO AGENT]: Upload '{upload.filename}' complete, {len(known_pages)} pages already extracted")
+                        start_pdf_task(pdf_bytes, upload.filename, upload.role, known_pages, upload)
+                    await websocket.send_text(json.dumps(reply))
 
             elif message.get("bytes"):
                 binary_data = message["bytes"]
                 metadata = binary_tracker.get_and_clear_metadata()
                 
-                if metadata:
+                if metadata and metadata.get("type") == "upload_chunk":
+                    upload_id = metadata.get("upload_id")
+                    try:
+                        upload = upload_registry.get(user_id, upload_id)
+                        upload_registry.add_chunk(upload, metadata.get("index"), binary_data)
+                        reply = upload.ack()
+                    except UploadError as e:
+                        reply = upload_error_reply(upload_id, e)
+                    await websocket.send_text(json.dumps(reply))
+
+                elif metadata:
                     mime_type = metadata["mime_type"]
                     role = metadata.get("role", "user")
                     
@@ -145,31 +333,7 @@ async def client_to_agent_messaging(
 
                     elif mime_type == "application/pdf":
                         filename = metadata.get("filename", "uploaded.pdf")
-                        print(f"[CLIENT TO AGENT]: Received PDF '{filename}'. Extracting text...")
-                        
-                        try:
-                            pdf_document = fitz.open(stream=binary_data, filetype="pdf")
-                            extracted_text = "".join(page.get_text() for page in pdf_document)
-                            pdf_document.close()
-
-                            context_prompt = (
-                                f"The user has uploaded the file '{filename}'. "
-                                f"Here is the full text content from that file:\n\n---\n\n"
-                                f"{extracted_text}\n\n---\n\n"
-                                "Acknowledge that you have received and understood this document. "
-                                "Wait for the user's next question about it."
-                            )
-                            text_part = types.Part(text=context_prompt)
-                            content = types.Content(role=role, parts=[text_part])
-                            live_request_queue.send_content(content=content)
-                            print(f"[CLIENT TO AGENT]: Sent extracted text from '{filename}' to the agent.")
-                        
-                        except Exception as pdf_error:
-                            print(f"Error processing PDF file '{filename}': {pdf_error}")
-                            error_message = f"Sorry, I was unable to read the file '{filename}'. It might be corrupted or in an unsupported format."
-                            error_part = types.Part(text=error_message)
-                            error_content = types.Content(role="model", parts=[error_part])
-                            # In a real app, send this error back to the client via a custom message
+                        start_pdf_task(binary_data, filename, role)
                     else:
                         print(f"[CLIENT TO AGENT]: Unsupported binary mime type: {mime_type}")
                 else:
@@ -183,8 +347,62 @@ async def client_to_agent_messaging(
             import traceback
             traceback.print_exc()
             break
-    
+
+async def client_to_agent_messaging(
+    websocket: WebSocket, live_request_queue: LiveRequestQueue, user_id: str, session: Session
+):
+    """Client to agent communication; cleans up the connection's uploads when it ends"""
+    upload_tasks = set()
+    connection_id = uuid.uuid4().hex
+
+    def start_pdf_task(binary_data, filename, role, known_pages=None, upload=None):
+        # Extraction runs as its own task so audio keeps flowing meanwhile
+        upload_task = asyncio.create_task(
+            send_pdf_to_agent(
+                websocket, live_request_queue, binary_data, filename, role, session, known_pages
+            )
+        )
+        upload_tasks.add(upload_task)
+        upload_task.add_done_callback(upload_tasks.discard)
+        if upload is not None:
+            # A finalized chunked upload stays reserved until its file is extracted
+            upload_task.add_done_callback(lambda _: upload_registry.release(upload))
+
+    try:
+        await receive_client_messages(
+            websocket, live_request_queue, user_id, connection_id, start_pdf_task
+        )
+    finally:
+        # Pending extractions belong to this connection only
+        for upload_task in upload_tasks:
+            upload_task.cancel()
+        # Partial chunked uploads stay resumable for a while
+        upload_registry.detach(connection_id)
+
 app = FastAPI()
+background_tasks = set()
+
+@app.on_event("startup")
+async def start_background_jobs():
+    """Starts periodic maintenance jobs"""
+    if os.getenv("SESSION_COMPACTION_ENABLED", "true").lower() == "true":
+        background_tasks.add(asyncio.create_task(run_compaction_forever()))
+    # Loading up to a million providers takes a while: not on the event loop
+    background_tasks.add(asyncio.create_task(asyncio.to_thread(get_provider_index)))
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    """Stops background worker pools"""
+    for task in background_tasks:
+        task.cancel()
+    pdf_extraction_stage.shutdown()
+    if hasattr(session_service, "close"):
+        await session_service.close()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Per-worker counters, gauges and latency summaries"""
+    return metrics.snapshot()
 
 @app.websocket("/ws/{session_id}")
 async def websocket_endpoint(
@@ -195,17 +413,19 @@ async def websocket_endpoint(
     """Client websocket endpoint"""
     print("Waiting for client connection...")
     await websocket.accept()
+    connected_at = time.perf_counter()
     print(f"Client #{session_id} connected, audio mode: {is_audio}")
+    session = None
     try:
-        live_events, live_request_queue = await start_agent_session(
+        live_events, live_request_queue, session = await start_agent_session(
             session_id, is_audio == "true"
         )
         print(f"Session started for client #{session_id}")
         agent_to_client_task = asyncio.create_task(
-            agent_to_client_messaging(websocket, live_events)
+            agent_to_client_messaging(websocket, live_events, connected_at)
         )
         client_to_agent_task = asyncio.create_task(
-            client_to_agent_messaging(websocket, live_request_queue)
+            client_to_agent_messaging(websocket, live_request_queue, session_id, session)
         )
         done, pending = await asyncio.wait(
             [agent_to_client_task, client_to_agent_task],
@@ -222,4 +442,7 @@ async def websocket_endpoint(
     except Exception as e:
         print(f"Error in websocket_endpoint for client #{session_id}: {e}")
     finally:
-        print(f"Cleaning up connection for client #{session_id}")
\ No newline at end of file
+        print(f"Cleaning up connection for client #{session_id}")
+        if session is not None and hasattr(session_service, "detach"):
+            # Persist whatever this connection still has queued
+            await session_service.detach(session)
\ No newline at end of file
@@ -7,6 +7,7 @@ from .sub_agents.dietary_agent.agent import dietary_agent
 from .sub_agents.lifestyle_agent.agent import lifestyle_agent
 from .sub_agents.goal_setter_agent.agent import goal_setter_agent
 from .sub_agents.explainatory_agent.agent import explainatory_agent
+from .tools.session_manager import get_session_info, update_session_state
 
 root_agent = Agent(
     name="manager",
@@ -43,6 +44,8 @@ root_agent = Agent(
     6. Call the respective sub-agent based on user input and store the required data in the session state.
     7. Based on the outputs, take regular feedbacks from the user and engage the appropriate sub-agent to optimize better outputs.
     8. Ensure that the session state is updated with all relevant information after each interaction.
+       Use `update_session_state` with only the paths that changed (e.g. {"selected_guidance": "dietary", "user_profile.location": "Pune"}),
+       and `get_session_info` to read values back (e.g. paths=["goals"]) instead of asking the user again.
 
     Session state must include:
         - phone_number
@@ -60,5 +63,5 @@ You can only communicate directly with the user based on the assigned flow. You
 
     """,
     sub_agents=[intake_agent,dietary_agent,lifestyle_agent,goal_setter_agent,explainatory_agent],
-    tools=[]
+    tools=[update_session_state, get_session_info]
 )
\ No newline at end of file
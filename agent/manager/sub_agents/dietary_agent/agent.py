@@ -1,7 +1,7 @@
 from google.adk.agents import Agent
 from google.adk.tools.agent_tool import AgentTool
 from google.genai import types
-from ...tools.pdf_creator import pdf_creator_tool
+from ...tools.pdf_creator import pdf_creator_tool, pdf_upload_status
 dietary_agent = Agent(
    name = "dietary_agent",
    model= "gemini-2.5-flash-preview-05-20",
@@ -61,7 +61,8 @@ dietary_agent = Agent(
 
       5. **If user approves**:  
          • Call `PdfCreatorTool.run(plan_summary=<guideline>, user_info=session_state)`  
-         • Save returned link to `session_state["dietary_pdf_link"]`  
+         • Call `pdf_upload_status(job_id=<returned job_id>)`; call it again while `upload` is "in_progress"  
+         • Save the `url` it returns to `session_state["dietary_pdf_link"]`  
          • Set `session_state["guideline_feedback"] = "approved"`  
          • Signal `dietary_plan_finalised` to ManagerAgent.
 
@@ -75,8 +76,10 @@ dietary_agent = Agent(
 
       ————————————————————————————————————————
       #### Required Tool
-      `PdfCreatorTool.run(plan_summary: str, user_info: Dict[str, Any]) -> str`  
-      Returns a public url for a user to access the pdf .
+      `PdfCreatorTool.run(plan_summary: str, user_info: Dict[str, Any]) -> dict`  
+      Returns {"job_id", ...}: the pdf is being uploaded.  
+      `pdf_upload_status(job_id: str) -> dict`  
+      Returns {"url", ...} once the upload is done: url is the link for a user to access the pdf. Only give the user this url. If it returns `pdf_base64` instead, the upload failed and that is the PDF itself; if it returns an error, tell the user the PDF could not be delivered.
 
       ————————————————————————————————————————
       #### Session Keys You May Write / Update
@@ -86,5 +89,5 @@ dietary_agent = Agent(
 
 Just return the PDF download link to the user, and return control to the **ManagerAgent**. (don't say that how may I help you further, just return the link and exit)
    """,
-   tools=[pdf_creator_tool]
+   tools=[pdf_creator_tool, pdf_upload_status]
 )
\ No newline at end of file
@@ -1,6 +1,7 @@
 from google.adk.agents import Agent
 from google.genai import types
-from ...tools.nearest_doctor_finder import nearest_doctor_finder
+from ...tools.nearest_doctor_finder import nearest_doctor_finder_async
+from ...tools.document_compactor import read_report_section
 
 explainatory_agent = Agent (
     name ="explainatory_agent",
@@ -11,6 +12,7 @@ explainatory_agent = Agent (
 
 When invoked by the user, your task is to:
 - Access the structured report data from `session_state.parsed_report` (or equivalent).
+- If the user asks about part of the uploaded report that was left out of the conversation, use `read_report_section` with the document id and section number from the upload message.
 - Ask the user if they want to know about a specific parameter or the entire report, and give the bulleted list of parameters available in the report.
 - If the user asks for a specific parameter, provide a detailed explanation of that parameter.
 - If the user asks for the entire report, summarize all key findings in a clear, concise manner.
@@ -59,5 +61,5 @@ Optionally:
 Tone: Clear, empathetic, non-alarming, and personalized. Your goal is to **educate and comfort** the user with clarity.
 
     """,
-    tools=[nearest_doctor_finder]
+    tools=[nearest_doctor_finder_async, read_report_section]
 )
\ No newline at end of file
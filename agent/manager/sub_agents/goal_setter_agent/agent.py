@@ -1,6 +1,13 @@
 from google.adk.agents import Agent
 from google.genai import types
-from ...tools.calendar import create_event,delete_event,edit_event,list_events
+# Async variants: Calendar requests run off the event loop that relays audio
+from ...tools.calendar import (
+    apply_calendar_changes_async as apply_calendar_changes,
+    create_event_async as create_event,
+    delete_event_async as delete_event,
+    edit_event_async as edit_event,
+    list_events_async as list_events,
+)
 from datetime import datetime
 goal_setter_agent = Agent (
     name ="goal_setter_agent",
@@ -12,6 +19,8 @@ goal_setter_agent = Agent (
     Current date and time is {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}.
 Once aligned:
 - Schedule relevant activities, screenings, or tasks using the provided calendar tools: `create_event`, `delete_event`, `edit_event`, `list_events`.
+- When a plan needs more than one calendar change, make them all in a single `apply_calendar_changes` call instead of calling `create_event` / `edit_event` / `delete_event` once per event. For anything that repeats (daily walks, weekly weigh-ins, medication reminders), create ONE event with a `recurrence` rule such as `RRULE:FREQ=DAILY;COUNT=90` instead of one event per occurrence.
+- `list_events` shows each recurring series once, with its rule. To change or remove a single occurrence, list with `expand_recurring=True` to get that occurrence's ID and call `edit_event` / `delete_event` with it; to change or remove the whole series pass `scope="series"`.
 - Tie event dates to report timelines, follow-up needs, or recurring health goals.
 - Always explain the purpose of each goal and how the calendar plan supports it.
 - Ask the user if they want reminders, recurring plans, or want to change anything in the calendar.
@@ -19,5 +28,5 @@ Once aligned:
 Be supportive and use layman-friendly explanations. Keep everything personalized based on the goals retrieved from session state.
 
     """,
-    tools=[create_event,delete_event,edit_event,list_events]
+    tools=[apply_calendar_changes,create_event,delete_event,edit_event,list_events]
 )
\ No newline at end of file
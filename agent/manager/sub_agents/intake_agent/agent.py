@@ -1,6 +1,9 @@
 from google.adk.agents import Agent
 from google.adk.tools.agent_tool import AgentTool
 from google.genai import types
+from ...tools.report_cache import save_lab_report
+from ...tools.document_compactor import read_report_section
+from ...tools.session_manager import get_session_info, update_session_state
 
 intake_agent = Agent(
     name="intake_agent",
@@ -117,6 +120,8 @@ instruction="""
 
 2️⃣  EXTRACT EVERYTHING YOU CAN  
 • extract the data from the PDF (no tool usage) and fill **two** JSON objects:  
+• If the upload message already contains a labReport JSON, use it as-is and skip extraction;
+  its `patient` object (name / age / gender) pre-fills personalInfo.
 
   a) **personalInfo**  
   ```json
@@ -185,6 +190,11 @@ json
   ]
 }
 '''
+• Right after extracting a new labReport, silently call `save_lab_report` with the
+  document id from the upload message and the labReport JSON.
+• If the upload message lists sections that were left out, call `read_report_section` for the
+  ones that may hold lab results before extracting.
+
 3️⃣ ASK ONLY WHAT’S MISSING
 • Don't ask the lifestyle and dietary questions yet.
 • Compare the partially filled personalInfo to its schema.
@@ -197,6 +207,9 @@ json
 • When all required fields are captured, summarise back:
 – Personal details (UPPERCASE for critical items, sentence case for the rest).
 – Confirm correctness / offer edits or skips.
+• Once confirmed, silently call `update_session_state` with just the confirmed fields as paths,
+  e.g. {"user_profile.height": 172, "user_profile.weight": 64, "user_profile.allergies": ["peanuts"]}.
+  Use `get_session_info` to check what is already stored before asking for it.
 
 5️⃣ SUMMARISE THE REPORT
 • Produce a short, layperson summary of key findings.
@@ -213,5 +226,6 @@ json
 • Do not mention “tools” or “parsing”; act as a seamless assistant.
 • Maintain user-friendly tone; be quick and precise.
 
-""" 
+""",
+tools=[save_lab_report, read_report_section, update_session_state, get_session_info]
 )
\ No newline at end of file
@@ -1,6 +1,6 @@
 from google.adk.agents import Agent
 from google.genai import types
-from ...tools.pdf_creator import pdf_creator_tool
+from ...tools.pdf_creator import pdf_creator_tool, pdf_upload_status
 lifestyle_agent = Agent(
     name= "lifestyle_agent",
     model= "gemini-2.5-flash-preview-05-20",
@@ -64,7 +64,8 @@ lifestyle_agent = Agent(
     Wait for user's response.
     6. If **approved**:  
     ◦ Call `PdfCreatorTool(plan_summary=<guideline>, user_info=session_state)`  
-    ◦ Save returned link to `session_state["lifestyle_pdf_link"]`  
+    ◦ Call `pdf_upload_status(job_id=<returned job_id>)`; call it again while `upload` is "in_progress". If it returns `pdf_base64` instead of a url, the upload failed and that is the PDF itself; if it returns an error, tell the user the PDF could not be delivered  
+    ◦ Save the `url` it returns to `session_state["lifestyle_pdf_link"]`  
     ◦ Set `session_state["guideline_feedback"] = "approved"`  
     ◦ Signal `lifestyle_plan_finalised` to ManagerAgent.  
     7. If **changes requested**:  
@@ -84,5 +85,5 @@ lifestyle_agent = Agent(
     • `session_state["guideline_feedback"]`
 
     """,
-    tools=[pdf_creator_tool],
+    tools=[pdf_creator_tool, pdf_upload_status],
 )
\ No newline at end of file
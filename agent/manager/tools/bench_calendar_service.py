@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the per-call overhead of getting a Calendar client.
+
+Compares the old behaviour of every calendar tool (read the token file,
+build the discovery client) with the cached get_calendar_service(), both
+single-threaded and from concurrent threads. Each call also prepares an
+events().list request, as the tools do, but nothing is sent: the token is
+a fake one written to a temp directory, so no network or account is needed.
+
+    python bench_calendar_service.py [--calls 200] [--threads 8]
+"""
+
+import sys
+from pathlib import Path
+
+# tools/calendar would shadow the standard library's calendar module
+TOOLS_DIR = Path(__file__).resolve().parent
+sys.path[:] = [p for p in sys.path if Path(p or ".").resolve() != TOOLS_DIR]
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import statistics  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+import types  # noqa: E402
+from concurrent.futures import ThreadPoolExecutor  # noqa: E402
+from datetime import datetime, timedelta  # noqa: E402
+
+from google.oauth2.credentials import Credentials  # noqa: E402
+from googleapiclient.discovery import build  # noqa: E402
+
+# Load the tools as a package without importing the agent graph
+sys.modules.setdefault("manager", types.ModuleType("manager")).__path__ = [str(TOOLS_DIR.parent)]
+from manager.tools import metrics  # noqa: E402
+from manager.tools.calendar import calendar_utils  # noqa: E402
+
+
+def write_fake_token(path: Path) -> None:
+    expiry = datetime.utcnow() + timedelta(hours=1)
+    path.write_text(json.dumps({
+        "token": "bench-access-token",
+        "refresh_token": "bench-refresh-token",
+        "client_id": "bench.apps.googleusercontent.com",
+        "client_secret": "bench-secret",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "scopes": calendar_utils.SCOPES,
+        "expiry": expiry.isoformat() + "Z",
+    }))
+
+
+def uncached_service():
+    """What get_calendar_service() did on every call before the cache."""
+    creds = Credentials.from_authorized_user_info(
+        json.loads(calendar_utils.TOKEN_PATH.read_text()), calendar_utils.SCOPES
+    )
+    return build("calendar", "v3", credentials=creds)
+
+
+def cached_service():
+    return calendar_utils.get_calendar_service()
+
+
+def one_call(get_service) -> float:
+    start = time.perf_counter()
+    service = get_service()
+    service.events().list(calendarId="primary", maxResults=100, singleEvents=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(get_service, calls: int, threads: int) -> dict:
+    start = time.perf_counter()
+    if threads == 1:
+        samples = [one_call(get_service) for _ in range(calls)]
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            samples = list(pool.map(lambda _: one_call(get_service), range(calls)))
+    elapsed = time.perf_counter() - start
+    ordered = sorted(samples)
+    return {
+        "p50_ms": statistics.median(ordered),
+        "p95_ms": ordered[int(0.95 * (len(ordered) - 1))],
+        "calls_per_s": calls / elapsed,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        calendar_utils.TOKEN_PATH = Path(tmp) / "calendar_token.json"
+        write_fake_token(calendar_utils.TOKEN_PATH)
+
+        print("📅 Calendar client overhead per tool call")
+        print("=" * 66)
+        print(f"{'variant':<22}{'threads':>8}{'p50 ms':>10}{'p95 ms':>10}{'calls/s':>12}")
+        for threads in (1, args.threads):
+            for name, get_service in (("rebuild every call", uncached_service), ("cached", cached_service)):
+                calendar_utils.reset_calendar_service()
+                result = run(get_service, args.calls, threads)
+                print(
+                    f"{name:<22}{threads:>8}{result['p50_ms']:>10.3f}"
+                    f"{result['p95_ms']:>10.3f}{result['calls_per_s']:>12.0f}"
+                )
+        builds = metrics.snapshot()["counters"].get("calendar.service_builds", 0)
+        print(f"\nClients built by the cached variant: {int(builds)} (one per run)")
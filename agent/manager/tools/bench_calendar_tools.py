@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the calendar tools.
+
+Runs the tools against the in-process Calendar API stand-in
+(calendar/fake_calendar_api.py, CALENDAR_FAKE_API=true) with injected
+latency, errors and quota. Each simulated session goes through what a goal
+planning conversation does: list the week, create an event, list again,
+move it, delete it. Sessions run concurrently on one event loop through the
+async tool variants, as they do in the live agent. Reports p50/p95/p99 per
+tool, the error rate, and how many upstream API calls each tool call cost.
+
+    python bench_calendar_tools.py [--concurrency 1 8 32] [--rounds 3]
+        [--latency-ms 80] [--jitter-ms 40] [--error-rate 0] [--quota-per-min 0]
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# tools/calendar would shadow the standard library's calendar module
+TOOLS_DIR = Path(__file__).resolve().parent
+sys.path[:] = [p for p in sys.path if Path(p or ".").resolve() != TOOLS_DIR]
+
+# Configure the tools before they are imported
+os.environ["CALENDAR_FAKE_API"] = "true"
+os.environ.setdefault("CALENDAR_MIRROR_DB", str(Path(tempfile.mkdtemp()) / "calendar_mirror.db"))
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import contextlib  # noqa: E402
+import io  # noqa: E402
+import time  # noqa: E402
+import types  # noqa: E402
+from collections import defaultdict  # noqa: E402
+
+# Load the tools as a package without importing the agent graph
+sys.modules.setdefault("manager", types.ModuleType("manager")).__path__ = [str(TOOLS_DIR.parent)]
+from manager.tools import metrics  # noqa: E402
+from manager.tools.calendar import (  # noqa: E402
+    create_event_async,
+    delete_event_async,
+    edit_event_async,
+    list_events_async,
+)
+from manager.tools.calendar.fake_calendar_api import shared_fake_api  # noqa: E402
+
+
+def percentile(ordered: list, q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def timed(samples: dict, name: str, call) -> dict:
+    start = time.perf_counter()
+    result = await call
+    samples[name].append(((time.perf_counter() - start) * 1000, result.get("status") == "success"))
+    return result
+
+
+async def session(samples: dict, number: int, rounds: int) -> None:
+    """One conversation's calendar traffic."""
+    for i in range(rounds):
+        day = 1 + (number + i) % 28
+        await timed(samples, "list_events", list_events_async("2030-01-01", 30))
+        created = await timed(
+            samples,
+            "create_event",
+            create_event_async(f"Run {number}.{i}", f"2030-01-{day:02d} 07:00", f"2030-01-{day:02d} 07:45"),
+        )
+        await timed(samples, "list_events", list_events_async("2030-01-01", 30))
+        if created.get("status") != "success":
+            continue
+        await timed(
+            samples,
+            "edit_event",
+            edit_event_async(created["event_id"], "", f"2030-01-{day:02d} 18:00", f"2030-01-{day:02d} 18:45"),
+        )
+        await timed(samples, "delete_event", delete_event_async(created["event_id"], True))
+
+
+async def run_level(concurrency: int, rounds: int) -> dict:
+    samples: dict = defaultdict(list)
+    await asyncio.gather(*(session(samples, n, rounds) for n in range(concurrency)))
+    return samples
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--jitter-ms", type=float, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--quota-per-min", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = shared_fake_api()
+    fake.latency_ms = args.latency_ms
+    fake.jitter_ms = args.jitter_ms
+    fake.error_rate = args.error_rate
+    fake.quota_per_minute = args.quota_per_min
+
+    print("📅 Calendar tools under load")
+    print("=" * 78)
+    print(
+        f"fake API at {fake.root_url}: {args.latency_ms:.0f}+{args.jitter_ms:.0f} ms, "
+        f"error rate {args.error_rate:.1%}, quota {args.quota_per_min or 'unlimited'}/min"
+    )
+    for concurrency in args.concurrency:
+        fake.reset()
+        metrics.reset()
+        start = time.perf_counter()
+        # The tools log every call; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            samples = asyncio.run(run_level(concurrency, args.rounds))
+        elapsed = time.perf_counter() - start
+        calls = fake.stats()
+        tool_calls = sum(len(s) for s in samples.values())
+
+        print(f"\n{concurrency} concurrent sessions, {tool_calls} tool calls in {elapsed:.1f} s")
+        print(f"{'tool':<14}{'calls':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name in ("list_events", "create_event", "edit_event", "delete_event"):
+            if not samples[name]:
+                continue
+            ordered = sorted(ms for ms, _ in samples[name])
+            errors = sum(not ok for _, ok in samples[name])
+            print(
+                f"{name:<14}{len(ordered):>7}{errors / len(ordered):>8.1%}"
+                f"{percentile(ordered, 0.50):>10.1f}{percentile(ordered, 0.95):>10.1f}{percentile(ordered, 0.99):>10.1f}"
+            )
+        upstream = {k: v for k, v in calls.items() if "." in k}
+        print(
+            f"upstream: {calls.get('total', 0)} API calls "
+            f"({calls.get('total', 0) / max(tool_calls, 1):.2f} per tool call, "
+            f"client counted {metrics.snapshot()['counters'].get('calendar.api_calls', 0)}), "
+            f"{calls.get('errors', 0)} injected errors, {calls.get('quota_exceeded', 0)} over quota"
+        )
+        print("  " + ", ".join(f"{k} {v}" for k, v in sorted(upstream.items())))
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the deterministic lab-report parser.
+
+Generates a corpus of synthetic lab reports (several table layouts, with
+known ground truth), parses each one and reports parse speed and
+per-field accuracy. The generated layouts are the ones the parser was
+written for, so it also parses a few fixtures laid out like real reports,
+with cells it cannot read: each must either parse completely or fall
+back to raw text, never come back as a partial labReport.
+
+    python bench_lab_report_parser.py [--reports 200] [--seed 7]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from lab_report_parser import parse_lab_report_bytes  # noqa: E402
+
+# (category, parameter, unit, low, high, decimals)
+PANEL = [
+    ("COMPLETE BLOOD COUNT", "Hemoglobin", "g/dL", 13.0, 17.0, 1),
+    ("COMPLETE BLOOD COUNT", "Total Leukocyte Count", "10^3/µL", 4.0, 11.0, 1),
+    ("COMPLETE BLOOD COUNT", "Platelet Count", "10^3/µL", 150, 410, 0),
+    ("COMPLETE BLOOD COUNT", "Hematocrit", "%", 40.0, 50.0, 1),
+    ("COMPLETE BLOOD COUNT", "MCV", "fL", 83.0, 101.0, 1),
+    ("LIPID PROFILE", "Total Cholesterol", "mg/dL", 125, 200, 0),
+    ("LIPID PROFILE", "HDL Cholesterol", "mg/dL", 40, 60, 0),
+    ("LIPID PROFILE", "LDL Cholesterol", "mg/dL", 50, 100, 0),
+    ("LIPID PROFILE", "Triglycerides", "mg/dL", 50, 150, 0),
+    ("THYROID PROFILE", "TSH", "mIU/L", 0.4, 4.5, 2),
+    ("THYROID PROFILE", "Free T4", "ng/dL", 0.8, 1.8, 2),
+    ("KIDNEY FUNCTION TEST", "Creatinine", "mg/dL", 0.7, 1.3, 2),
+    ("KIDNEY FUNCTION TEST", "Blood Urea Nitrogen", "mg/dL", 7, 20, 0),
+    ("DIABETES", "Fasting Blood Sugar", "mg/dL", 70, 100, 0),
+    ("DIABETES", "HbA1c", "%", 4.0, 5.6, 1),
+]
+NAMES = ["Aarav Sharma", "Priya Nair", "Rohan Gupta", "Meera Iyer", "John Doe", "Ananya Das"]
+LABS = ["Emvo Diagnostics Lab", "City Pathology Labs", "Sunrise Diagnostics"]
+
+
+def make_case(rng: random.Random) -> dict:
+    tests = []
+    for category, parameter, unit, low, high, decimals in rng.sample(PANEL, rng.randint(6, len(PANEL))):
+        value = rng.uniform(low * 0.7, high * 1.3)
+        value_str = f"{value:.{decimals}f}"
+        number = float(value_str)
+        status = "Low" if number < low else "High" if number > high else "Normal"
+        interval = f"{low:.{decimals}f} - {high:.{decimals}f}"
+        tests.append({
+            "category": category.title(), "parameter": parameter, "value": value_str,
+            "unit": unit, "referenceInterval": interval, "status": status,
+        })
+    tests.sort(key=lambda t: [c for c, *_ in PANEL].index(t["category"].upper()))
+    return {
+        "lab": rng.choice(LABS),
+        "name": rng.choice(NAMES),
+        "age": f"{rng.randint(18, 80)} Years",
+        "gender": rng.choice(["Male", "Female"]),
+        "collectionDate": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025",
+        "reportingDate": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025",
+        "tests": tests,
+        "layout": rng.choice(["columns", "flag_column", "inline_flag", "plain_text"]),
+        "rows_per_page": rng.choice([12, 20, 40]),
+    }
+
+
+def render_case(case: dict) -> bytes:
+    """Draws the case as a PDF using one of four common table layouts."""
+    doc = fitz.open()
+    layout = case["layout"]
+    columns = {
+        "columns": [50, 230, 300, 380],
+        "flag_column": [50, 220, 280, 320, 400],
+        "inline_flag": [50, 230, 310, 390],
+        "plain_text": [50, 230, 300, 380],
+    }[layout]
+
+    def new_page():
+        page = doc.new_page()
+        page.insert_text((50, 50), case["lab"], fontsize=14)
+        page.insert_text((50, 70), "LABORATORY TEST REPORT", fontsize=12)
+        page.insert_text((50, 95), f"Patient Name : {case['name']}", fontsize=9)
+        page.insert_text((320, 95), f"Age/Sex : {case['age']} / {case['gender']}", fontsize=9)
+        page.insert_text((50, 110), f"Collected on : {case['collectionDate']} 08:30 AM", fontsize=9)
+        page.insert_text((320, 110), f"Reported on : {case['reportingDate']} 05:45 PM", fontsize=9)
+        header = ["Test Name", "Result", "Unit", "Reference Interval"]
+        if layout == "flag_column":
+            header = ["Test Name", "Result", "Flag", "Unit", "Reference Interval"]
+        for x, title in zip(columns, header):
+            page.insert_text((x, 135), title, fontsize=9)
+        return page, 155
+
+    page, y = new_page()
+    category = None
+    rows = 0
+    for test in case["tests"]:
+        if rows >= case["rows_per_page"] or y > 780:
+            page, y = new_page()
+            rows = 0
+        if test["category"] != category:
+            category = test["category"]
+            page.insert_text((50, y), category.upper(), fontsize=10)
+            y += 16
+        flag = {"High": "H", "Low": "L"}.get(test["status"], "")
+        if layout == "flag_column":
+            cells = [test["parameter"], test["value"], flag, test["unit"], test["referenceInterval"]]
+        elif layout == "inline_flag":
+            value = f"{test['value']} {flag}".strip()
+            cells = [test["parameter"], value, test["unit"], test["referenceInterval"]]
+        elif layout == "plain_text":
+            cells = [" ".join([test["parameter"], test["value"], flag, test["unit"], test["referenceInterval"]])]
+        else:
+            cells = [test["parameter"], test["value"], test["unit"], test["referenceInterval"]]
+        for x, text in zip(columns, cells):
+            if text:
+                page.insert_text((x, y), text, fontsize=9)
+        y += 14
+        rows += 1
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+# Hand-laid reports: rows of (x, text) cells, and the tests a complete parse finds
+HEADER = [
+    [(50, "Sunrise Diagnostics Lab")],
+    [(50, "Plot No. 12, Sector 18, Gurgaon 122015")],
+    [(50, "Patient Name : Meera Iyer"), (320, "Age/Sex : 41 Years / Female")],
+    [(50, "Collected on : 03/02/2025 08:10 AM"), (320, "Reported on : 03/02/2025 04:20 PM")],
+    [(50, "Test Name"), (230, "Result"), (300, "Unit"), (380, "Reference Interval")],
+]
+FIXTURES = [
+    {
+        # Lakh grouping: "1,50,000" is not a number to the parser
+        "name": "indian_digit_grouping",
+        "rows": HEADER + [
+            [(50, "HAEMATOLOGY")],
+            [(50, "Haemoglobin"), (230, "12.4"), (300, "g/dL"), (380, "13.0 - 17.0")],
+            [(50, "Total Leucocyte Count"), (230, "7,800"), (300, "/cumm"), (380, "4,000 - 11,000")],
+            [(50, "Platelet Count"), (230, "1,50,000"), (300, "/cumm"), (380, "1,50,000 - 4,10,000")],
+            [(50, "RBC Count"), (230, "4.52"), (300, "mill/cumm"), (380, "4.5 - 5.5")],
+            [(50, "PCV"), (230, "38.2"), (300, "%"), (380, "40 - 50")],
+        ],
+        "tests": ["Haemoglobin", "Total Leucocyte Count", "Platelet Count", "RBC Count", "PCV"],
+    },
+    {
+        # Flags printed against the value, and a row typed without column gaps or interval
+        "name": "glued_flags",
+        "rows": HEADER + [
+            [(50, "BIOCHEMISTRY")],
+            [(50, "Fasting Glucose"), (230, "132H"), (300, "mg/dL"), (380, "70 - 100")],
+            [(50, "Creatinine"), (230, "0.92"), (300, "mg/dL"), (380, "0.6 - 1.1")],
+            [(50, "Vitamin D (25-OH) 18.2 ng/mL")],
+            [(50, "Uric Acid"), (230, "5.1"), (300, "mg/dL"), (380, "2.4 - 6.0")],
+            [(50, "Calcium"), (230, "9.4"), (300, "mg/dL"), (380, "8.5 - 10.5")],
+        ],
+        "tests": ["Fasting Glucose", "Creatinine", "Vitamin D (25-OH)", "Uric Acid", "Calcium"],
+    },
+    {
+        # Readable throughout; numbers in the address, signature and footer are not results
+        "name": "clean_with_footer",
+        "rows": HEADER + [
+            [(50, "LIPID PROFILE")],
+            [(50, "Total Cholesterol"), (230, "212"), (300, "mg/dL"), (380, "125 - 200")],
+            [(50, "HDL Cholesterol"), (230, "48"), (300, "mg/dL"), (380, "40 - 60")],
+            [(50, "LDL Cholesterol"), (230, "131"), (300, "mg/dL"), (380, "50 - 100")],
+            [(50, "Triglycerides"), (230, "165"), (300, "mg/dL"), (380, "50 - 150")],
+            [(50, "Dr. R. Mehta MD (Pathology) Reg No 45213")],
+            [(50, "Page 1 of 1")],
+        ],
+        "tests": ["Total Cholesterol", "HDL Cholesterol", "LDL Cholesterol", "Triglycerides"],
+    },
+]
+
+
+def render_fixture(fixture: dict) -> bytes:
+    doc = fitz.open()
+    page = doc.new_page()
+    y = 50
+    for row in fixture["rows"]:
+        for x, text in row:
+            page.insert_text((x, y), text, fontsize=9)
+        y += 16
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def fixture_outcome(fixture: dict, parsed: dict) -> str:
+    """"complete", "fallback" (raw text is sent) or "partial" (tests would be lost)."""
+    if parsed is None:
+        return "fallback"
+    found = {test["parameter"] for group in parsed["testResults"] for test in group["tests"]}
+    return "complete" if found >= set(fixture["tests"]) else "partial"
+
+
+def score(case: dict, parsed: dict, totals: dict) -> None:
+    got = {}
+    for group in (parsed or {}).get("testResults", []):
+        for test in group["tests"]:
+            got[test["parameter"]] = dict(test, category=group["category"])
+    for expected in case["tests"]:
+        actual = got.get(expected["parameter"], {})
+        for field in ("parameter", "value", "unit", "referenceInterval", "status", "category"):
+            totals.setdefault(field, [0, 0])
+            totals[field][1] += 1
+            totals[field][0] += actual.get(field) == expected[field]
+    patient = (parsed or {}).get("patient", {})
+    for field, expected in (("name", case["name"]), ("age", case["age"]), ("gender", case["gender"])):
+        totals.setdefault(f"patient.{field}", [0, 0])
+        totals[f"patient.{field}"][1] += 1
+        totals[f"patient.{field}"][0] += patient.get(field) == expected
+    for field in ("collectionDate", "reportingDate"):
+        totals.setdefault(field, [0, 0])
+        totals[field][1] += 1
+        totals[field][0] += (parsed or {}).get(field) == case[field]
+    totals.setdefault("labName", [0, 0])
+    totals["labName"][1] += 1
+    totals["labName"][0] += (parsed or {}).get("labName") == case["lab"]
+
+
+def run_benchmark(reports: int = 200, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(reports):
+        case = make_case(rng)
+        corpus.append((case, render_case(case)))
+
+    timings = []
+    totals: dict = {}
+    failures = 0
+    for case, pdf_bytes in corpus:
+        start = time.perf_counter()
+        parsed = parse_lab_report_bytes(pdf_bytes)
+        timings.append((time.perf_counter() - start) * 1000)
+        failures += parsed is None
+        score(case, parsed, totals)
+
+    fixtures = {
+        fixture["name"]: fixture_outcome(fixture, parse_lab_report_bytes(render_fixture(fixture)))
+        for fixture in FIXTURES
+    }
+
+    timings.sort()
+    return {
+        "reports": reports,
+        "unparsed": failures,
+        "fixtures": fixtures,
+        "parse_ms_p50": round(statistics.median(timings), 3),
+        "parse_ms_p95": round(timings[int(0.95 * (len(timings) - 1))], 3),
+        "accuracy": {field: round(ok / total, 4) for field, (ok, total) in totals.items()},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reports", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    result = run_benchmark(args.reports, args.seed)
+    print("🧪 Lab report parser benchmark")
+    print("=" * 50)
+    print(f"Reports parsed : {result['reports']} ({result['unparsed']} fell back to raw text)")
+    print(f"Parse time     : p50 {result['parse_ms_p50']} ms, p95 {result['parse_ms_p95']} ms")
+    print("Field accuracy :")
+    for field, accuracy in result["accuracy"].items():
+        print(f"  {field:<20} {accuracy:.2%}")
+    print("Real layouts   :")
+    for name, outcome in result["fixtures"].items():
+        print(f"  {name:<22} {outcome}")
+    partial = [name for name, outcome in result["fixtures"].items() if outcome == "partial"]
+    if partial:
+        sys.exit(f"❌ Partial labReports would hide tests: {', '.join(partial)}")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the calendar date/time parser.
+
+Builds a corpus of date strings in the shapes the model emits in calendar
+tool calls (ISO, US dates, month names, 12-hour clocks, relative phrases),
+then compares the old nine-format strptime loop with parse_datetime():
+strings understood, agreement with the expected value and time per parse.
+Also times format_event_time() against the previous fromisoformat/strftime
+version on API-style dateTime values.
+
+    python bench_parse_datetime.py [--strings 20000] [--seed 7]
+"""
+
+import sys
+from pathlib import Path
+
+# tools/calendar would shadow the standard library's calendar module
+TOOLS_DIR = Path(__file__).resolve().parent
+sys.path[:] = [p for p in sys.path if Path(p or ".").resolve() != TOOLS_DIR]
+
+import argparse  # noqa: E402
+import random  # noqa: E402
+import time  # noqa: E402
+import types  # noqa: E402
+from datetime import datetime, timedelta  # noqa: E402
+
+# Load the tools as a package without importing the agent graph
+sys.modules.setdefault("manager", types.ModuleType("manager")).__path__ = [str(TOOLS_DIR.parent)]
+from manager.tools.calendar.calendar_utils import format_event_time, parse_datetime  # noqa: E402
+
+NOW = datetime(2026, 10, 18, 14, 30)
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+def old_parse_datetime(datetime_str):
+    """parse_datetime before the rewrite."""
+    formats = [
+        "%Y-%m-%d %H:%M",
+        "%Y-%m-%d %I:%M %p",
+        "%Y-%m-%d",
+        "%m/%d/%Y %H:%M",
+        "%m/%d/%Y %I:%M %p",
+        "%m/%d/%Y",
+        "%B %d, %Y %H:%M",
+        "%B %d, %Y %I:%M %p",
+        "%B %d, %Y",
+    ]
+    for fmt in formats:
+        try:
+            return datetime.strptime(datetime_str, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def old_format_event_time(event_time):
+    dt = datetime.fromisoformat(event_time["dateTime"].replace("Z", "+00:00"))
+    return dt.strftime("%Y-%m-%d %I:%M %p")
+
+
+def twelve_hour(dt: datetime) -> str:
+    return f"{dt.hour % 12 or 12}:{dt.minute:02d} {'AM' if dt.hour < 12 else 'PM'}"
+
+
+def make_case(rng: random.Random):
+    """Returns (string, expected datetime) in one of the model's usual shapes."""
+    dt = NOW + timedelta(days=rng.randint(0, 120), hours=rng.randint(-8, 8))
+    dt = dt.replace(minute=rng.choice([0, 15, 30, 45]), second=0, microsecond=0)
+    midnight = dt.replace(hour=0, minute=0)
+    shape = rng.randrange(14)
+    if shape == 0:
+        return dt.strftime("%Y-%m-%d %H:%M"), dt
+    if shape == 1:
+        return dt.strftime("%Y-%m-%dT%H:%M:%S"), dt
+    if shape == 2:
+        return f"{dt:%Y-%m-%d} {twelve_hour(dt)}", dt
+    if shape == 3:
+        return dt.strftime("%Y-%m-%d"), midnight
+    if shape == 4:
+        return f"{dt:%m/%d/%Y} {twelve_hour(dt)}", dt
+    if shape == 5:
+        return dt.strftime("%m/%d/%Y %H:%M"), dt
+    if shape == 6:
+        return f"{dt:%B} {dt.day}, {dt.year} {twelve_hour(dt)}", dt
+    if shape == 7:
+        return dt.strftime("%B %d, %Y"), midnight
+    if shape == 8:
+        return f"{dt:%b} {dt.day} at {twelve_hour(dt).replace(':00', '').replace(' ', '').lower()}", dt
+    if shape == 9:
+        return f"{dt.day} {dt:%B} {dt.year}, {dt:%H:%M}", dt
+    if shape == 10:
+        target = (NOW + timedelta(days=1)).replace(hour=dt.hour, minute=0, second=0, microsecond=0)
+        return f"tomorrow {twelve_hour(target).replace(':00', '').replace(' ', '').lower()}", target
+    if shape == 11:
+        weekday = rng.randrange(7)
+        ahead = (weekday - NOW.weekday()) % 7 or 7
+        target = (NOW + timedelta(days=ahead)).replace(hour=dt.hour, minute=dt.minute, second=0, microsecond=0)
+        return f"next {WEEKDAYS[weekday]} at {target:%H:%M}", target
+    if shape == 12:
+        hours = rng.randint(1, 6)
+        return f"in {hours} hours", (NOW + timedelta(hours=hours)).replace(second=0, microsecond=0)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S+05:30"), dt.replace(tzinfo=None)
+
+
+def run(parse, corpus) -> dict:
+    parsed = correct = 0
+    start = time.perf_counter()
+    results = [parse(text) for text, _ in corpus]
+    elapsed = time.perf_counter() - start
+    for result, (_, expected) in zip(results, corpus):
+        if result is not None:
+            parsed += 1
+            correct += result.replace(tzinfo=None) == expected
+    return {
+        "parsed": parsed / len(corpus),
+        "correct": correct / len(corpus),
+        "us_per_parse": elapsed / len(corpus) * 1e6,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--strings", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = [make_case(rng) for _ in range(args.strings)]
+
+    print("🗓️  Date/time parsing")
+    print("=" * 62)
+    print(f"{'parser':<22}{'parsed':>10}{'correct':>10}{'µs/parse':>12}")
+    for name, parse in (
+        ("strptime loop (old)", old_parse_datetime),
+        ("parse_datetime", lambda text: parse_datetime(text, now=NOW)),
+    ):
+        result = run(parse, corpus)
+        print(f"{name:<22}{result['parsed']:>10.1%}{result['correct']:>10.1%}{result['us_per_parse']:>12.2f}")
+
+    events = [{"dateTime": f"{dt:%Y-%m-%dT%H:%M:%S}+05:30"} for _, dt in corpus]
+    print(f"\n{'format_event_time':<22}{'µs/event':>12}")
+    for name, fmt in (("fromisoformat (old)", old_format_event_time), ("current", format_event_time)):
+        start = time.perf_counter()
+        for event in events:
+            fmt(event)
+        print(f"{name:<22}{(time.perf_counter() - start) / len(events) * 1e6:>12.2f}")
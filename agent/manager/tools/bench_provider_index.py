@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the offline provider index (provider_index.py).
+
+Generates synthetic providers clustered around cities (10k, 100k and 1M by
+default), builds the index and times k-nearest (k=5 within 10 km) and
+radius (all within 3 km) queries by specialty from random points near the
+cities. Results are checked against a brute-force haversine scan over all
+providers. For scale, it also times the per-result geopy.geodesic loop the
+Maps path uses, over the 10k set.
+
+    python bench_provider_index.py [--sizes 10000 100000 1000000] [--queries 500]
+"""
+
+import sys
+from pathlib import Path
+
+# tools/calendar would shadow the standard library's calendar module
+TOOLS_DIR = Path(__file__).resolve().parent
+sys.path[:] = [p for p in sys.path if Path(p or ".").resolve() != TOOLS_DIR]
+
+import argparse  # noqa: E402
+import random  # noqa: E402
+import statistics  # noqa: E402
+import time  # noqa: E402
+import types  # noqa: E402
+
+import numpy as np  # noqa: E402
+from geopy.distance import geodesic  # noqa: E402
+
+# Load the tools as a package without importing the agent graph
+sys.modules.setdefault("manager", types.ModuleType("manager")).__path__ = [str(TOOLS_DIR.parent)]
+from manager.tools.provider_index import ProviderIndex, haversine_km  # noqa: E402
+
+CITIES = [
+    (26.1445, 91.7362), (28.6139, 77.2090), (19.0760, 72.8777), (12.9716, 77.5946),
+    (40.7128, -74.0060), (34.0522, -118.2437), (51.5074, -0.1278), (-33.8688, 151.2093),
+]
+SPECIALTIES = [
+    "Cardiology", "Dermatology", "Dental clinic", "General practice", "Hospital",
+    "Neurology", "Nutrition", "Oncology", "Orthopedics", "Pediatrics",
+    "Psychiatry", "Radiology", "Endocrinology", "Gastroenterology", "Pharmacy",
+]
+QUERIES = ["cardiologist", "dentist", "hospital", "pediatrician", "nutritionist"]
+
+
+def make_rows(count: int, rng: random.Random):
+    for i in range(count):
+        lat, lng = rng.choice(CITIES)
+        yield {
+            "name": f"Provider {i}",
+            "lat": lat + rng.gauss(0, 0.15),
+            "lng": lng + rng.gauss(0, 0.15),
+            "specialty": rng.choice(SPECIALTIES),
+            "rating": round(rng.uniform(3, 5), 1),
+        }
+
+
+def brute_force(index: ProviderIndex, query: str, lat: float, lng: float, radius_km: float, k=None):
+    distances = haversine_km(lat, lng, index.lats, index.lngs)
+    candidates = np.flatnonzero(distances <= radius_km)
+    candidates = candidates[index._matches(candidates, query)]
+    order = candidates[np.argsort(distances[candidates], kind="stable")]
+    return [int(i) for i in (order[:k] if k else order)]
+
+
+def timed_queries(index: ProviderIndex, points, radius_km: float, k):
+    times = []
+    for query, lat, lng in points:
+        start = time.perf_counter()
+        index.search(query, lat, lng, radius_km, k=k)
+        times.append((time.perf_counter() - start) * 1e6)
+    ordered = sorted(times)
+    return statistics.median(ordered), ordered[int(0.99 * (len(ordered) - 1))]
+
+
+def names(results):
+    return [int(r["name"].split()[-1]) for r in results]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    points = []
+    for _ in range(args.queries):
+        lat, lng = rng.choice(CITIES)
+        points.append((rng.choice(QUERIES), lat + rng.gauss(0, 0.1), lng + rng.gauss(0, 0.1)))
+
+    print("🏥 Offline provider index")
+    print("=" * 74)
+    print(f"{'providers':>10}{'build s':>9}{'knn p50 µs':>12}{'knn p99 µs':>12}"
+          f"{'3km p50 µs':>12}{'3km p99 µs':>12}{'exact':>7}")
+    for size in args.sizes:
+        rows = list(make_rows(size, random.Random(size)))
+        start = time.perf_counter()
+        index = ProviderIndex.from_rows(rows)
+        build_s = time.perf_counter() - start
+
+        knn = timed_queries(index, points, 10.0, 5)
+        radius = timed_queries(index, points, 3.0, None)
+        exact = all(
+            names(index.search(q, lat, lng, 10.0, k=5)) == brute_force(index, q, lat, lng, 10.0, k=5)
+            and names(index.search(q, lat, lng, 3.0)) == brute_force(index, q, lat, lng, 3.0)
+            for q, lat, lng in points[:50]
+        )
+        print(f"{size:>10,}{build_s:>9.2f}{knn[0]:>12.0f}{knn[1]:>12.0f}"
+              f"{radius[0]:>12.0f}{radius[1]:>12.0f}{'yes' if exact else 'NO':>7}")
+
+        if size == args.sizes[0]:
+            # What the Maps path does per result, applied to every provider
+            _, lat, lng = points[0]
+            start = time.perf_counter()
+            for row in rows:
+                geodesic((lat, lng), (row["lat"], row["lng"])).km
+            geodesic_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            haversine_km(lat, lng, index.lats, index.lngs)
+            numpy_ms = (time.perf_counter() - start) * 1000
+            print(f"{'':>10}distances to all {size:,}: geopy.geodesic loop {geodesic_ms:.0f} ms, "
+                  f"NumPy haversine {numpy_ms:.2f} ms")
@@ -2,6 +2,14 @@
 Calendar tools for Google Calendar integration.
 """
 
+from .async_tools import (
+    apply_calendar_changes_async,
+    create_event_async,
+    delete_event_async,
+    edit_event_async,
+    list_events_async,
+)
+from .batch_events import apply_calendar_changes
 from .calendar_utils import get_current_time
 from .create_event import create_event
 from .delete_event import delete_event
@@ -9,6 +17,12 @@ from .edit_event import edit_event
 from .list_events import list_events
 
 __all__ = [
+    "apply_calendar_changes",
+    "apply_calendar_changes_async",
+    "create_event_async",
+    "delete_event_async",
+    "edit_event_async",
+    "list_events_async",
     "create_event",
     "delete_event",
     "edit_event",
@@ -0,0 +1,64 @@
+"""
+Async variants of the calendar tools.
+
+ADK calls synchronous tools directly on the event loop, which also relays
+audio for every connection on the worker, so one slow Calendar request
+stalls them all. These variants run the same tool functions on a bounded
+thread pool and give up waiting after CALENDAR_CALL_TIMEOUT_S. They keep
+each tool's name, docstring and signature, so the model sees the same tools.
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from .. import metrics
+from .batch_events import apply_calendar_changes
+from .create_event import create_event
+from .delete_event import delete_event
+from .edit_event import edit_event
+from .list_events import list_events
+
+# Calendar calls in flight per worker process; further calls queue
+CALENDAR_EXECUTOR_WORKERS = int(os.getenv("CALENDAR_EXECUTOR_WORKERS", "8"))
+CALENDAR_CALL_TIMEOUT_S = float(os.getenv("CALENDAR_CALL_TIMEOUT_S", "30"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=CALENDAR_EXECUTOR_WORKERS, thread_name_prefix="calendar-io"
+)
+
+
+def _async_tool(tool: Callable[..., Dict[str, Any]], writes: bool, **error_fields: Any):
+    """Wraps a blocking calendar tool so it runs on the calendar executor."""
+
+    @functools.wraps(tool)
+    async def run(*args: Any, **kwargs: Any) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        metrics.add_gauge("calendar.executor.in_flight", 1)
+        try:
+            # A call still queued when the timeout hits is cancelled and never runs
+            return await asyncio.wait_for(
+                loop.run_in_executor(_executor, functools.partial(tool, *args, **kwargs)),
+                CALENDAR_CALL_TIMEOUT_S,
+            )
+        except asyncio.TimeoutError:
+            metrics.incr("calendar.timeouts")
+            message = f"Google Calendar did not respond within {CALENDAR_CALL_TIMEOUT_S:.0f} seconds."
+            if writes:
+                message += " The change may still be applied; check with list_events before retrying."
+            else:
+                message += " Please try again."
+            return {"status": "error", "message": message, **error_fields}
+        finally:
+            metrics.add_gauge("calendar.executor.in_flight", -1)
+
+    return run
+
+
+create_event_async = _async_tool(create_event, writes=True)
+edit_event_async = _async_tool(edit_event, writes=True)
+delete_event_async = _async_tool(delete_event, writes=True)
+apply_calendar_changes_async = _async_tool(apply_calendar_changes, writes=True, results=[])
+list_events_async = _async_tool(list_events, writes=False, events=[])
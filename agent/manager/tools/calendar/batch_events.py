@@ -0,0 +1,194 @@
+"""
+Batch tool for Google Calendar integration.
+
+Applies many create/edit/delete operations in one tool call. The operations
+are sent through the Calendar batch endpoint, up to CALENDAR_BATCH_SIZE per
+HTTP request, so a multi-week plan costs one tool turn and a few round trips
+instead of one of each per event.
+"""
+
+import os
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError
+
+from .. import metrics
+from .calendar_utils import (
+    execute,
+    get_calendar_service,
+    get_calendar_timezone,
+    parse_datetime,
+    parse_recurrence,
+)
+
+# Google accepts up to 1000 calls per batch but recommends staying around 50
+CALENDAR_BATCH_SIZE = int(os.getenv("CALENDAR_BATCH_SIZE", "50"))
+
+
+class CalendarChange(BaseModel):
+    """One operation for apply_calendar_changes."""
+    action: Literal["create", "edit", "delete"] = Field(
+        description="What to do with the event."
+    )
+    event_id: str = Field(
+        default="",
+        description="ID of the event to edit or delete (not used for create).",
+    )
+    summary: str = Field(
+        default="",
+        description="Event title; required for create, empty keeps it unchanged on edit.",
+    )
+    start_time: str = Field(
+        default="",
+        description='Start time, e.g. "2023-12-31 14:00"; empty keeps it unchanged on edit.',
+    )
+    end_time: str = Field(
+        default="",
+        description='End time, e.g. "2023-12-31 15:00"; empty keeps it unchanged on edit.',
+    )
+    recurrence: List[str] = Field(
+        default_factory=list,
+        description='RRULE lines for a repeating event, e.g. ["RRULE:FREQ=WEEKLY;COUNT=12"].',
+    )
+
+
+def _event_time(value: str, timezone_id: str, label: str) -> Dict[str, str]:
+    parsed = parse_datetime(value, timezone_id)
+    if not parsed:
+        raise ValueError(f"Invalid {label} format. Please use YYYY-MM-DD HH:MM format.")
+    return {"dateTime": parsed.isoformat(), "timeZone": timezone_id}
+
+
+def _build_request(service: Any, change: CalendarChange, calendar_id: str) -> Any:
+    """Turns one change into an (unsent) Calendar API request."""
+    events = service.events()
+
+    if change.action == "delete":
+        if not change.event_id:
+            raise ValueError("event_id is required to delete an event.")
+        return events.delete(calendarId=calendar_id, eventId=change.event_id)
+
+    body: Dict[str, Any] = {}
+    if change.summary:
+        body["summary"] = change.summary
+    if change.recurrence:
+        body["recurrence"] = parse_recurrence("\n".join(change.recurrence))
+    if change.start_time or change.end_time:
+        timezone_id = get_calendar_timezone(service, calendar_id)
+        if change.start_time:
+            body["start"] = _event_time(change.start_time, timezone_id, "start time")
+        if change.end_time:
+            body["end"] = _event_time(change.end_time, timezone_id, "end time")
+
+    if change.action == "create":
+        if not change.summary or "start" not in body or "end" not in body:
+            raise ValueError("summary, start_time and end_time are required to create an event.")
+        return events.insert(calendarId=calendar_id, body=body)
+
+    if not change.event_id:
+        raise ValueError("event_id is required to edit an event.")
+    if not body:
+        raise ValueError("Nothing to change: give a new summary, start_time, end_time or recurrence.")
+    # patch sends only the changed fields, so no read of the event is needed
+    return events.patch(calendarId=calendar_id, eventId=change.event_id, body=body)
+
+
+def _success(change: CalendarChange, response: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if change.action == "delete":
+        return {"status": "success", "action": "delete", "event_id": change.event_id}
+    return {
+        "status": "success",
+        "action": change.action,
+        "event_id": response["id"],
+        "event_link": response.get("htmlLink", ""),
+    }
+
+
+def _error(action: Any, message: str) -> Dict[str, Any]:
+    return {"status": "error", "action": action, "message": message}
+
+
+def _send_batch(
+    service: Any,
+    items: List[Tuple[int, CalendarChange, Any]],
+    results: List[Dict[str, Any]],
+) -> None:
+    """Sends one batch request and fills `results` for its items."""
+    changes = {str(index): change for index, change, _ in items}
+
+    def on_response(request_id: str, response: Any, exception: Optional[Exception]) -> None:
+        index = int(request_id)
+        change = changes[request_id]
+        if exception is not None:
+            results[index] = _error(change.action, f"Error applying {change.action}: {exception}")
+        else:
+            results[index] = _success(change, response)
+
+    batch = service.new_batch_http_request(callback=on_response)
+    for index, _, request in items:
+        batch.add(request, request_id=str(index))
+    metrics.observe("calendar.batch_items", len(items))
+    try:
+        execute(batch, "batch", cost=len(items))
+    except Exception as e:
+        # The whole HTTP request failed: none of its items were applied
+        for index, change, _ in items:
+            if results[index] is None:
+                results[index] = _error(change.action, f"Error applying {change.action}: {e}")
+
+
+def apply_calendar_changes(changes: List[CalendarChange]) -> dict:
+    """
+    Create, edit and delete many calendar events in one call. Use this instead
+    of calling create_event / edit_event / delete_event repeatedly, e.g. to
+    schedule a whole plan. For something that repeats (a daily walk, a weekly
+    check), create ONE event with a recurrence rule rather than one per day.
+
+    Args:
+        changes (list): Operations, each with:
+            action: "create", "edit" or "delete"
+            event_id: Event to edit or delete
+            summary, start_time, end_time: As in create_event / edit_event
+                (empty strings keep the current value on edit)
+            recurrence: Optional RRULE lines, e.g. ["RRULE:FREQ=DAILY;COUNT=90"]
+
+    Returns:
+        dict: Overall status, counts and one result per operation, in order
+    """
+    try:
+        service = get_calendar_service()
+        if not service:
+            return {
+                "status": "error",
+                "message": "Failed to authenticate with Google Calendar. Please check credentials.",
+                "results": [],
+            }
+
+        # Always use primary calendar
+        calendar_id = "primary"
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(changes)
+        pending: List[Tuple[int, CalendarChange, Any]] = []
+        for index, raw in enumerate(changes):
+            try:
+                change = raw if isinstance(raw, CalendarChange) else CalendarChange.model_validate(raw)
+                pending.append((index, change, _build_request(service, change, calendar_id)))
+            except (ValidationError, ValueError) as e:
+                action = raw.get("action") if isinstance(raw, dict) else getattr(raw, "action", None)
+                results[index] = _error(action, str(e))
+
+        for start in range(0, len(pending), CALENDAR_BATCH_SIZE):
+            _send_batch(service, pending[start:start + CALENDAR_BATCH_SIZE], results)
+
+        for index, result in enumerate(results):
+            result["index"] = index
+
+        failed = sum(1 for result in results if result["status"] != "success")
+        return {
+            "status": "success" if not failed else "partial" if failed < len(results) else "error",
+            "message": f"Applied {len(results) - failed} of {len(results)} change(s).",
+            "results": results,
+        }
+
+    except Exception as e:
+        return {"status": "error", "message": f"Error applying calendar changes: {str(e)}", "results": []}
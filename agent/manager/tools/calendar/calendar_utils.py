@@ -2,15 +2,28 @@
 Utility functions for Google Calendar integration.
 """
 
+import functools
+import hashlib
 import json
 import os
-from datetime import datetime
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+from zoneinfo import ZoneInfo
 
+import google_auth_httplib2
+import httplib2
+from google.auth.credentials import AnonymousCredentials
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.http import BatchHttpRequest, HttpRequest
+
+from .. import metrics, resilience
 
 # Define scopes needed for Google Calendar
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
@@ -19,43 +32,342 @@ SCOPES = ["https://www.googleapis.com/auth/calendar"]
 TOKEN_PATH = Path(os.path.expanduser("~/.credentials/calendar_token.json"))
 CREDENTIALS_PATH = Path("credentials.json")
 
+# Refresh the access token this long before it expires, so no tool call
+# pays for (or fails on) a refresh in the middle of a request
+CALENDAR_TOKEN_REFRESH_MARGIN_S = float(os.getenv("CALENDAR_TOKEN_REFRESH_MARGIN_S", "300"))
+
+# How long a calendar's time zone is reused before it is looked up again
+CALENDAR_SETTINGS_TTL_S = float(os.getenv("CALENDAR_SETTINGS_TTL_S", "3600"))
+DEFAULT_TIMEZONE = "America/New_York"
+
+# Socket timeout of Calendar HTTP requests, so a hung call frees its thread
+CALENDAR_HTTP_TIMEOUT_S = float(os.getenv("CALENDAR_HTTP_TIMEOUT_S", "20"))
+
+# Send Calendar requests to another server with the same API, e.g.
+# http://127.0.0.1:8089/ (requests go to <root>calendar/v3/...)
+CALENDAR_API_ROOT = os.getenv("CALENDAR_API_ROOT", "")
+# Serve the calendar tools from the in-process stand-in in
+# fake_calendar_api.py: no Google account or network needed
+CALENDAR_FAKE_API = os.getenv("CALENDAR_FAKE_API", "false").lower() == "true"
+
+
+# ───────────────────────── service cache ─────────────────────────
+# Building the client (discovery document parsing) costs far more than the
+# tool calls that use it, so one client is built per credential identity
+# and shared by every thread. httplib2 is not thread-safe, so each thread
+# sends its requests through its own AuthorizedHttp (keeping its own
+# keep-alive connections). Collections (service.events(), .settings())
+# are built once too: each one costs milliseconds to create. The token file
+# is only re-read when it changes on disk.
+
+class _Service:
+    """Service proxy that builds each collection the first time it is used."""
+
+    def __init__(self, resource: Any, account: str, batch_uri: Optional[str] = None):
+        self._resource = resource
+        # Stable, non-secret key of the signed-in account (e.g. for sync state)
+        self.account = account
+        self._batch_uri = batch_uri
+        self._collection_names = set(resource._resourceDesc.get("resources", {}))
+        self._collections: Dict[str, Any] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        if name not in self._collection_names:
+            return getattr(self._resource, name)
+        return functools.partial(self._collection, name)
+
+    def _collection(self, name: str) -> Any:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = getattr(self._resource, name)()
+        return collection
+
+    def new_batch_http_request(self, callback: Any = None) -> BatchHttpRequest:
+        # The client's batch URI ignores api_endpoint, so point it at the same root
+        if self._batch_uri is None:
+            batch = self._resource.new_batch_http_request(callback=callback)
+        else:
+            batch = BatchHttpRequest(callback=callback, batch_uri=self._batch_uri)
+        # execute() charges the batch to this account's budget
+        batch.account = self.account
+        return batch
+
+
+def _api_root() -> Optional[str]:
+    if CALENDAR_FAKE_API:
+        from .fake_calendar_api import shared_fake_api
+
+        return shared_fake_api().root_url
+    return CALENDAR_API_ROOT or None
+
+
+class _CalendarClient:
+    """A built Calendar service plus the credentials its requests use."""
+
+    def __init__(self, credentials: Credentials):
+        self.credentials = credentials
+        self._local = threading.local()
+        self.account = hashlib.sha256(repr(_identity(credentials)).encode()).hexdigest()[:16]
+        api_root = _api_root()
+        self.service = _Service(
+            build(
+                "calendar",
+                "v3",
+                http=self._http(),
+                requestBuilder=self._build_request,
+                static_discovery=True,
+                cache_discovery=False,
+                client_options={"api_endpoint": f"{api_root}calendar/v3/"} if api_root else None,
+            ),
+            account=self.account,
+            batch_uri=f"{api_root}batch/calendar/v3" if api_root else None,
+        )
+
+    def _http(self) -> google_auth_httplib2.AuthorizedHttp:
+        http = getattr(self._local, "http", None)
+        if http is None or http.credentials is not self.credentials:
+            http = self._local.http = google_auth_httplib2.AuthorizedHttp(
+                self.credentials, http=httplib2.Http(timeout=CALENDAR_HTTP_TIMEOUT_S)
+            )
+        return http
+
+    def _build_request(self, http, *args, **kwargs) -> HttpRequest:
+        # Ignore the Http the service was built with: use this thread's own
+        request = HttpRequest(self._http(), *args, **kwargs)
+        # execute() charges the request to this account's budget
+        request.account = self.account
+        return request
+
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[Optional[str], Optional[str]], _CalendarClient] = {}
+# (token file mtime, credentials, client) of the last successful lookup
+_current: Optional[Tuple[Optional[int], Credentials, _CalendarClient]] = None
+
+
+def _token_mtime() -> Optional[int]:
+    try:
+        return TOKEN_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _needs_refresh(creds: Credentials) -> bool:
+    if not creds.valid:
+        return True
+    if creds.expiry is None:
+        return False
+    # Credentials.expiry is a naive UTC datetime
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return creds.expiry - now < timedelta(seconds=CALENDAR_TOKEN_REFRESH_MARGIN_S)
+
+
+def _identity(creds: Credentials) -> Tuple[Optional[str], Optional[str]]:
+    return (getattr(creds, "client_id", None), getattr(creds, "refresh_token", None) or creds.token)
+
+
+def _save_token(creds: Credentials) -> Optional[int]:
+    TOKEN_PATH.parent.mkdir(parents=True, exist_ok=True)
+    TOKEN_PATH.write_text(creds.to_json())
+    return _token_mtime()
+
+
+def _load_credentials(mtime: Optional[int]) -> Tuple[Optional[Credentials], Optional[int]]:
+    """Returns usable credentials and the token file mtime they correspond to."""
+    if CALENDAR_FAKE_API:
+        # The stand-in API accepts any request
+        return AnonymousCredentials(), mtime
+
+    creds = None
+    if _current is not None and _current[0] == mtime:
+        creds = _current[1]
+    elif TOKEN_PATH.exists():
+        creds = Credentials.from_authorized_user_info(
+            json.loads(TOKEN_PATH.read_text()), SCOPES
+        )
+
+    if creds and not _needs_refresh(creds):
+        return creds, mtime
+
+    if creds and creds.refresh_token:
+        try:
+            creds.refresh(Request())
+            metrics.incr("calendar.token_refreshes")
+            return creds, _save_token(creds)
+        except Exception as e:
+            # Refreshing early failed; keep using the token while it lasts
+            metrics.incr("calendar.token_refresh_errors")
+            if creds.valid:
+                print(f"Calendar token refresh failed, using current token: {e}")
+                return creds, mtime
+            raise
+
+    # If credentials.json doesn't exist, we can't proceed with OAuth flow
+    if not CREDENTIALS_PATH.exists():
+        print(f"Error: {CREDENTIALS_PATH} not found. Please follow setup instructions.")
+        return None, mtime
+
+    flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_PATH, SCOPES)
+    creds = flow.run_local_server(port=0)
+    # Save the credentials for the next run
+    return creds, _save_token(creds)
+
 
 def get_calendar_service():
     """
-    Authenticate and create a Google Calendar service object.
+    Return the shared Google Calendar service object, authenticating,
+    refreshing the token or rebuilding the client only when needed.
 
     Returns:
         A Google Calendar service object or None if authentication fails
     """
-    creds = None
+    global _current
+    current = _current
+    if (
+        current is not None
+        and current[0] == _token_mtime()
+        and not _needs_refresh(current[1])
+    ):
+        return current[2].service
 
-    # Check if token exists and is valid
-    if TOKEN_PATH.exists():
-        creds = Credentials.from_authorized_user_info(
-            json.loads(TOKEN_PATH.read_text()), SCOPES
-        )
+    with _lock:
+        creds, mtime = _load_credentials(_token_mtime())
+        if creds is None:
+            return None
+        client = _clients.get(_identity(creds))
+        if client is None:
+            client = _clients[_identity(creds)] = _CalendarClient(creds)
+            metrics.incr("calendar.service_builds")
+        # Same account, reloaded token: requests pick up the new credentials
+        client.credentials = creds
+        _current = (mtime, creds, client)
+        return client.service
 
-    # If credentials don't exist or are invalid, refresh or get new ones
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            # If credentials.json doesn't exist, we can't proceed with OAuth flow
-            if not CREDENTIALS_PATH.exists():
-                print(
-                    f"Error: {CREDENTIALS_PATH} not found. Please follow setup instructions."
-                )
-                return None
 
-            flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_PATH, SCOPES)
-            creds = flow.run_local_server(port=0)
+def reset_calendar_service() -> None:
+    """Drops the cached clients, e.g. after switching accounts or in tests."""
+    global _current
+    with _lock:
+        _clients.clear()
+        _current = None
+    invalidate_calendar_timezone()
+
+
+def execute(request: Any, operation: str, cost: int = 1) -> Any:
+    """
+    Execute a Calendar API request within the account's rate limit, retrying
+    transient failures (see resilience.py) and recording its latency.
+
+    Args:
+        request: The HttpRequest returned by a service method, e.g. events().list(...)
+        operation (str): Metric name of the call, e.g. "events.list"
+        cost (int): Quota units the request uses (the number of requests in a batch)
+
+    Raises:
+        resilience.UpstreamUnavailable: Calendar is failing or the account's rate limit is spent
+    """
+
+    def send() -> Any:
+        metrics.incr("calendar.api_calls")
+        with metrics.timer(f"calendar.{operation}_ms"):
+            return request.execute()
+
+    # The account whose service built the request, not whoever signed in since
+    account = getattr(request, "account", "")
+    # Inserts and batches (which may hold inserts) must not be sent twice
+    idempotent = getattr(request, "method", "POST") != "POST"
+    return resilience.budget("calendar", account).call(send, idempotent=idempotent, cost=cost)
 
-        # Save the credentials for the next run
-        TOKEN_PATH.parent.mkdir(parents=True, exist_ok=True)
-        TOKEN_PATH.write_text(creds.to_json())
 
-    # Create and return the Calendar service
-    return build("calendar", "v3", credentials=creds)
+# Largest page the events.list API returns
+EVENTS_PAGE_SIZE = 2500
+
+
+def iter_pages(list_method: Any, operation: str, **query: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every response page of a list call, following nextPageToken.
+
+    Args:
+        list_method: e.g. service.events().list
+        operation (str): Metric name of the call, e.g. "events.list"
+        **query: Arguments of the list call
+    """
+    page_token = None
+    while True:
+        if page_token:
+            query["pageToken"] = page_token
+        page = execute(list_method(**query), operation)
+        yield page
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return
+
+
+def iter_events(service: Any, limit: int, **query: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Yield up to `limit` events of an events.list query across pages.
+    Pages are only fetched as the caller consumes them.
+    """
+    if limit <= 0:
+        return
+    query.setdefault("maxResults", min(limit, EVENTS_PAGE_SIZE))
+    count = 0
+    for page in iter_pages(service.events().list, "events.list", **query):
+        for event in page.get("items", []):
+            yield event
+            count += 1
+            if count >= limit:
+                return
+
+
+# ───────────────────────── settings cache ────────────────────────
+# (service, calendar id) -> (time zone, monotonic expiry). Keyed by the
+# service so two accounts never share an entry.
+_timezone_lock = threading.Lock()
+_timezones: Dict[Tuple[Any, str], Tuple[str, float]] = {}
+
+
+def get_calendar_timezone(service: Any, calendar_id: str = "primary") -> str:
+    """
+    Return a calendar's time zone, asking the API at most once per
+    CALENDAR_SETTINGS_TTL_S.
+
+    Args:
+        service: The service returned by get_calendar_service()
+        calendar_id (str): Calendar whose time zone to return
+
+    Returns:
+        str: An IANA time zone name; DEFAULT_TIMEZONE if the lookup fails
+    """
+    key = (service, calendar_id)
+    with _timezone_lock:
+        cached = _timezones.get(key)
+    if cached is not None and cached[1] > time.monotonic():
+        metrics.incr("calendar.timezone_cache.hits")
+        return cached[0]
+
+    metrics.incr("calendar.timezone_cache.misses")
+    try:
+        calendar = execute(
+            service.calendars().get(calendarId=calendar_id, fields="timeZone"),
+            "calendars.get",
+        )
+    except Exception as e:
+        # Not cached, so the next event creation tries again
+        print(f"Could not read the time zone of calendar {calendar_id}: {e}")
+        return DEFAULT_TIMEZONE
+    timezone_id = calendar.get("timeZone") or DEFAULT_TIMEZONE
+    with _timezone_lock:
+        _timezones[key] = (timezone_id, time.monotonic() + CALENDAR_SETTINGS_TTL_S)
+    return timezone_id
+
+
+def invalidate_calendar_timezone(calendar_id: Optional[str] = None) -> None:
+    """Forgets cached time zones, of one calendar or of all of them."""
+    with _timezone_lock:
+        for key in list(_timezones):
+            if calendar_id is None or key[1] == calendar_id:
+                del _timezones[key]
 
 
 def format_event_time(event_time):
@@ -69,8 +381,13 @@ def format_event_time(event_time):
         str: A human-readable time string
     """
     if "dateTime" in event_time:
-        # This is a datetime event
-        dt = datetime.fromisoformat(event_time["dateTime"].replace("Z", "+00:00"))
+        # This is a datetime event, shown in its own offset. The API always
+        # sends "YYYY-MM-DDTHH:MM:SS...", which is formatted from the text
+        value = event_time["dateTime"]
+        if len(value) >= 16 and value[10] == "T" and value[13] == ":":
+            hour = int(value[11:13])
+            return f"{value[:10]} {hour % 12 or 12:02d}:{value[14:16]} {'AM' if hour < 12 else 'PM'}"
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
         return dt.strftime("%Y-%m-%d %I:%M %p")
     elif "date" in event_time:
         # This is an all-day event
@@ -78,35 +395,221 @@ def format_event_time(event_time):
     return "Unknown time format"
 
 
-def parse_datetime(datetime_str):
+# ───────────────────────── date/time parsing ─────────────────────
+# One regular expression covers the formats the model produces: numeric
+# dates (2023-12-31, 12/31/2023), month names (December 31, 2023 /
+# 31 Dec 2023), relative days (today, tomorrow, next monday, in 3 days)
+# and times before or after the date (14:00, 2:30 pm, 9am, noon).
+_MONTHS = {
+    name: number
+    for number, names in enumerate(
+        [
+            ("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"),
+            ("may",), ("june", "jun"), ("july", "jul"), ("august", "aug"),
+            ("september", "sep", "sept"), ("october", "oct"), ("november", "nov"),
+            ("december", "dec"),
+        ],
+        start=1,
+    )
+    for name in names
+}
+_WEEKDAYS = {
+    name: number
+    for number, names in enumerate(
+        [("monday", "mon"), ("tuesday", "tue", "tues"), ("wednesday", "wed"),
+         ("thursday", "thu", "thur", "thurs"), ("friday", "fri"), ("saturday", "sat"),
+         ("sunday", "sun")]
+    )
+    for name in names
+}
+_NAMED_TIMES = {"noon": 12, "midday": 12, "midnight": 0, "morning": 9, "afternoon": 15,
+                "evening": 18, "tonight": 20, "night": 20}
+_UNIT_DELTAS = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1),
+                "day": timedelta(days=1), "week": timedelta(weeks=1)}
+
+
+def _alternatives(names) -> str:
+    return "|".join(sorted(names, key=len, reverse=True))
+
+
+def _time_pattern(n: int) -> str:
+    return (
+        rf"(?:at\s+)?(?:(?P<h{n}>\d{{1,2}})(?::(?P<mi{n}>\d{{2}}))?(?::(?P<s{n}>\d{{2}}))?"
+        rf"\s*(?P<ap{n}>[ap])\.?m\.?(?![a-z])|(?P<hh{n}>\d{{1,2}}):(?P<mm{n}>\d{{2}})(?::(?P<ss{n}>\d{{2}}))?"
+        rf"|(?P<named{n}>{_alternatives(_NAMED_TIMES)}))"
+    )
+
+
+_DATE_PATTERN = (
+    r"(?:(?P<y>\d{4})[-/.](?P<m>\d{1,2})[-/.](?P<d>\d{1,2})"
+    r"|(?P<us_m>\d{1,2})/(?P<us_d>\d{1,2})/(?P<us_y>\d{4})"
+    rf"|(?P<name_m>{_alternatives(_MONTHS)})\.?\s+(?P<name_d>\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s*(?P<name_y>\d{{4}}))?"
+    rf"|(?P<d_name>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<m_name>{_alternatives(_MONTHS)})\.?(?:,?\s*(?P<y_name>\d{{4}}))?"
+    r"|(?P<rel>day after tomorrow|today|tomorrow|tonight|yesterday)"
+    rf"|(?:(?P<which>next|this|coming)\s+)?(?P<weekday>{_alternatives(_WEEKDAYS)})"
+    r"|in\s+(?P<count>\d+|an?)\s+(?P<unit>minute|hour|day|week)s?"
+    r"|(?P<count2>\d+|an?)\s+(?P<unit2>minute|hour|day|week)s?\s+from\s+now)"
+)
+_DATETIME_RX = re.compile(
+    rf"(?:{_time_pattern(1)}\s*,?\s+)?(?:on\s+)?{_DATE_PATTERN}(?:\s*(?:,|t|@)?\s*{_time_pattern(2)})?"
+    rf"|{_time_pattern(3)}(?:\s+today)?"
+)
+
+
+def _clock(match, n: int):
+    """(hour, minute, second) of time pattern `n`, or None if it did not match."""
+    group = match.group
+    if group(f"h{n}") is not None:
+        hour = int(group(f"h{n}"))
+        if not 1 <= hour <= 12:
+            raise ValueError("12-hour clock out of range")
+        hour = hour % 12 + (12 if group(f"ap{n}") == "p" else 0)
+        return hour, int(group(f"mi{n}") or 0), int(group(f"s{n}") or 0)
+    if group(f"hh{n}") is not None:
+        return int(group(f"hh{n}")), int(group(f"mm{n}")), int(group(f"ss{n}") or 0)
+    if group(f"named{n}") is not None:
+        return _NAMED_TIMES[group(f"named{n}")], 0, 0
+    return None
+
+
+def _next_month_day(month: int, day: int, today):
+    """The next date (today or later) falling on month/day."""
+    for year in range(today.year, today.year + 8):
+        try:
+            candidate = today.replace(year=year, month=month, day=day)
+        except ValueError:
+            # February 29 outside a leap year
+            continue
+        if candidate >= today:
+            return candidate
+    raise ValueError(f"No date {month}/{day}")
+
+
+def parse_datetime(datetime_str, tz=None, now=None):
     """
     Parse a datetime string into a datetime object.
 
     Args:
-        datetime_str (str): A string representing a date and time
+        datetime_str (str): A date and time, e.g. "2023-12-31 14:00", "12/31/2023 2:00 PM",
+            "December 31, 2023", "2023-12-31T14:00:00+05:30", "tomorrow 9am", "next monday at 10:30"
+        tz (str): Optional IANA time zone (e.g. "Asia/Kolkata"). Times without an offset are
+            read in it, relative phrases are resolved against the current time there, and the
+            result is timezone-aware.
+        now (datetime): Reference time for relative phrases (defaults to the current time)
 
     Returns:
-        datetime: A datetime object or None if parsing fails
-    """
-    formats = [
-        "%Y-%m-%d %H:%M",
-        "%Y-%m-%d %I:%M %p",
-        "%Y-%m-%d",
-        "%m/%d/%Y %H:%M",
-        "%m/%d/%Y %I:%M %p",
-        "%m/%d/%Y",
-        "%B %d, %Y %H:%M",
-        "%B %d, %Y %I:%M %p",
-        "%B %d, %Y",
-    ]
-
-    for fmt in formats:
-        try:
-            return datetime.strptime(datetime_str, fmt)
-        except ValueError:
-            continue
+        datetime: A datetime object or None if parsing fails. It carries an offset when the
+        string had one or `tz` was given; a date without a time is midnight.
+    """
+    if not datetime_str:
+        return None
+    text = datetime_str.strip()
+    zone = ZoneInfo(tz) if tz else None
 
-    return None
+    # Fast path: ISO 8601, which is also what the model produces most often
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        parsed = None
+    if parsed is not None:
+        if zone is not None and parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=zone)
+        return parsed
+
+    match = _DATETIME_RX.fullmatch(" ".join(text.lower().split()))
+    if match is None:
+        return None
+
+    if now is None:
+        now = datetime.now(zone) if zone is not None else datetime.now()
+    elif zone is not None:
+        now = now.astimezone(zone) if now.tzinfo is not None else now.replace(tzinfo=zone)
+    today = now.date()
+    group = match.group
+    try:
+        clock = _clock(match, 1) or _clock(match, 2) or _clock(match, 3)
+        offset = None
+        if group("y"):
+            day = today.replace(year=int(group("y")), month=int(group("m")), day=int(group("d")))
+        elif group("us_y"):
+            day = today.replace(year=int(group("us_y")), month=int(group("us_m")), day=int(group("us_d")))
+        elif group("name_m") or group("m_name"):
+            month = _MONTHS[group("name_m") or group("m_name")]
+            day_of_month = int(group("name_d") or group("d_name"))
+            year = group("name_y") or group("y_name")
+            if year:
+                day = today.replace(year=int(year), month=month, day=day_of_month)
+            else:
+                day = _next_month_day(month, day_of_month, today)
+        elif group("rel"):
+            rel = group("rel")
+            day = today + timedelta(
+                days={"today": 0, "tonight": 0, "tomorrow": 1, "yesterday": -1}.get(rel, 2)
+            )
+            if rel == "tonight" and clock is None:
+                clock = (_NAMED_TIMES["tonight"], 0, 0)
+        elif group("weekday"):
+            ahead = (_WEEKDAYS[group("weekday")] - today.weekday()) % 7
+            if group("which") == "next" and ahead == 0:
+                ahead = 7
+            day = today + timedelta(days=ahead)
+        elif group("unit") or group("unit2"):
+            count = group("count") or group("count2")
+            count = 1 if count in ("a", "an") else int(count)
+            offset = _UNIT_DELTAS[group("unit") or group("unit2")] * count
+            day = None
+        else:
+            # A time on its own means today
+            day = today
+
+        if offset is not None:
+            result = now + offset
+            if clock is not None:
+                result = result.replace(hour=clock[0], minute=clock[1], second=clock[2], microsecond=0)
+            else:
+                result = result.replace(second=0, microsecond=0)
+        else:
+            hour, minute, second = clock or (0, 0, 0)
+            result = datetime(day.year, day.month, day.day, hour, minute, second)
+            if zone is not None:
+                result = result.replace(tzinfo=zone)
+        if zone is None and result.tzinfo is not None:
+            result = result.replace(tzinfo=None)
+        return result
+    except ValueError:
+        # e.g. month 13, February 30, 25:00
+        return None
+
+
+def parse_recurrence(recurrence):
+    """
+    Turn recurrence text into the list of lines the Calendar API expects.
+
+    Args:
+        recurrence (str): One rule per line, e.g. "RRULE:FREQ=DAILY;COUNT=90".
+            The "RRULE:" prefix may be left out. EXDATE/RDATE lines are kept.
+
+    Returns:
+        list: Recurrence lines (empty if `recurrence` is empty)
+
+    Raises:
+        ValueError: If a line is not a recurrence rule
+    """
+    lines = []
+    for line in (recurrence or "").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.upper().startswith("FREQ="):
+            line = "RRULE:" + line
+        if not line.upper().startswith(("RRULE:", "EXRULE:", "RDATE", "EXDATE")):
+            raise ValueError(
+                f"Invalid recurrence '{line}'. Use a rule like RRULE:FREQ=WEEKLY;COUNT=12."
+            )
+        if line.upper().startswith("RRULE:") and "FREQ=" not in line.upper():
+            raise ValueError(f"Recurrence rule '{line}' has no FREQ.")
+        lines.append(line)
+    return lines
 
 
 def get_current_time() -> dict:
@@ -4,21 +4,31 @@ Create event tool for Google Calendar integration.
 
 import datetime
 
-from .calendar_utils import get_calendar_service, parse_datetime
+from .calendar_utils import (
+    execute,
+    get_calendar_service,
+    get_calendar_timezone,
+    parse_datetime,
+    parse_recurrence,
+)
 
 
 def create_event(
     summary: str,
     start_time: str,
     end_time: str,
+    recurrence: str = "",
 ) -> dict:
     """
-    Create a new event in Google Calendar.
+    Create a new event in Google Calendar. For something that repeats, create
+    ONE recurring event instead of one event per occurrence.
 
     Args:
         summary (str): Event title/summary
-        start_time (str): Start time (e.g., "2023-12-31 14:00")
-        end_time (str): End time (e.g., "2023-12-31 15:00")
+        start_time (str): Start time (e.g., "2023-12-31 14:00" or "tomorrow 9am"); the first occurrence for recurring events
+        end_time (str): End time (e.g., "2023-12-31 15:00" or "tomorrow 10am")
+        recurrence (str): Optional RRULE, e.g. "RRULE:FREQ=DAILY;COUNT=90" (every day for 90 days)
+            or "RRULE:FREQ=WEEKLY;BYDAY=MO,TH;UNTIL=20240331T000000Z". Empty string for a single event.
 
     Returns:
         dict: Information about the created event or error details
@@ -35,9 +45,12 @@ def create_event(
         # Always use primary calendar
         calendar_id = "primary"
 
-        # Parse times
-        start_dt = parse_datetime(start_time)
-        end_dt = parse_datetime(end_time)
+        # Timezone of the calendar (cached; falls back to Eastern Time)
+        timezone_id = get_calendar_timezone(service, calendar_id)
+
+        # Parse times in the calendar's timezone
+        start_dt = parse_datetime(start_time, timezone_id)
+        end_dt = parse_datetime(end_time, timezone_id)
 
         if not start_dt or not end_dt:
             return {
@@ -45,19 +58,10 @@ def create_event(
                 "message": "Invalid date/time format. Please use YYYY-MM-DD HH:MM format.",
             }
 
-        # Dynamically determine timezone
-        timezone_id = "America/New_York"  # Default to Eastern Time
-
         try:
-            # Try to get the timezone from the calendar settings
-            settings = service.settings().list().execute()
-            for setting in settings.get("items", []):
-                if setting.get("id") == "timezone":
-                    timezone_id = setting.get("value")
-                    break
-        except Exception:
-            # If we can't get it from settings, we'll use the default
-            pass
+            recurrence_lines = parse_recurrence(recurrence)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
 
         # Create event body without type annotations
         event_body = {}
@@ -72,17 +76,26 @@ def create_event(
         }
         event_body["end"] = {"dateTime": end_dt.isoformat(), "timeZone": timezone_id}
 
+        # Repeating events are stored once; Google expands the occurrences
+        if recurrence_lines:
+            event_body["recurrence"] = recurrence_lines
+
         # Call the Calendar API to create the event
-        event = (
-            service.events().insert(calendarId=calendar_id, body=event_body).execute()
+        event = execute(
+            service.events().insert(calendarId=calendar_id, body=event_body),
+            "events.insert",
         )
 
-        return {
+        result = {
             "status": "success",
             "message": "Event created successfully",
             "event_id": event["id"],
             "event_link": event.get("htmlLink", ""),
         }
+        if recurrence_lines:
+            result["message"] = "Recurring event created successfully"
+            result["recurrence"] = recurrence_lines
+        return result
 
     except Exception as e:
         return {"status": "error", "message": f"Error creating event: {str(e)}"}
\ No newline at end of file
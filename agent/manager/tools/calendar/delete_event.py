@@ -2,19 +2,23 @@
 Delete event tool for Google Calendar integration.
 """
 
-from .calendar_utils import get_calendar_service
+from .calendar_utils import execute, get_calendar_service
 
 
 def delete_event(
     event_id: str,
     confirm: bool,
+    scope: str = "event",
 ) -> dict:
     """
     Delete an event from Google Calendar.
 
     Args:
-        event_id (str): The unique ID of the event to delete
+        event_id (str): The unique ID of the event to delete. For a recurring event this is
+            either one occurrence's ID (from list_events with expand_recurring=True) or the series ID
         confirm (bool): Confirmation flag (must be set to True to delete)
+        scope (str): "event" deletes exactly event_id (a single occurrence if it is one);
+            "series" deletes the whole recurring series event_id belongs to
 
     Returns:
         dict: Operation status and details
@@ -26,6 +30,9 @@ def delete_event(
             "message": "Please confirm deletion by setting confirm=True",
         }
 
+    if scope not in ("event", "series"):
+        return {"status": "error", "message": 'scope must be "event" or "series"'}
+
     try:
         # Get calendar service
         service = get_calendar_service()
@@ -38,13 +45,25 @@ def delete_event(
         # Always use primary calendar
         calendar_id = "primary"
 
+        # An occurrence's series is the event it was expanded from
+        target_id = event_id
+        if scope == "series":
+            event = execute(
+                service.events().get(calendarId=calendar_id, eventId=event_id),
+                "events.get",
+            )
+            target_id = event.get("recurringEventId", event_id)
+
         # Call the Calendar API to delete the event
-        service.events().delete(calendarId=calendar_id, eventId=event_id).execute()
+        execute(
+            service.events().delete(calendarId=calendar_id, eventId=target_id),
+            "events.delete",
+        )
 
         return {
             "status": "success",
-            "message": f"Event {event_id} has been deleted successfully",
-            "event_id": event_id,
+            "message": f"{'Series' if target_id != event_id else 'Event'} {target_id} has been deleted successfully",
+            "event_id": target_id,
         }
 
     except Exception as e:
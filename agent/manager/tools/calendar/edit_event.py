@@ -2,7 +2,13 @@
 Edit event tool for Google Calendar integration.
 """
 
-from .calendar_utils import get_calendar_service, parse_datetime
+from .calendar_utils import (
+    execute,
+    get_calendar_service,
+    get_calendar_timezone,
+    parse_datetime,
+    parse_recurrence,
+)
 
 
 def edit_event(
@@ -10,19 +16,35 @@ def edit_event(
     summary: str,
     start_time: str,
     end_time: str,
+    recurrence: str = "",
+    scope: str = "event",
 ) -> dict:
     """
     Edit an existing event in Google Calendar - change title and/or reschedule.
 
     Args:
-        event_id (str): The ID of the event to edit
+        event_id (str): The ID of the event to edit. For a recurring event this is either one
+            occurrence's ID (from list_events with expand_recurring=True) or the series ID
         summary (str): New title/summary for the event (pass empty string to keep unchanged)
-        start_time (str): New start time (e.g., "2023-12-31 14:00", pass empty string to keep unchanged)
+        start_time (str): New start time (e.g., "2023-12-31 14:00", pass empty string to keep unchanged);
+            for a whole series this is the start of its first occurrence
         end_time (str): New end time (e.g., "2023-12-31 15:00", pass empty string to keep unchanged)
+        recurrence (str): New RRULE for the series, e.g. "RRULE:FREQ=WEEKLY;COUNT=8"
+            (pass empty string to keep unchanged); turns a single event into a recurring one
+        scope (str): "event" edits exactly event_id (only that occurrence if it is one);
+            "series" edits the whole recurring series event_id belongs to
 
     Returns:
         dict: Information about the edited event or error details
     """
+    if scope not in ("event", "series"):
+        return {"status": "error", "message": 'scope must be "event" or "series"'}
+
+    try:
+        recurrence_lines = parse_recurrence(recurrence)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+
     try:
         # Get calendar service
         service = get_calendar_service()
@@ -37,8 +59,9 @@ def edit_event(
 
         # First get the existing event
         try:
-            event = (
-                service.events().get(calendarId=calendar_id, eventId=event_id).execute()
+            event = execute(
+                service.events().get(calendarId=calendar_id, eventId=event_id),
+                "events.get",
             )
         except Exception:
             return {
@@ -46,18 +69,33 @@ def edit_event(
                 "message": f"Event with ID {event_id} not found in primary calendar.",
             }
 
+        # Edit the series this occurrence was expanded from
+        if scope == "series" and event.get("recurringEventId"):
+            event = execute(
+                service.events().get(calendarId=calendar_id, eventId=event["recurringEventId"]),
+                "events.get",
+            )
+
+        if recurrence_lines:
+            if event.get("recurringEventId"):
+                return {
+                    "status": "error",
+                    "message": 'A single occurrence has no recurrence rule; use scope="series" to change it.',
+                }
+            event["recurrence"] = recurrence_lines
+
         # Update the event with new values
         if summary:
             event["summary"] = summary
 
-        # Get timezone from the original event
-        timezone_id = "America/New_York"  # Default
-        if "start" in event and "timeZone" in event["start"]:
-            timezone_id = event["start"]["timeZone"]
+        # Get timezone from the original event, else the calendar's (cached)
+        timezone_id = event.get("start", {}).get("timeZone")
+        if not timezone_id and (start_time or end_time):
+            timezone_id = get_calendar_timezone(service, calendar_id)
 
         # Update start time if provided
         if start_time:
-            start_dt = parse_datetime(start_time)
+            start_dt = parse_datetime(start_time, timezone_id)
             if not start_dt:
                 return {
                     "status": "error",
@@ -67,7 +105,7 @@ def edit_event(
 
         # Update end time if provided
         if end_time:
-            end_dt = parse_datetime(end_time)
+            end_dt = parse_datetime(end_time, timezone_id)
             if not end_dt:
                 return {
                     "status": "error",
@@ -76,10 +114,9 @@ def edit_event(
             event["end"] = {"dateTime": end_dt.isoformat(), "timeZone": timezone_id}
 
         # Update the event
-        updated_event = (
-            service.events()
-            .update(calendarId=calendar_id, eventId=event_id, body=event)
-            .execute()
+        updated_event = execute(
+            service.events().update(calendarId=calendar_id, eventId=event["id"], body=event),
+            "events.update",
         )
 
         return {
@@ -87,6 +124,7 @@ def edit_event(
             "message": "Event updated successfully",
             "event_id": updated_event["id"],
             "event_link": updated_event.get("htmlLink", ""),
+            "recurrence": updated_event.get("recurrence", []),
         }
 
     except Exception as e:
@@ -0,0 +1,386 @@
+"""
+Local mirror of Google Calendar events, kept current with incremental sync.
+
+The first sync of a calendar downloads its events (series unexpanded) from
+CALENDAR_SYNC_WINDOW_DAYS ago onwards and stores the syncToken Google
+returns; every later sync sends that token and only transfers events that
+changed since. Reads of a date range inside the window are then answered
+from the mirror; earlier ranges go to the API. When Google is slow, reads wait at most
+CALENDAR_SYNC_TIMEOUT_S for the sync and otherwise serve the mirror as it
+is (marked stale) while the sync finishes in the background.
+
+Each row records when its event ends, so range reads can skip it: for a
+series that is the end of its last occurrence (UNTIL or COUNT, expanded
+with dateutil in the series' time zone). Series without either, or whose
+rule cannot be read, are treated as never ending.
+
+Rows are keyed by account (see calendar_utils) and calendar, so several
+signed-in users never see each other's events.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from dateutil.rrule import rrulestr
+from googleapiclient.errors import HttpError
+
+from .. import metrics
+from .calendar_utils import EVENTS_PAGE_SIZE, iter_pages
+
+CALENDAR_SYNC_ENABLED = os.getenv("CALENDAR_SYNC_ENABLED", "true").lower() == "true"
+CALENDAR_MIRROR_DB = os.getenv("CALENDAR_MIRROR_DB", "./calendar_mirror.db")
+CALENDAR_SYNC_TIMEOUT_S = float(os.getenv("CALENDAR_SYNC_TIMEOUT_S", "3"))
+# How far back the first (full) sync of a calendar reaches
+CALENDAR_SYNC_WINDOW_DAYS = float(os.getenv("CALENDAR_SYNC_WINDOW_DAYS", "90"))
+
+# Series without an end (no UNTIL or COUNT) overlap every range after their start
+_OPEN_END = "9999-12-31T00:00:00Z"
+
+
+def _utc_key(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _time_key(event_time: Dict[str, Any]) -> str:
+    """Sortable UTC text of an event start/end ("" if missing)."""
+    if "dateTime" in event_time:
+        return _utc_key(datetime.fromisoformat(event_time["dateTime"].replace("Z", "+00:00")))
+    if "date" in event_time:
+        return f"{event_time['date']}T00:00:00Z"
+    return ""
+
+
+def _series_zone(start: Dict[str, Any]) -> tzinfo:
+    """The zone a series recurs in: its timeZone, else the offset of its start."""
+    try:
+        return ZoneInfo(start["timeZone"])
+    except (KeyError, ValueError, ZoneInfoNotFoundError):
+        pass
+    if "dateTime" in start:
+        parsed = datetime.fromisoformat(start["dateTime"].replace("Z", "+00:00"))
+        if parsed.tzinfo is not None:
+            return parsed.tzinfo
+    return timezone.utc
+
+
+def _local_time(event_time: Dict[str, Any], zone: tzinfo) -> datetime:
+    """Naive wall-clock time of an event start/end in `zone`."""
+    if "dateTime" in event_time:
+        value = datetime.fromisoformat(event_time["dateTime"].replace("Z", "+00:00"))
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(zone).replace(tzinfo=None)
+    return datetime.strptime(event_time["date"], "%Y-%m-%d")
+
+
+def _until_local(value: str, zone: tzinfo) -> datetime:
+    """An RRULE UNTIL (UTC, floating or a date) as naive wall-clock time in `zone`."""
+    if value.endswith("Z"):
+        until = datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        return until.astimezone(zone).replace(tzinfo=None)
+    if "T" in value:
+        return datetime.strptime(value, "%Y%m%dT%H%M%S")
+    # A date: occurrences on that day are included
+    return datetime.strptime(value, "%Y%m%d") + timedelta(days=1, seconds=-1)
+
+
+def _series_end_key(event: Dict[str, Any]) -> str:
+    start, end = event.get("start", {}), event.get("end", {})
+    zone = _series_zone(start)
+    dtstart = _local_time(start, zone)
+    duration = _local_time(end, zone) - dtstart
+    last_end: Optional[datetime] = None
+    for line in event["recurrence"]:
+        kind, _, rule = line.partition(":")
+        kind = kind.split(";")[0].upper()
+        if kind == "RDATE":
+            # Extra dates are not expanded here
+            return _OPEN_END
+        if kind != "RRULE":
+            # EXDATE / EXRULE only remove occurrences
+            continue
+        parts, bounded = [], False
+        for part in rule.split(";"):
+            name, _, value = part.partition("=")
+            if name.upper() == "UNTIL":
+                part = "UNTIL=" + _until_local(value, zone).strftime("%Y%m%dT%H%M%S")
+                bounded = True
+            elif name.upper() == "COUNT":
+                bounded = True
+            parts.append(part)
+        if not bounded:
+            return _OPEN_END
+        last = None
+        for last in rrulestr(";".join(parts), dtstart=dtstart):
+            pass
+        if last is not None and (last_end is None or last + duration > last_end):
+            last_end = last + duration
+    if last_end is None:
+        return _time_key(end)
+    return _utc_key(last_end.replace(tzinfo=zone))
+
+
+def _end_key(event: Dict[str, Any]) -> str:
+    if not event.get("recurrence"):
+        return _time_key(event.get("end", {}))
+    try:
+        return _series_end_key(event)
+    except (ValueError, TypeError, KeyError, OverflowError) as e:
+        # Listed in every later range rather than lost, and the sync goes on
+        metrics.incr("calendar.sync.bad_recurrence")
+        print(f"Unreadable recurrence on event {event.get('id')}: {e}")
+        return _OPEN_END
+
+
+class EventMirror:
+    """SQLite copy of calendars' events plus their sync tokens."""
+
+    def __init__(self, db_path: str = CALENDAR_MIRROR_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        # Opened lazily; callers hold self._lock
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS calendar_sync (
+                    account      TEXT NOT NULL,
+                    calendar_id  TEXT NOT NULL,
+                    sync_token   TEXT,
+                    synced_at    REAL NOT NULL,
+                    window_start TEXT,
+                    PRIMARY KEY (account, calendar_id)
+                );
+                CREATE TABLE IF NOT EXISTS calendar_events (
+                    account     TEXT NOT NULL,
+                    calendar_id TEXT NOT NULL,
+                    event_id    TEXT NOT NULL,
+                    start_key   TEXT NOT NULL,
+                    end_key     TEXT NOT NULL,
+                    body        TEXT NOT NULL,
+                    PRIMARY KEY (account, calendar_id, event_id)
+                );
+                CREATE INDEX IF NOT EXISTS calendar_events_start
+                    ON calendar_events (account, calendar_id, start_key);
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(calendar_sync)")}
+            if "window_start" not in columns:
+                # Mirrors created before the sync window: they hold everything
+                self._conn.execute("ALTER TABLE calendar_sync ADD COLUMN window_start TEXT")
+            self._conn.commit()
+        return self._conn
+
+    def sync_state(self, account: str, calendar_id: str) -> Tuple[Optional[str], Optional[float]]:
+        """Returns (sync token, time of the last successful sync)."""
+        with self._lock:
+            row = self._db().execute(
+                "SELECT sync_token, synced_at FROM calendar_sync WHERE account = ? AND calendar_id = ?",
+                (account, calendar_id),
+            ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def covers(self, account: str, calendar_id: str, time_min: datetime) -> bool:
+        """Whether the mirror holds the calendar's events from time_min on."""
+        with self._lock:
+            row = self._db().execute(
+                "SELECT window_start FROM calendar_sync WHERE account = ? AND calendar_id = ?",
+                (account, calendar_id),
+            ).fetchone()
+        return row is not None and (row[0] is None or row[0] <= _utc_key(time_min))
+
+    def apply(
+        self,
+        account: str,
+        calendar_id: str,
+        events: List[Dict[str, Any]],
+        sync_token: Optional[str],
+        full: bool,
+        window_start: Optional[str] = None,
+    ) -> None:
+        """
+        Stores one sync's changes (all events if `full`) in a single transaction.
+        A full sync also records window_start, the UTC key it reached back to.
+        """
+        with self._lock:
+            db = self._db()
+            with db:
+                if full:
+                    db.execute(
+                        "DELETE FROM calendar_events WHERE account = ? AND calendar_id = ?",
+                        (account, calendar_id),
+                    )
+                for event in events:
+                    if event.get("status") == "cancelled":
+                        db.execute(
+                            "DELETE FROM calendar_events WHERE account = ? AND calendar_id = ? AND event_id = ?",
+                            (account, calendar_id, event["id"]),
+                        )
+                        continue
+                    try:
+                        start_key, end_key = _time_key(event.get("start", {})), _end_key(event)
+                    except (ValueError, TypeError, KeyError) as e:
+                        # One malformed event must not stop the calendar from syncing
+                        metrics.incr("calendar.sync.skipped_events")
+                        print(f"Skipping event {event.get('id')} in the mirror: {e}")
+                        continue
+                    db.execute(
+                        """
+                        INSERT OR REPLACE INTO calendar_events
+                            (account, calendar_id, event_id, start_key, end_key, body)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        """,
+                        (
+                            account,
+                            calendar_id,
+                            event["id"],
+                            start_key,
+                            end_key,
+                            json.dumps(event),
+                        ),
+                    )
+                if full:
+                    db.execute(
+                        """
+                        INSERT OR REPLACE INTO calendar_sync
+                            (account, calendar_id, sync_token, synced_at, window_start)
+                        VALUES (?, ?, ?, ?, ?)
+                        """,
+                        (account, calendar_id, sync_token, time.time(), window_start),
+                    )
+                else:
+                    db.execute(
+                        """
+                        UPDATE calendar_sync SET sync_token = ?, synced_at = ?
+                        WHERE account = ? AND calendar_id = ?
+                        """,
+                        (sync_token, time.time(), account, calendar_id),
+                    )
+
+    def events_between(
+        self,
+        account: str,
+        calendar_id: str,
+        time_min: datetime,
+        time_max: datetime,
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """Events (series unexpanded) overlapping [time_min, time_max), by start."""
+        with self._lock:
+            rows = self._db().execute(
+                """
+                SELECT body FROM calendar_events
+                WHERE account = ? AND calendar_id = ? AND start_key < ? AND end_key > ?
+                ORDER BY start_key LIMIT ?
+                """,
+                (account, calendar_id, _utc_key(time_max), _utc_key(time_min), limit),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Process-wide instance used by list_events
+event_mirror = EventMirror()
+
+
+def sync_calendar(service: Any, calendar_id: str, mirror: EventMirror = event_mirror) -> int:
+    """
+    Brings the mirror of one calendar up to date.
+
+    Returns:
+        int: Number of changed (or, on a full sync, downloaded) events
+    """
+    sync_token, _ = mirror.sync_state(service.account, calendar_id)
+    query: Dict[str, Any] = {
+        "calendarId": calendar_id,
+        "singleEvents": False,
+        "maxResults": EVENTS_PAGE_SIZE,
+    }
+    # A full sync only reaches back this far; Google does not allow timeMin
+    # next to a syncToken, later syncs carry every change regardless
+    window_start = _utc_key(datetime.now(timezone.utc) - timedelta(days=CALENDAR_SYNC_WINDOW_DAYS))
+    if sync_token:
+        query["syncToken"] = sync_token
+    else:
+        query["timeMin"] = window_start
+
+    try:
+        pages = list(iter_pages(service.events().list, "events.list", **query))
+    except HttpError as e:
+        if e.resp.status != 410 or not sync_token:
+            raise
+        # Google expired the token: start over with a full sync
+        metrics.incr("calendar.sync.full_resyncs")
+        query.pop("syncToken")
+        query["timeMin"] = window_start
+        sync_token = None
+        pages = list(iter_pages(service.events().list, "events.list", **query))
+
+    events = [event for page in pages for event in page.get("items", [])]
+    mirror.apply(
+        service.account,
+        calendar_id,
+        events,
+        pages[-1].get("nextSyncToken"),
+        full=not sync_token,
+        window_start=window_start,
+    )
+    metrics.incr("calendar.sync.full" if not sync_token else "calendar.sync.incremental")
+    metrics.observe("calendar.sync.events", len(events))
+    return len(events)
+
+
+# Syncs run here so a caller can stop waiting without abandoning the sync
+_sync_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="calendar-sync")
+_syncs_lock = threading.Lock()
+_syncs: Dict[Tuple[str, str], Future] = {}
+
+
+def refresh_mirror(
+    service: Any,
+    calendar_id: str,
+    timeout_s: float = CALENDAR_SYNC_TIMEOUT_S,
+    mirror: EventMirror = event_mirror,
+) -> bool:
+    """
+    Syncs a calendar, waiting at most `timeout_s`. Concurrent callers share
+    one sync.
+
+    Returns:
+        bool: True if the mirror is now current, False if the sync failed or
+        is still running
+    """
+    key = (service.account, calendar_id)
+    with _syncs_lock:
+        future = _syncs.get(key)
+        if future is None or future.done():
+            future = _syncs[key] = _sync_executor.submit(sync_calendar, service, calendar_id, mirror)
+    try:
+        future.result(timeout=timeout_s)
+        return True
+    except FutureTimeoutError:
+        metrics.incr("calendar.sync.timeouts")
+        return False
+    except Exception as e:
+        metrics.incr("calendar.sync.errors")
+        print(f"Calendar sync failed for {calendar_id}: {e}")
+        return False
@@ -0,0 +1,514 @@
+"""
+In-process stand-in for the Google Calendar v3 REST API.
+
+Serves the endpoints the calendar tools use (calendars.get, settings.list,
+events list/get/insert/update/patch/delete, incremental sync tokens and the
+batch endpoint) over real HTTP on 127.0.0.1, so requests go through the same
+googleapiclient/httplib2 path as in production. Latency, error rate and a
+per-minute quota can be injected to see how the tools behave under load.
+
+Enable it with CALENDAR_FAKE_API=true (see calendar_utils): no Google account,
+token file or network is needed. Settings:
+    CALENDAR_FAKE_LATENCY_MS   added to every HTTP request (default 0)
+    CALENDAR_FAKE_JITTER_MS    random extra latency, 0..jitter (default 0)
+    CALENDAR_FAKE_ERROR_RATE   share of calls answered 503 backendError (default 0)
+    CALENDAR_FAKE_QUOTA_PER_MIN  calls per minute before 403 rateLimitExceeded
+                               (default 0 = unlimited)
+    CALENDAR_FAKE_TIMEZONE     time zone of every calendar (default UTC)
+
+Recurring events support FREQ=DAILY and FREQ=WEEKLY (with BYDAY, INTERVAL,
+COUNT and UNTIL); other rules are stored but not expanded.
+"""
+
+import copy
+import email.parser
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+CALENDAR_FAKE_LATENCY_MS = float(os.getenv("CALENDAR_FAKE_LATENCY_MS", "0"))
+CALENDAR_FAKE_JITTER_MS = float(os.getenv("CALENDAR_FAKE_JITTER_MS", "0"))
+CALENDAR_FAKE_ERROR_RATE = float(os.getenv("CALENDAR_FAKE_ERROR_RATE", "0"))
+CALENDAR_FAKE_QUOTA_PER_MIN = int(os.getenv("CALENDAR_FAKE_QUOTA_PER_MIN", "0"))
+CALENDAR_FAKE_TIMEZONE = os.getenv("CALENDAR_FAKE_TIMEZONE", "UTC")
+
+_MAX_INSTANCES = 1000
+_WEEKDAY_CODES = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+_EVENT_PATH = re.compile(r"/calendar/v3/calendars/([^/]+)/events(?:/([^/]+))?$")
+_CALENDAR_PATH = re.compile(r"/calendar/v3/calendars/([^/]+)$")
+
+
+class ApiError(Exception):
+    """An error response in the Calendar API's JSON shape."""
+
+    def __init__(self, status: int, reason: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.message = message
+
+    def body(self) -> Dict[str, Any]:
+        return {
+            "error": {
+                "code": self.status,
+                "message": self.message,
+                "errors": [{"domain": "global", "reason": self.reason, "message": self.message}],
+            }
+        }
+
+
+def _parse_time(event_time: Dict[str, Any]) -> Optional[datetime]:
+    if "dateTime" in event_time:
+        parsed = datetime.fromisoformat(event_time["dateTime"].replace("Z", "+00:00"))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    if "date" in event_time:
+        return datetime.fromisoformat(event_time["date"]).replace(tzinfo=timezone.utc)
+    return None
+
+
+def _parse_query_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _rule(event: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    for line in event.get("recurrence") or []:
+        if line.upper().startswith("RRULE:"):
+            return dict(part.split("=", 1) for part in line[6:].upper().split(";") if "=" in part)
+    return None
+
+
+def _occurrences(event: Dict[str, Any], window_end: Optional[datetime]) -> Iterator[datetime]:
+    """Start times of a recurring event (simple DAILY/WEEKLY rules)."""
+    start = _parse_time(event.get("start", {}))
+    rule = _rule(event)
+    if start is None or rule is None or rule.get("FREQ") not in ("DAILY", "WEEKLY"):
+        if start is not None:
+            yield start
+        return
+    interval = int(rule.get("INTERVAL", "1"))
+    count = int(rule["COUNT"]) if "COUNT" in rule else None
+    until = None
+    if "UNTIL" in rule:
+        value = rule["UNTIL"]
+        until = datetime.strptime(value, "%Y%m%dT%H%M%SZ" if "T" in value else "%Y%m%d").replace(tzinfo=timezone.utc)
+    by_day = None
+    if rule["FREQ"] == "WEEKLY" and "BYDAY" in rule:
+        by_day = {_WEEKDAY_CODES[code[-2:]] for code in rule["BYDAY"].split(",") if code[-2:] in _WEEKDAY_CODES}
+
+    produced = 0
+    candidate = start
+    step = timedelta(days=1) if rule["FREQ"] == "DAILY" or by_day else timedelta(weeks=1)
+    while produced < _MAX_INSTANCES:
+        if count is not None and produced >= count:
+            return
+        if until is not None and candidate > until:
+            return
+        if window_end is not None and candidate >= window_end:
+            return
+        days = (candidate.date() - start.date()).days
+        if by_day is not None:
+            matches = candidate.weekday() in by_day and (days // 7) % interval == 0
+        elif rule["FREQ"] == "DAILY":
+            matches = days % interval == 0
+        else:
+            matches = (days // 7) % interval == 0
+        if matches:
+            produced += 1
+            yield candidate
+        candidate += step
+
+
+def _instance_id(master_id: str, start: datetime) -> str:
+    return f"{master_id}_{start.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}"
+
+
+def _with_start(event_time: Dict[str, Any], moment: datetime, original: Optional[datetime]) -> Dict[str, Any]:
+    shifted = dict(event_time)
+    if "dateTime" in event_time and original is not None:
+        shifted["dateTime"] = moment.astimezone(original.tzinfo).isoformat()
+    elif "date" in event_time:
+        shifted["date"] = moment.date().isoformat()
+    return shifted
+
+
+class FakeCalendarApi:
+    """The fake API's state and request handling, plus its HTTP server."""
+
+    def __init__(
+        self,
+        latency_ms: float = CALENDAR_FAKE_LATENCY_MS,
+        jitter_ms: float = CALENDAR_FAKE_JITTER_MS,
+        error_rate: float = CALENDAR_FAKE_ERROR_RATE,
+        quota_per_minute: int = CALENDAR_FAKE_QUOTA_PER_MIN,
+        timezone_id: str = CALENDAR_FAKE_TIMEZONE,
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.quota_per_minute = quota_per_minute
+        self.timezone_id = timezone_id
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # calendar id -> event id -> event (deleted events stay, status "cancelled")
+        self._events: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._sequence = 0
+        self._recent_calls: Deque[float] = deque()
+        self._forced_errors: Deque[ApiError] = deque()
+        self.calls: Counter = Counter()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # ───────────────────────────── server ─────────────────────────────
+    def start(self) -> str:
+        """Starts serving on a free local port; returns the API root URL."""
+        if self._server is None:
+            api = self
+
+            class Handler(_Handler):
+                fake = api
+
+            self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+            self._server.daemon_threads = True
+            threading.Thread(
+                target=self._server.serve_forever, name="fake-calendar-api", daemon=True
+            ).start()
+        return self.root_url
+
+    @property
+    def root_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    # ───────────────────────────── controls ─────────────────────────────
+    def fail_next(self, status: int = 503, reason: str = "backendError", times: int = 1) -> None:
+        """Makes the next `times` calls fail with the given error."""
+        with self._lock:
+            for _ in range(times):
+                self._forced_errors.append(ApiError(status, reason, f"Injected {reason}"))
+
+    def reset(self) -> None:
+        """Drops all events and call counts."""
+        with self._lock:
+            self._events.clear()
+            self._recent_calls.clear()
+            self._forced_errors.clear()
+            self.calls.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.calls)
+
+    # ───────────────────────────── requests ─────────────────────────────
+    def _admit(self, operation: str) -> None:
+        """Counts a call and applies injected errors and quota."""
+        with self._lock:
+            self.calls[operation] += 1
+            self.calls["total"] += 1
+            if self._forced_errors:
+                self.calls["errors"] += 1
+                raise self._forced_errors.popleft()
+            if self.quota_per_minute:
+                now = time.monotonic()
+                while self._recent_calls and now - self._recent_calls[0] > 60:
+                    self._recent_calls.popleft()
+                if len(self._recent_calls) >= self.quota_per_minute:
+                    self.calls["quota_exceeded"] += 1
+                    raise ApiError(403, "rateLimitExceeded", "Rate Limit Exceeded")
+                self._recent_calls.append(now)
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.calls["errors"] += 1
+                raise ApiError(503, "backendError", "Backend Error")
+
+    def _delay(self) -> None:
+        delay_ms = self.latency_ms
+        if self.jitter_ms:
+            delay_ms += self._random.uniform(0, self.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def handle(self, method: str, target: str, body: bytes, content_type: str = "") -> Tuple[int, Any, Dict[str, str]]:
+        """Answers one HTTP request: (status, JSON payload or raw bytes, extra headers)."""
+        self._delay()
+        path = urlsplit(target).path
+        if method == "POST" and path.rstrip("/") == "/batch/calendar/v3":
+            with self._lock:
+                self.calls["batch"] += 1
+            return self._batch(body, content_type)
+        status, payload = self._call(method, target, body)
+        return status, payload, {}
+
+    def _call(self, method: str, target: str, body: bytes) -> Tuple[int, Optional[Dict[str, Any]]]:
+        parts = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        path = unquote(parts.path)
+        try:
+            data = json.loads(body) if body else {}
+            match = _EVENT_PATH.match(path)
+            if match:
+                calendar_id, event_id = match.groups()
+                if event_id is None:
+                    if method == "GET":
+                        self._admit("events.list")
+                        return 200, self._list(calendar_id, query)
+                    if method == "POST":
+                        self._admit("events.insert")
+                        return 200, self._insert(calendar_id, data)
+                elif method == "GET":
+                    self._admit("events.get")
+                    return 200, self._get(calendar_id, event_id)
+                elif method in ("PUT", "PATCH"):
+                    self._admit("events.update" if method == "PUT" else "events.patch")
+                    return 200, self._update(calendar_id, event_id, data, replace=method == "PUT")
+                elif method == "DELETE":
+                    self._admit("events.delete")
+                    self._delete(calendar_id, event_id)
+                    return 204, None
+            match = _CALENDAR_PATH.match(path)
+            if match and method == "GET":
+                self._admit("calendars.get")
+                return 200, {"kind": "calendar#calendar", "id": match.group(1), "timeZone": self.timezone_id}
+            if path == "/calendar/v3/users/me/settings" and method == "GET":
+                self._admit("settings.list")
+                return 200, {"items": [{"id": "timezone", "value": self.timezone_id}]}
+            raise ApiError(404, "notFound", f"No route for {method} {path}")
+        except ApiError as e:
+            return e.status, e.body()
+        except (ValueError, KeyError) as e:
+            return 400, ApiError(400, "invalid", f"Bad request: {e}").body()
+
+    def _batch(self, body: bytes, content_type: str) -> Tuple[int, bytes, Dict[str, str]]:
+        message = email.parser.BytesParser().parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        boundary = f"batch_{uuid.uuid4().hex}"
+        chunks = []
+        for part in message.get_payload():
+            raw = part.get_payload(decode=True) or part.get_payload().encode()
+            head, _, inner_body = raw.partition(b"\r\n\r\n")
+            if not _:
+                head, _, inner_body = raw.partition(b"\n\n")
+            request_line = head.splitlines()[0].decode()
+            inner_method, inner_target = request_line.split(" ")[:2]
+            status, payload = self._call(inner_method, inner_target, inner_body.strip())
+            text = json.dumps(payload) if payload is not None else ""
+            chunks.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{part['Content-ID'].strip('<>')}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n\r\n{text}\r\n"
+            )
+        chunks.append(f"--{boundary}--\r\n")
+        return 200, "".join(chunks).encode(), {"Content-Type": f"multipart/mixed; boundary={boundary}"}
+
+    # ───────────────────────────── events ─────────────────────────────
+    def _calendar(self, calendar_id: str) -> Dict[str, Dict[str, Any]]:
+        return self._events.setdefault(calendar_id, {})
+
+    def _stamp(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        self._sequence += 1
+        event["_sequence"] = self._sequence
+        event["updated"] = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        return event
+
+    @staticmethod
+    def _public(event: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in event.items() if not key.startswith("_")}
+
+    def _insert(self, calendar_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        if "start" not in data or "end" not in data:
+            raise ApiError(400, "required", "Missing end time.")
+        event_id = uuid.uuid4().hex
+        event = copy.deepcopy(data)
+        event.update({
+            "kind": "calendar#event",
+            "id": event_id,
+            "status": "confirmed",
+            "htmlLink": f"https://calendar.example/event?eid={event_id}",
+        })
+        with self._lock:
+            self._calendar(calendar_id)[event_id] = self._stamp(event)
+            return self._public(event)
+
+    def _instance(self, calendar_id: str, event_id: str) -> Optional[Dict[str, Any]]:
+        """An unmodified occurrence of a series, built from its ID."""
+        master_id, _, stamp = event_id.rpartition("_")
+        master = self._calendar(calendar_id).get(master_id)
+        if not master_id or master is None or master.get("status") == "cancelled":
+            return None
+        for moment in _occurrences(master, None):
+            if _instance_id(master_id, moment) == event_id:
+                return self._make_instance(master, moment)
+            if f"{moment.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}" > stamp:
+                break
+        return None
+
+    def _make_instance(self, master: Dict[str, Any], moment: datetime) -> Dict[str, Any]:
+        original = _parse_time(master["start"])
+        end = _parse_time(master["end"])
+        instance = {key: value for key, value in master.items() if key != "recurrence"}
+        instance.update({
+            "id": _instance_id(master["id"], moment),
+            "recurringEventId": master["id"],
+            "originalStartTime": _with_start(master["start"], moment, original),
+            "start": _with_start(master["start"], moment, original),
+            "end": _with_start(master["end"], moment + (end - original), original),
+        })
+        return instance
+
+    def _get(self, calendar_id: str, event_id: str) -> Dict[str, Any]:
+        with self._lock:
+            event = self._calendar(calendar_id).get(event_id) or self._instance(calendar_id, event_id)
+            if event is None:
+                raise ApiError(404, "notFound", "Not Found")
+            return self._public(event)
+
+    def _update(self, calendar_id: str, event_id: str, data: Dict[str, Any], replace: bool) -> Dict[str, Any]:
+        with self._lock:
+            events = self._calendar(calendar_id)
+            current = events.get(event_id) or self._instance(calendar_id, event_id)
+            if current is None or current.get("status") == "cancelled":
+                raise ApiError(404, "notFound", "Not Found")
+            keep = {key: current[key] for key in ("kind", "id", "htmlLink", "recurringEventId", "originalStartTime") if key in current}
+            updated = {**copy.deepcopy(data), **keep} if replace else {**current, **copy.deepcopy(data), **keep}
+            updated["status"] = "confirmed"
+            events[event_id] = self._stamp(updated)
+            return self._public(updated)
+
+    def _delete(self, calendar_id: str, event_id: str) -> None:
+        with self._lock:
+            events = self._calendar(calendar_id)
+            event = events.get(event_id) or self._instance(calendar_id, event_id)
+            if event is None:
+                raise ApiError(404, "notFound", "Not Found")
+            if event.get("status") == "cancelled":
+                raise ApiError(410, "deleted", "Resource has been deleted")
+            events[event_id] = self._stamp({**event, "status": "cancelled"})
+
+    def _list(self, calendar_id: str, query: Dict[str, str]) -> Dict[str, Any]:
+        page_size = min(int(query.get("maxResults", "250")), 2500)
+        offset = int(query.get("pageToken", "0"))
+        with self._lock:
+            events = list(self._calendar(calendar_id).values())
+            sequence = self._sequence
+            if "syncToken" in query:
+                try:
+                    since = int(query["syncToken"])
+                except ValueError:
+                    raise ApiError(410, "fullSyncRequired", "Sync token is no longer valid")
+                items = [e for e in events if e["_sequence"] > since]
+            else:
+                items = self._window(events, query)
+            items = [self._public(e) for e in items]
+
+        page = {"kind": "calendar#events", "timeZone": self.timezone_id, "items": items[offset:offset + page_size]}
+        if offset + page_size < len(items):
+            page["nextPageToken"] = str(offset + page_size)
+        else:
+            page["nextSyncToken"] = str(sequence)
+        return page
+
+    def _window(self, events: List[Dict[str, Any]], query: Dict[str, str]) -> List[Dict[str, Any]]:
+        time_min = _parse_query_time(query.get("timeMin"))
+        time_max = _parse_query_time(query.get("timeMax"))
+        expand = query.get("singleEvents") == "true"
+        show_deleted = query.get("showDeleted") == "true"
+        stored = {e["id"]: e for e in events}
+
+        def overlaps(start: Optional[datetime], end: Optional[datetime]) -> bool:
+            return (time_max is None or start < time_max) and (time_min is None or end > time_min)
+
+        items = []
+        for event in events:
+            cancelled = event.get("status") == "cancelled"
+            if event.get("recurrence"):
+                if cancelled and not show_deleted:
+                    continue
+                start = _parse_time(event["start"])
+                duration = _parse_time(event["end"]) - start
+                if not expand:
+                    last = None
+                    for last in _occurrences(event, time_max):
+                        pass
+                    if last is not None and overlaps(start, last + duration):
+                        items.append(event)
+                    continue
+                for moment in _occurrences(event, time_max):
+                    instance = stored.get(_instance_id(event["id"], moment))
+                    if instance is None:
+                        instance = self._make_instance(event, moment)
+                    if instance.get("status") == "cancelled" or instance.get("recurringEventId") is None:
+                        continue
+                    if overlaps(_parse_time(instance["start"]), _parse_time(instance["end"])):
+                        items.append(instance)
+                continue
+            if event.get("recurringEventId") and expand:
+                # Modified occurrences are emitted with their series
+                continue
+            if cancelled and not show_deleted:
+                continue
+            if overlaps(_parse_time(event.get("start", {})), _parse_time(event.get("end", {}))):
+                items.append(event)
+
+        if query.get("orderBy") == "startTime":
+            items.sort(key=lambda e: _parse_time(e.get("start", {})))
+        return items
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake: FakeCalendarApi
+
+    def _respond(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        status, payload, headers = self.fake.handle(
+            self.command, self.path, body, self.headers.get("Content-Type", "")
+        )
+        if isinstance(payload, bytes):
+            data = payload
+        else:
+            data = json.dumps(payload).encode() if payload is not None else b""
+            headers.setdefault("Content-Type", "application/json; charset=UTF-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+_shared: Optional[FakeCalendarApi] = None
+_shared_lock = threading.Lock()
+
+
+def shared_fake_api() -> FakeCalendarApi:
+    """The process-wide fake used when CALENDAR_FAKE_API=true (started on first use)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = FakeCalendarApi()
+            _shared.start()
+        return _shared
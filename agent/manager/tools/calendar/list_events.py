@@ -3,13 +3,25 @@ List events tool for Google Calendar integration.
 """
 
 import datetime
+import os
 
-from .calendar_utils import format_event_time, get_calendar_service
+from .calendar_utils import format_event_time, get_calendar_service, iter_events
+from .event_mirror import CALENDAR_SYNC_ENABLED, event_mirror, refresh_mirror
+
+# Most events returned in one call; longer ranges are read page by page up to this
+CALENDAR_LIST_MAX_EVENTS = int(os.getenv("CALENDAR_LIST_MAX_EVENTS", "250"))
+
+
+def _start_key(event: dict) -> str:
+    # All-day events carry a date, timed ones a dateTime; both sort as text
+    start = event.get("start", {})
+    return start.get("dateTime") or start.get("date") or ""
 
 
 def list_events(
     start_date: str,
     days: int,
+    expand_recurring: bool = False,
 ) -> dict:
     """
     List upcoming calendar events within a specified date range.
@@ -17,6 +29,9 @@ def list_events(
     Args:
         start_date (str): Start date in YYYY-MM-DD format. If empty string, defaults to today.
         days (int): Number of days to look ahead. Use 1 for today only, 7 for a week, 30 for a month, etc.
+        expand_recurring (bool): False (default) lists each recurring series once, with its
+            recurrence rule. True lists every occurrence separately, with its own ID; use that
+            to edit or delete a single occurrence.
 
     Returns:
         dict: Information about upcoming events or error details
@@ -34,8 +49,7 @@ def list_events(
                 "events": [],
             }
 
-        # Always use a large max_results value to return all events
-        max_results = 100
+        max_results = CALENDAR_LIST_MAX_EVENTS
 
         # Always use primary calendar
         calendar_id = "primary"
@@ -63,26 +77,51 @@ def list_events(
         time_min = start_time.isoformat() + "Z"
         time_max = end_time.isoformat() + "Z"
 
-        # Call the Calendar API
-        events_result = (
-            service.events()
-            .list(
-                calendarId=calendar_id,
-                timeMin=time_min,
-                timeMax=time_max,
-                maxResults=max_results,
-                singleEvents=True,
-                orderBy="startTime",
-            )
-            .execute()
-        )
-
-        events = events_result.get("items", [])
+        # One more than shown, to tell whether the range was cut off
+        events = None
+        stale_since = None
+        if CALENDAR_SYNC_ENABLED and not expand_recurring:
+            # Read from the local mirror after an incremental sync; if Google
+            # is slow, answer from the mirror as of its last sync
+            fresh = refresh_mirror(service, calendar_id)
+            _, synced_at = event_mirror.sync_state(service.account, calendar_id)
+            if synced_at is not None and event_mirror.covers(service.account, calendar_id, start_time):
+                events = event_mirror.events_between(
+                    service.account, calendar_id, start_time, end_time, max_results + 1
+                )
+                if not fresh:
+                    stale_since = synced_at
+
+        if events is None:
+            # Call the Calendar API. Unexpanded, a series is returned once
+            # (plus any occurrences that were changed individually)
+            query = {
+                "calendarId": calendar_id,
+                "timeMin": time_min,
+                "timeMax": time_max,
+                "singleEvents": expand_recurring,
+            }
+            if expand_recurring:
+                # The API can only order expanded results
+                query["orderBy"] = "startTime"
+            events = list(iter_events(service, max_results + 1, **query))
+            if not expand_recurring:
+                events.sort(key=_start_key)
+
+        truncated = len(events) > max_results
+        events = events[:max_results]
+
+        notes = ""
+        if truncated:
+            notes += f" Only the first {max_results} are shown; ask for a shorter range to see the rest."
+        if stale_since is not None:
+            synced = datetime.datetime.fromtimestamp(stale_since).strftime("%Y-%m-%d %H:%M")
+            notes += f" Google Calendar is slow to respond, so this is the calendar as of {synced}."
 
         if not events:
             return {
                 "status": "success",
-                "message": "No upcoming events found.",
+                "message": "No upcoming events found." + notes,
                 "events": [],
             }
 
@@ -103,12 +142,17 @@ def list_events(
                 ],
                 "link": event.get("htmlLink", ""),
             }
+            if event.get("recurrence"):
+                formatted_event["recurrence"] = event["recurrence"]
+            if event.get("recurringEventId"):
+                formatted_event["series_id"] = event["recurringEventId"]
             formatted_events.append(formatted_event)
 
         return {
             "status": "success",
-            "message": f"Found {len(formatted_events)} event(s).",
+            "message": f"Found {len(formatted_events)} event(s)." + notes,
             "events": formatted_events,
+            "truncated": truncated,
         }
 
     except Exception as e:
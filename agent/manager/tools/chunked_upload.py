@@ -0,0 +1,368 @@
+# ───────────────────────────────────────────────────────────────
+# ChunkedUpload – resumable, memory-capped PDF uploads over the WebSocket
+# Lets large reports arrive as numbered chunks instead of one frame
+# ───────────────────────────────────────────────────────────────
+# Protocol (text frames are JSON; every reply is an `upload_ack` or
+# `upload_error` carrying the next chunk index the server expects):
+#   → {"type": "upload_start", "upload_id", "filename", "total_size"}
+#   ← {"type": "upload_ack", "upload_id", "next_chunk": 0}
+#   → {"type": "upload_chunk", "upload_id", "index": 0}   + one binary frame
+#   ← {"type": "upload_ack", "upload_id", "next_chunk": 1}
+#   …
+#   → {"type": "upload_finalize", "upload_id"}
+#   ← {"type": "upload_ack", "upload_id", "next_chunk": n, "complete": true}
+# Duplicate chunks are acknowledged again, out-of-order chunks are
+# answered with the index to resend. After a disconnect the upload is
+# parked for UPLOAD_RESUME_TTL_S; repeating `upload_start` with the
+# same upload_id (same user) resumes at the last acknowledged chunk.
+#
+# Memory is reserved up front from the declared total_size and capped
+# per connection (UPLOAD_MAX_CONNECTION_BYTES) and per worker process
+# (UPLOAD_MAX_WORKER_BYTES), also when a parked upload is resumed. A
+# prefix extraction copies the received bytes twice (the snapshot and
+# its pickled form sent to the worker); those copies count against the
+# same caps until the worker is done with them, and it is skipped if
+# they do not fit. A running prefix extraction is never cancelled (the
+# process-pool worker would keep its copy anyway): an upload discarded
+# meanwhile stays accounted until the extraction returns. A finalized
+# upload keeps its total_size reserved until main.py calls release()
+# after extracting it.
+# Parked uploads are dropped UPLOAD_RESUME_TTL_S after their connection
+# closed, whether or not anything else happens on the worker.
+#
+# While chunks arrive, pages are extracted from the received prefix
+# every UPLOAD_PREFIX_STEP_BYTES. A page is kept once two successive
+# prefixes agree on it; at finalize PdfExtractionStage.extract reuses
+# those pages, after checking each against the complete file (an
+# incremental update may redefine a page later on), and only extracts
+# the rest.
+# Metrics: upload.reserved_bytes (gauge), upload.started / .resumed /
+#          .rejected / .completed / .expired, upload.prefix_pages,
+#          upload.prefix_skipped_memory
+# ───────────────────────────────────────────────────────────────
+
+from __future__ import annotations
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from . import metrics
+from .pdf_extraction import PdfExtractionStage
+
+UPLOAD_MAX_CONNECTION_BYTES = int(os.getenv("UPLOAD_MAX_CONNECTION_BYTES", str(32 * 1024 * 1024)))
+UPLOAD_MAX_WORKER_BYTES = int(os.getenv("UPLOAD_MAX_WORKER_BYTES", str(256 * 1024 * 1024)))
+UPLOAD_RESUME_TTL_S = float(os.getenv("UPLOAD_RESUME_TTL_S", "600"))
+UPLOAD_PREFIX_STEP_BYTES = int(os.getenv("UPLOAD_PREFIX_STEP_BYTES", str(512 * 1024)))
+
+# Smaller uploads are extracted in one go once complete
+UPLOAD_PREFIX_MIN_BYTES = int(os.getenv("UPLOAD_PREFIX_MIN_BYTES", str(1024 * 1024)))
+
+
+class UploadError(ValueError):
+    """Raised when an upload message cannot be accepted."""
+
+    def __init__(self, message: str, next_chunk: Optional[int] = None):
+        super().__init__(message)
+        self.next_chunk = next_chunk
+
+
+class ChunkedUpload:
+    """State of one in-flight upload."""
+
+    def __init__(self, owner: str, upload_id: str, filename: str, total_size: int, role: str):
+        self.owner = owner
+        self.upload_id = upload_id
+        self.filename = filename
+        self.total_size = total_size
+        self.role = role
+        self.buffer = bytearray()
+        self.next_chunk = 0
+        self.connection_id: Optional[str] = None
+        self.parked_at: Optional[float] = None
+        # Pages agreed on by two successive prefix extractions
+        self.pages: List[Dict[str, Any]] = []
+        self._candidates: Dict[int, Dict[str, Any]] = {}
+        self._prefix_size = 0
+        self._prefix_task: Optional[asyncio.Task] = None
+        # Reserved for the buffer, then for the finalized file until release()
+        self.buffer_bytes = total_size
+        # Copies of the buffer held by the running prefix extraction
+        self.prefix_bytes = 0
+
+    @property
+    def received(self) -> int:
+        return len(self.buffer)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.buffer_bytes + self.prefix_bytes
+
+    def ack(self, **extra) -> Dict[str, Any]:
+        return {"type": "upload_ack", "upload_id": self.upload_id, "next_chunk": self.next_chunk, **extra}
+
+    def accept_prefix_pages(self, start_page: int, pages: List[Dict[str, Any]]) -> None:
+        """Keeps pages that match the previous prefix; the rest become candidates."""
+        candidates = {}
+        for offset, page in enumerate(pages):
+            index = start_page + offset
+            previous = self._candidates.get(index)
+            stable = (
+                previous is not None
+                and previous["xref"] == page["xref"]
+                and previous["fingerprint"] == page["fingerprint"]
+                and previous["text"] == page["text"]
+                and page["text"].strip()
+            )
+            if stable and index == len(self.pages):
+                self.pages.append(page)
+            else:
+                candidates[index] = page
+        self._candidates = candidates
+
+
+class UploadRegistry:
+    """Per-worker registry of chunked uploads, used only from the event loop."""
+
+    def __init__(
+        self,
+        extraction_stage: PdfExtractionStage,
+        max_connection_bytes: int = UPLOAD_MAX_CONNECTION_BYTES,
+        max_worker_bytes: int = UPLOAD_MAX_WORKER_BYTES,
+        resume_ttl_s: float = UPLOAD_RESUME_TTL_S,
+        prefix_step_bytes: int = UPLOAD_PREFIX_STEP_BYTES,
+        prefix_min_bytes: int = UPLOAD_PREFIX_MIN_BYTES,
+    ):
+        self.extraction_stage = extraction_stage
+        self.max_connection_bytes = max_connection_bytes
+        self.max_worker_bytes = max_worker_bytes
+        self.resume_ttl_s = resume_ttl_s
+        self.prefix_step_bytes = prefix_step_bytes
+        self.prefix_min_bytes = prefix_min_bytes
+        self._uploads: Dict[Tuple[str, str], ChunkedUpload] = {}
+        # Finalized or discarded uploads whose memory is still in use
+        self._held: Set[ChunkedUpload] = set()
+
+    def _accounted(self) -> List[ChunkedUpload]:
+        return [*self._uploads.values(), *self._held]
+
+    @property
+    def reserved_bytes(self) -> int:
+        return sum(upload.memory_bytes for upload in self._accounted())
+
+    def _connection_bytes(self, connection_id: str) -> int:
+        return sum(
+            upload.memory_bytes for upload in self._accounted()
+            if upload.connection_id == connection_id
+        )
+
+    def _update_gauge(self) -> None:
+        metrics.set_gauge("upload.reserved_bytes", self.reserved_bytes)
+
+    def _reject(self, message: str, next_chunk: Optional[int] = None) -> UploadError:
+        metrics.incr("upload.rejected")
+        return UploadError(message, next_chunk)
+
+    def expire(self) -> None:
+        """Drops parked uploads whose resume window has passed."""
+        now = time.monotonic()
+        expired = [
+            key for key, upload in self._uploads.items()
+            if upload.parked_at is not None and now - upload.parked_at > self.resume_ttl_s
+        ]
+        for key in expired:
+            self.discard(self._uploads[key])
+        if expired:
+            metrics.incr("upload.expired", len(expired))
+            self._update_gauge()
+
+    def start(self, owner: str, connection_id: str, message: Dict[str, Any]) -> ChunkedUpload:
+        """
+        Handles `upload_start`: registers a new upload or resumes a parked one.
+
+        Args:
+            owner: str -> The user the upload belongs to
+            connection_id: str -> The WebSocket connection sending the chunks
+            message: Dict -> The upload_start message
+
+        Raises:
+            UploadError: If the message is invalid or a memory cap would be exceeded
+        """
+        self.expire()
+        upload_id = str(message.get("upload_id") or "")
+        try:
+            total_size = int(message.get("total_size"))
+        except (TypeError, ValueError):
+            raise self._reject("upload_start needs an integer total_size") from None
+        if not upload_id or total_size <= 0:
+            raise self._reject("upload_start needs an upload_id and a positive total_size")
+        if message.get("mime_type", "application/pdf") != "application/pdf":
+            raise self._reject("Only application/pdf can be uploaded in chunks")
+
+        upload = self._uploads.get((owner, upload_id))
+        if upload is not None and upload.total_size == total_size:
+            # Resume: the client continues from next_chunk
+            if (
+                upload.connection_id != connection_id
+                and self._connection_bytes(connection_id) + upload.memory_bytes > self.max_connection_bytes
+            ):
+                raise self._reject(
+                    f"Resuming upload {upload_id} exceeds this connection's limit of "
+                    f"{self.max_connection_bytes} bytes"
+                )
+            upload.connection_id = connection_id
+            upload.parked_at = None
+            metrics.incr("upload.resumed")
+            return upload
+        if upload is not None:
+            # Same id, different file: start over
+            self.discard(upload)
+
+        if self._connection_bytes(connection_id) + total_size > self.max_connection_bytes:
+            raise self._reject(
+                f"Upload of {total_size} bytes exceeds this connection's limit of "
+                f"{self.max_connection_bytes} bytes"
+            )
+        if self.reserved_bytes + total_size > self.max_worker_bytes:
+            raise self._reject("The server is receiving too many uploads, please retry shortly")
+
+        upload = ChunkedUpload(
+            owner,
+            upload_id,
+            message.get("filename", "uploaded.pdf"),
+            total_size,
+            message.get("role", "user"),
+        )
+        upload.connection_id = connection_id
+        self._uploads[(owner, upload_id)] = upload
+        self._update_gauge()
+        metrics.incr("upload.started")
+        return upload
+
+    def get(self, owner: str, upload_id: str) -> ChunkedUpload:
+        upload = self._uploads.get((owner, str(upload_id)))
+        if upload is None:
+            raise self._reject(f"Unknown upload {upload_id}; send upload_start first")
+        return upload
+
+    def add_chunk(self, upload: ChunkedUpload, index: Any, data: bytes) -> None:
+        """
+        Appends chunk `index` if it is the next one expected.
+
+        Raises:
+            UploadError: For out-of-order chunks (with the index to resend) or
+                when the data would exceed the declared total_size
+        """
+        try:
+            index = int(index)
+        except (TypeError, ValueError):
+            raise UploadError("upload_chunk needs an integer index", upload.next_chunk) from None
+        if index < upload.next_chunk:
+            # Duplicate after a lost ack; acknowledging again is enough
+            return
+        if index > upload.next_chunk:
+            raise UploadError(f"Expected chunk {upload.next_chunk}, got {index}", upload.next_chunk)
+        if upload.received + len(data) > upload.total_size:
+            self.discard(upload)
+            raise self._reject(
+                f"Upload {upload.upload_id} is larger than its declared {upload.total_size} bytes"
+            )
+        upload.buffer.extend(data)
+        upload.next_chunk += 1
+        self._maybe_extract_prefix(upload)
+
+    def _maybe_extract_prefix(self, upload: ChunkedUpload) -> None:
+        if upload.total_size < self.prefix_min_bytes or upload.received >= upload.total_size:
+            return
+        if upload._prefix_task is not None and not upload._prefix_task.done():
+            return
+        if upload.received - upload._prefix_size < self.prefix_step_bytes:
+            return
+        # The snapshot below and its pickled copy for the worker process
+        copy_bytes = 2 * upload.received
+        if (
+            self.reserved_bytes + copy_bytes > self.max_worker_bytes
+            or self._connection_bytes(upload.connection_id) + copy_bytes > self.max_connection_bytes
+        ):
+            metrics.incr("upload.prefix_skipped_memory")
+            return
+        upload._prefix_size = upload.received
+        upload.prefix_bytes = copy_bytes
+        self._update_gauge()
+        upload._prefix_task = asyncio.create_task(self._extract_prefix(upload, bytes(upload.buffer)))
+        upload._prefix_task.add_done_callback(lambda _: self._release_prefix(upload))
+
+    def _release_prefix(self, upload: ChunkedUpload) -> None:
+        # The task only ends once the worker returned its result
+        upload.prefix_bytes = 0
+        self._forget_if_released(upload)
+        self._update_gauge()
+
+    def _forget_if_released(self, upload: ChunkedUpload) -> None:
+        if upload.memory_bytes == 0:
+            self._held.discard(upload)
+
+    async def _extract_prefix(self, upload: ChunkedUpload, prefix: bytes) -> None:
+        start_page = len(upload.pages)
+        try:
+            result = await self.extraction_stage.try_extract_prefix(prefix, start_page)
+        except Exception as e:
+            # Early extraction is best effort; finalize extracts whatever is missing
+            print(f"Prefix extraction failed for upload {upload.upload_id}: {e}")
+            return
+        if result is not None:
+            accepted = len(upload.pages)
+            upload.accept_prefix_pages(start_page, result["pages"])
+            metrics.incr("upload.prefix_pages", len(upload.pages) - accepted)
+
+    def finish(self, upload: ChunkedUpload) -> Tuple[bytes, List[Dict[str, Any]]]:
+        """
+        Handles `upload_finalize`: returns the file and the pages extracted so
+        far. The file stays reserved until release(upload) is called.
+
+        Raises:
+            UploadError: If bytes are still missing
+        """
+        if upload.received != upload.total_size:
+            raise UploadError(
+                f"Upload {upload.upload_id} has {upload.received} of {upload.total_size} bytes",
+                upload.next_chunk,
+            )
+        self._uploads.pop((upload.owner, upload.upload_id), None)
+        self._held.add(upload)
+        metrics.incr("upload.completed")
+        pdf_bytes = bytes(upload.buffer)
+        # Only the returned copy stays alive
+        upload.buffer = bytearray()
+        self._update_gauge()
+        return pdf_bytes, list(upload.pages)
+
+    def release(self, upload: ChunkedUpload) -> None:
+        """Releases a finalized upload's reservation once its file was extracted."""
+        upload.buffer_bytes = 0
+        self._forget_if_released(upload)
+        self._update_gauge()
+
+    def discard(self, upload: ChunkedUpload) -> None:
+        self._uploads.pop((upload.owner, upload.upload_id), None)
+        upload.buffer = bytearray()
+        upload.buffer_bytes = 0
+        if upload.prefix_bytes:
+            # Its prefix extraction still holds copies; _release_prefix frees them
+            self._held.add(upload)
+        self._update_gauge()
+
+    def detach(self, connection_id: str) -> None:
+        """Parks a closed connection's uploads so they can be resumed."""
+        self.expire()
+        now = time.monotonic()
+        parked = False
+        for upload in self._uploads.values():
+            if upload.connection_id == connection_id:
+                upload.connection_id = None
+                upload.parked_at = now
+                parked = True
+        if parked:
+            # Drop them once the resume window is over, even if no other
+            # upload arrives on this worker to trigger expire()
+            asyncio.get_running_loop().call_later(self.resume_ttl_s + 1, self.expire)
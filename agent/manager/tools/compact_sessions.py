@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Runs one session compaction / archiving pass and prints its report.
+
+    python compact_sessions.py [--db-url sqlite:///./my_agent_data.db]
+        [--keep 50] [--ttl-days 30] [--idle-s 900] [--archive-dir ./session_archive]
+        [--vacuum]
+
+Defaults come from the same environment variables the server uses (see
+session_compaction.py). --vacuum also shrinks the SQLite file; it locks the
+database for a moment, so prefer running it while traffic is low.
+"""
+
+import sys
+from pathlib import Path
+
+# tools/calendar would shadow the standard library's calendar module
+TOOLS_DIR = Path(__file__).resolve().parent
+sys.path[:] = [p for p in sys.path if Path(p or ".").resolve() != TOOLS_DIR]
+
+import argparse  # noqa: E402
+import types  # noqa: E402
+
+# Load the tools as a package without importing the agent graph
+sys.modules.setdefault("manager", types.ModuleType("manager")).__path__ = [str(TOOLS_DIR.parent)]
+from manager.tools import session_compaction as sc  # noqa: E402
+
+
+def _size(value) -> str:
+    return "n/a" if value is None else f"{value / 1024:.1f} KiB"
+
+
+def _ms(value) -> str:
+    return "n/a" if value is None else f"{value} ms"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default=sc.SESSION_DB_URL)
+    parser.add_argument("--keep", type=int, default=sc.COMPACT_KEEP_EVENTS)
+    parser.add_argument("--min-excess", type=int, default=sc.COMPACT_MIN_EXCESS)
+    parser.add_argument("--idle-s", type=float, default=sc.COMPACT_IDLE_S)
+    parser.add_argument("--ttl-days", type=float, default=sc.SESSION_ARCHIVE_TTL_DAYS)
+    parser.add_argument("--archive-dir", default=sc.SESSION_ARCHIVE_DIR)
+    parser.add_argument("--vacuum", action="store_true")
+    args = parser.parse_args()
+    if args.keep < 1:
+        parser.error("--keep must be at least 1")
+    if args.min_excess < 0:
+        parser.error("--min-excess must not be negative")
+
+    report = sc.compact_and_archive(
+        db_url=args.db_url,
+        keep_events=args.keep,
+        min_excess=args.min_excess,
+        idle_s=args.idle_s,
+        ttl_days=args.ttl_days,
+        archive_dir=args.archive_dir,
+        vacuum=args.vacuum,
+    )
+    print("🗜️  Session compaction")
+    print("=" * 50)
+    if report.get("skipped"):
+        print("Skipped: another process holds the compaction lease; try again later")
+        sys.exit(1)
+    print(f"Archived sessions  : {report['archived_sessions']}")
+    print(f"Compacted sessions : {report['compacted_sessions']}")
+    print(f"Events removed     : {report['events_removed']}")
+    print(f"DB size            : {_size(report['before']['db_bytes'])} -> {_size(report['after']['db_bytes'])}")
+    print(f"Session load p50   : {_ms(report['before']['load_ms_p50'])} -> {_ms(report['after']['load_ms_p50'])}")
+    print(f"Took               : {report['duration_ms']} ms")
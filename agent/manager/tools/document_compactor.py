@@ -0,0 +1,224 @@
+# ───────────────────────────────────────────────────────────────
+# DocumentCompactor – token-budgeted compaction of uploaded reports
+# Shrinks extracted PDF text before it enters the model's history
+# ───────────────────────────────────────────────────────────────
+# Pipeline (deterministic, so sections can be rebuilt on demand):
+#   1. collapse runs of whitespace inside each line, drop empty lines
+#   2. keep header/footer lines (first/last EDGE_LINES of a page)
+#      repeated on most pages only once; drop "Page 2 of 7" counters
+#   3. drop long lines already seen earlier (repeated disclaimers)
+#   4. split what is left into sections of ~SECTION_TOKENS; a line
+#      longer than that (e.g. OCR text without line breaks) is split
+#      at word boundaries
+#   5. keep sections in order until REPORT_TOKEN_BUDGET is spent; a
+#      section bigger than the whole budget is sent truncated
+# Sections that did not fit stay retrievable through the
+# `read_report_section` tool, backed by the report cache.
+# ───────────────────────────────────────────────────────────────
+
+from __future__ import annotations
+import asyncio
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List
+
+from google.adk.tools.tool_context import ToolContext
+
+from . import metrics
+from .report_cache import report_cache, uploaded_in_session
+
+REPORT_TOKEN_BUDGET = int(os.getenv("REPORT_TOKEN_BUDGET", "2000"))
+SECTION_TOKENS = int(os.getenv("REPORT_SECTION_TOKENS", "300"))
+
+# Rough token estimate used for budgeting (English text ≈ 4 chars/token)
+CHARS_PER_TOKEN = 4
+
+# Lines shorter than this are never de-duplicated (values, units, flags)
+MIN_DEDUPE_CHARS = 40
+
+# A header/footer line is boilerplate when it repeats on at least this share of pages
+BOILERPLATE_PAGE_SHARE = 0.6
+EDGE_LINES = 6
+MIN_BOILERPLATE_CHARS = 12
+
+_whitespace_rx = re.compile(r"[ \t\u00a0\u2000-\u200b]+")
+_page_counter_rx = re.compile(r"page\s*\d+(?:\s*(?:of|/)\s*\d+)?|\d+\s+of\s+\d+", re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _normalise_lines(page: str) -> List[str]:
+    lines = (_whitespace_rx.sub(" ", line).strip() for line in page.splitlines())
+    return [line for line in lines if line]
+
+
+def _split_line(line: str, max_chars: int) -> List[str]:
+    """Pieces of at most max_chars, cut at a space where there is one nearby."""
+    pieces = []
+    while len(line) > max_chars:
+        cut = line.rfind(" ", 0, max_chars + 1)
+        if cut <= max_chars // 2:
+            cut = max_chars
+        pieces.append(line[:cut].rstrip())
+        line = line[cut:].lstrip()
+    if line:
+        pieces.append(line)
+    return pieces
+
+
+def _edges(lines: List[str]) -> List[str]:
+    return lines[:EDGE_LINES] + lines[-EDGE_LINES:]
+
+
+def _boilerplate(pages: List[List[str]]) -> set:
+    # Only longer lines at page edges count, so values and units in tables survive
+    if len(pages) < 2:
+        return set()
+    counts = Counter()
+    for lines in pages:
+        counts.update({
+            line.lower() for line in _edges(lines)
+            if len(line) >= MIN_BOILERPLATE_CHARS and " " in line
+        })
+    threshold = max(2, math.ceil(BOILERPLATE_PAGE_SHARE * len(pages)))
+    return {key for key, count in counts.items() if count >= threshold}
+
+
+def _build_sections(pages: List[str], section_tokens: int) -> List[Dict[str, Any]]:
+    page_lines = [_normalise_lines(page) for page in pages]
+    boilerplate = _boilerplate(page_lines)
+
+    max_chars = section_tokens * CHARS_PER_TOKEN
+    seen_long = set()
+    sections: List[Dict[str, Any]] = []
+    current: List[str] = []
+    current_pages: List[int] = []
+    current_chars = 0
+
+    def close_section():
+        nonlocal current, current_pages, current_chars
+        if current:
+            text = "\n".join(current)
+            sections.append({
+                "index": len(sections),
+                "pages": f"{current_pages[0]}-{current_pages[-1]}"
+                if current_pages[0] != current_pages[-1] else str(current_pages[0]),
+                "tokens": estimate_tokens(text),
+                "text": text,
+            })
+        current, current_pages, current_chars = [], [], 0
+
+    for page_number, lines in enumerate(page_lines, start=1):
+        edge_positions = set(range(min(EDGE_LINES, len(lines)))) | set(
+            range(max(0, len(lines) - EDGE_LINES), len(lines))
+        )
+        for position, line in enumerate(lines):
+            key = line.lower()
+            if _page_counter_rx.fullmatch(line):
+                continue
+            is_boilerplate = position in edge_positions and key in boilerplate
+            if is_boilerplate or len(line) >= MIN_DEDUPE_CHARS:
+                if key in seen_long:
+                    continue
+                seen_long.add(key)
+            for piece in _split_line(line, max_chars):
+                if current_chars + len(piece) > max_chars:
+                    close_section()
+                current.append(piece)
+                if not current_pages or current_pages[-1] != page_number:
+                    current_pages.append(page_number)
+                current_chars += len(piece) + 1
+    close_section()
+    return sections
+
+
+def compact_pages(
+    pages: List[str],
+    token_budget: int = REPORT_TOKEN_BUDGET,
+    section_tokens: int = SECTION_TOKENS,
+) -> Dict[str, Any]:
+    """
+    Compacts extracted page texts to fit a token budget.
+
+    Args:
+        pages: List[str] -> Extracted text of each page
+        token_budget: int -> Maximum estimated tokens to send to the model
+        section_tokens: int -> Target size of each section
+
+    Returns:
+        Dict with `text` (sections that fit, joined), `sections` (all sections
+        with index, pages, tokens and text), `deferred` (indexes of sections
+        left out), `truncated` (index of a section sent only in part, which
+        is also deferred, or None), `original_tokens` and `compacted_tokens`.
+    """
+    sections = _build_sections(pages, section_tokens)
+
+    included, deferred, used, truncated = [], [], 0, None
+    for section in sections:
+        if not deferred and used + section["tokens"] <= token_budget:
+            included.append(section["text"])
+            used += section["tokens"]
+        else:
+            if not deferred and section["tokens"] > token_budget and used < token_budget:
+                # It would never fit: send its start instead of nothing
+                head = section["text"][: (token_budget - used) * CHARS_PER_TOKEN]
+                included.append(head)
+                used += estimate_tokens(head)
+                truncated = section["index"]
+            # Keep document order: once a section is deferred, defer the rest
+            deferred.append(section["index"])
+
+    original_tokens = estimate_tokens("".join(pages))
+    metrics.observe("report_compaction.original_tokens", original_tokens)
+    metrics.observe("report_compaction.compacted_tokens", used)
+    return {
+        "text": "\n".join(included),
+        "sections": sections,
+        "deferred": deferred,
+        "truncated": truncated,
+        "original_tokens": original_tokens,
+        "compacted_tokens": used,
+    }
+
+
+def describe_deferred(compacted: Dict[str, Any], preview_chars: int = 60) -> str:
+    """One line per deferred section: index, pages and the first words."""
+    lines = []
+    for index in compacted["deferred"]:
+        section = compacted["sections"][index]
+        preview = section["text"].split("\n", 1)[0][:preview_chars]
+        if index == compacted.get("truncated"):
+            preview = preview.rstrip() + " (only its start was included above)"
+        lines.append(f"[{index}] page {section['pages']}: {preview}")
+    return "\n".join(lines)
+
+
+async def read_report_section(document_id: str, section: int, tool_context: ToolContext) -> Dict[str, Any]:
+    """
+    Reads a section of an uploaded report that was left out of the conversation
+    to save space. Use it when the user asks about content that is not in the
+    text you were given.
+
+    Args:
+        document_id: str -> The document id given in the upload message
+        section: int -> The section number listed in the upload message
+
+    Returns:
+        Dict with the section text, or an error message.
+    """
+    if not uploaded_in_session(tool_context, document_id):
+        return {"status": "error", "message": f"Document {document_id} was not uploaded in this conversation."}
+    # SQLite reads (and the LRU bump) and re-sectioning stay off the event loop
+    cached = await asyncio.to_thread(report_cache.get, document_id)
+    if not cached or not cached.get("pages"):
+        return {"status": "error", "message": f"Document {document_id} is not available anymore."}
+    sections = await asyncio.to_thread(_build_sections, cached["pages"], SECTION_TOKENS)
+    if not 0 <= section < len(sections):
+        return {"status": "error", "message": f"Section {section} does not exist (0-{len(sections) - 1})."}
+    metrics.incr("report_compaction.sections_read")
+    found = sections[section]
+    return {"status": "success", "section": section, "pages": found["pages"], "text": found["text"]}
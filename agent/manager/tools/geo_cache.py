@@ -0,0 +1,163 @@
+# ───────────────────────────────────────────────────────────────
+# GeoCache – in-memory TTL/LRU caches for nearest_doctor_finder
+# Skips Maps calls for addresses and searches seen recently
+# ───────────────────────────────────────────────────────────────
+# Three caches, each bounded in entries (LRU) and age (TTL):
+#   • geocode – normalized address string → (lat, lng)
+#   • places  – (query, geohash cell, radius) → text search results;
+#               searches from anywhere in the same cell (precision
+#               GEO_CACHE_GEOHASH_PRECISION: 6 ≈ 1.2 × 0.6 km) share
+#               one entry, distances are still computed from the
+#               caller's own location. Results are stored without
+#               opening_hours.open_now, which would go stale long
+#               before the entry does; rankers ask open_now() instead
+#   • details – place_id → place details; short TTL since they hold
+#               opening hours / open_now
+# Empty results are not cached.
+# Metrics: geo_cache.<cache>.hits / .misses (each hit is one Maps
+#          call saved), geo_cache.<cache>.size (gauge)
+# ───────────────────────────────────────────────────────────────
+
+from __future__ import annotations
+import os
+import re
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from cachetools import TTLCache
+
+from . import metrics
+
+GEO_CACHE_ENABLED = os.getenv("GEO_CACHE_ENABLED", "true").lower() == "true"
+GEO_CACHE_GEOHASH_PRECISION = int(os.getenv("GEO_CACHE_GEOHASH_PRECISION", "6"))
+GEOCODE_CACHE_TTL_S = float(os.getenv("GEOCODE_CACHE_TTL_S", str(7 * 24 * 3600)))
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "4096"))
+PLACES_CACHE_TTL_S = float(os.getenv("PLACES_CACHE_TTL_S", "3600"))
+PLACES_CACHE_SIZE = int(os.getenv("PLACES_CACHE_SIZE", "2048"))
+DETAILS_CACHE_TTL_S = float(os.getenv("DETAILS_CACHE_TTL_S", "900"))
+DETAILS_CACHE_SIZE = int(os.getenv("DETAILS_CACHE_SIZE", "8192"))
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+_NON_WORD = re.compile(r"[^\w,]+")
+
+
+def geohash(lat: float, lng: float, precision: int = GEO_CACHE_GEOHASH_PRECISION) -> str:
+    """Standard base-32 geohash of a point."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        # Bits alternate longitude, latitude, starting with longitude
+        value, bounds = (lng, lng_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = bit_count = 0
+    return "".join(chars)
+
+
+def normalize_text(text: str) -> str:
+    """Case, punctuation and spacing folded: "New  York, NY." → "new york,ny"."""
+    words = _NON_WORD.sub(" ", text.lower())
+    return ",".join(" ".join(part.split()) for part in words.split(",")).strip(",")
+
+
+class _Cache:
+    """A named, thread-safe TTLCache that records hits and misses."""
+
+    def __init__(self, name: str, maxsize: int, ttl_s: float):
+        self.name = name
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl_s)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not GEO_CACHE_ENABLED:
+            return None
+        with self._lock:
+            value = self._cache.get(key)
+        metrics.incr(f"geo_cache.{self.name}.{'hits' if value is not None else 'misses'}")
+        return value
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Like get, but not counted: no Maps call is saved by it."""
+        if not GEO_CACHE_ENABLED:
+            return None
+        with self._lock:
+            return self._cache.get(key)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if not GEO_CACHE_ENABLED or not value:
+            return
+        with self._lock:
+            self._cache[key] = value
+            size = len(self._cache)
+        metrics.set_gauge(f"geo_cache.{self.name}.size", size)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+def _without_open_now(place: Dict[str, Any]) -> Dict[str, Any]:
+    hours = place.get("opening_hours")
+    if not hours or "open_now" not in hours:
+        return place
+    hours = {k: v for k, v in hours.items() if k != "open_now"}
+    return {**place, "opening_hours": hours}
+
+
+class GeoCache:
+    """The geocode, places and details caches used by nearest_doctor_finder."""
+
+    def __init__(self):
+        self.geocodes = _Cache("geocode", GEOCODE_CACHE_SIZE, GEOCODE_CACHE_TTL_S)
+        self.places = _Cache("places", PLACES_CACHE_SIZE, PLACES_CACHE_TTL_S)
+        self.details = _Cache("details", DETAILS_CACHE_SIZE, DETAILS_CACHE_TTL_S)
+
+    @staticmethod
+    def places_key(query: str, lat: float, lng: float, radius_m: int) -> Tuple[str, str, int]:
+        return (normalize_text(query), geohash(lat, lng), radius_m)
+
+    def get_geocode(self, address: str) -> Optional[Tuple[float, float]]:
+        return self.geocodes.get(normalize_text(address))
+
+    def put_geocode(self, address: str, lat: float, lng: float) -> None:
+        self.geocodes.put(normalize_text(address), (lat, lng))
+
+    def get_places(self, query: str, lat: float, lng: float, radius_m: int) -> Optional[list]:
+        return self.places.get(self.places_key(query, lat, lng, radius_m))
+
+    def put_places(self, query: str, lat: float, lng: float, radius_m: int, places: list) -> None:
+        self.places.put(self.places_key(query, lat, lng, radius_m), [_without_open_now(p) for p in places])
+
+    def get_details(self, place_id: str) -> Optional[Dict[str, Any]]:
+        return self.details.get(place_id)
+
+    def put_details(self, place_id: str, details: Dict[str, Any]) -> None:
+        self.details.put(place_id, details)
+
+    def open_now(self, place_id: str) -> Optional[bool]:
+        """open_now from details fetched within DETAILS_CACHE_TTL_S, None if unknown."""
+        details = self.details.peek(place_id)
+        if details is None:
+            return None
+        return details.get("opening_hours", {}).get("open_now")
+
+    def clear(self) -> None:
+        for cache in (self.geocodes, self.places, self.details):
+            cache.clear()
+
+
+# Process-wide instance used by nearest_doctor_finder
+geo_cache = GeoCache()
@@ -0,0 +1,370 @@
+# ───────────────────────────────────────────────────────────────
+# LabReportParser – deterministic labReport extraction with PyMuPDF
+# Pre-fills the intake_agent labReport schema before the LLM sees it
+# ───────────────────────────────────────────────────────────────
+# Works on word positions (page.get_text("words")):
+#   1. words are grouped into visual rows by their vertical centre
+#   2. each row is split into cells on wide horizontal gaps
+#   3. rows with a numeric result become tests
+#        parameter | value | [flag] | unit | reference interval | [flag]
+#      rows without one become category headings or metadata
+#      ("Name : …", "Age/Sex : …", "Collected on : …")
+# The result follows the labReport schema in intake_agent plus a
+# `patient` object (name / age / gender) used to pre-fill personalInfo.
+# parse_lab_report() returns None when too few tests are recognised,
+# or when rows inside the results table that read like results (a name,
+# then a number) could not be parsed: a partial labReport would replace
+# the text and hide them. The raw text is sent to the model instead.
+# ───────────────────────────────────────────────────────────────
+
+from __future__ import annotations
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+# Reports with fewer recognised tests than this fall back to raw text
+MIN_TESTS = 3
+# ...and so do reports where a smaller share of the result-like rows parsed
+MIN_COVERAGE = float(os.getenv("LAB_REPORT_MIN_COVERAGE", "0.95"))
+
+# Horizontal gap (points) that separates two table cells
+CELL_GAP = 7.0
+
+DEFAULT_CATEGORY = "General"
+
+_NUMBER = r"\d+(?:[.,]\d+)?"
+value_rx = re.compile(rf"^[<>]?=?{_NUMBER}$")
+interval_search_rx = re.compile(
+    rf"(?<![\w.])(?:{_NUMBER}\s*[-–]\s*{_NUMBER}"
+    rf"|[<>≤≥]=?\s*{_NUMBER}"
+    rf"|(?:up\s*to|upto|below|above)\s*{_NUMBER})(?![\w.])",
+    re.IGNORECASE,
+)
+interval_bounds_rx = re.compile(rf"^({_NUMBER})\s*[-–]\s*({_NUMBER})$")
+interval_upper_rx = re.compile(rf"^(?:<=?|≤|up\s*to|upto|below)\s*({_NUMBER})$", re.IGNORECASE)
+interval_lower_rx = re.compile(rf"^(?:>=?|≥|above)\s*({_NUMBER})$", re.IGNORECASE)
+unit_rx = re.compile(r"^(?=.*[A-Za-zµμ%])[A-Za-zµμ%/^*.\d\-]{1,16}$")
+date_rx = re.compile(
+    r"\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4}"
+    r"|\d{4}-\d{2}-\d{2}"
+    r"|\d{1,2}[\s\-][A-Za-z]{3,9}[\s\-,]+\d{2,4}"
+)
+time_rx = re.compile(r"\d{1,2}:\d{2}(?::\d{2})?\s*(?:[AaPp][Mm])?")
+page_counter_rx = re.compile(r"\bpage\s*\d+(?:\s*(?:of|/)\s*\d+)?\b", re.IGNORECASE)
+numeric_word_rx = re.compile(r"^[<>≤≥]?=?\d")
+
+FLAGS = {
+    "h": "High", "high": "High", "hh": "Critical High",
+    "l": "Low", "low": "Low", "ll": "Critical Low",
+    "n": "Normal", "normal": "Normal",
+    "a": "Abnormal", "abnormal": "Abnormal",
+    "critical": "Critical", "*": "Abnormal",
+}
+HEADER_WORDS = {"test", "tests", "investigation", "parameter", "result", "results",
+                "value", "unit", "units", "reference", "interval", "range", "flag",
+                "biological", "ref", "observed", "status"}
+
+# Metadata keys, matched case-insensitively before a ":" separator
+META_KEYS: List[Tuple[str, str]] = [
+    ("age_gender", r"age\s*/\s*(?:sex|gender)"),
+    ("gender_age", r"(?:sex|gender)\s*/\s*age"),
+    ("name", r"(?:patient(?:'s)?\s*)?name"),
+    ("age", r"age"),
+    ("gender", r"sex|gender"),
+    ("collection", r"(?:sample\s*)?collect(?:ed|ion)(?:\s*(?:on|date|at|date\s*/\s*time))?"),
+    ("reporting", r"report(?:ed|ing)(?:\s*(?:on|date|at|date\s*/\s*time))?|report\s*date"),
+    ("profile", r"profile(?:\s*name)?|package|panel"),
+    ("lab", r"(?:lab|laboratory)(?:\s*name)?"),
+    ("title", r"report\s*title|test\s*name"),
+]
+meta_rx = re.compile(
+    r"(?:^|\s)(?:" + "|".join(f"(?P<{name}>{pattern})" for name, pattern in META_KEYS) + r")\s*[:\-]\s*",
+    re.IGNORECASE,
+)
+lab_name_rx = re.compile(r"\b(?:labs?|laborator(?:y|ies)|diagnostics?|pathology|path\s*labs?)\b", re.IGNORECASE)
+title_rx = re.compile(r"\breport\b", re.IGNORECASE)
+
+
+# ───────────────────────── layout ──────────────────────────────
+def page_rows(page: fitz.Page) -> List[List[str]]:
+    """Groups a page's words into rows of cells, top to bottom."""
+    words = page.get_text("words")
+    if not words:
+        return []
+    words.sort(key=lambda w: ((w[1] + w[3]) / 2, w[0]))
+
+    rows: List[List[tuple]] = []
+    current: List[tuple] = []
+    current_mid = None
+    for word in words:
+        mid = (word[1] + word[3]) / 2
+        tolerance = max((word[3] - word[1]) * 0.45, 1.5)
+        if current and abs(mid - current_mid) > tolerance:
+            rows.append(current)
+            current = []
+        if not current:
+            current_mid = mid
+        current.append(word)
+    if current:
+        rows.append(current)
+
+    out = []
+    for row in rows:
+        row.sort(key=lambda w: w[0])
+        cells: List[List[str]] = [[row[0][4]]]
+        for prev, word in zip(row, row[1:]):
+            if word[0] - prev[2] > CELL_GAP:
+                cells.append([word[4]])
+            else:
+                cells[-1].append(word[4])
+        out.append([" ".join(cell) for cell in cells])
+    return out
+
+
+# ───────────────────────── tests ───────────────────────────────
+def _status_from_interval(value: str, interval: str) -> str:
+    try:
+        number = float(value.lstrip("<>=").replace(",", "."))
+    except ValueError:
+        return ""
+    interval = interval.strip()
+    if m := interval_bounds_rx.match(interval):
+        low, high = (float(g.replace(",", ".")) for g in m.groups())
+        return "Low" if number < low else "High" if number > high else "Normal"
+    if m := interval_upper_rx.match(interval):
+        return "High" if number > float(m.group(1).replace(",", ".")) else "Normal"
+    if m := interval_lower_rx.match(interval):
+        return "Low" if number < float(m.group(1).replace(",", ".")) else "Normal"
+    return ""
+
+
+def _split_tail(tokens: List[str]) -> Tuple[str, str, str]:
+    """Classifies the text after a value into (unit, interval, flag)."""
+    text = " ".join(token.strip() for token in tokens)
+    interval = ""
+    if m := interval_search_rx.search(text):
+        interval = m.group(0)
+        text = f"{text[:m.start()]} {text[m.end():]}"
+    unit, flag = "", ""
+    for word in text.split():
+        if not flag and word.lower() in FLAGS:
+            flag = FLAGS[word.lower()]
+        elif not unit and unit_rx.match(word):
+            unit = word
+    return unit, interval, flag
+
+
+def _parse_test_row(cells: List[str]) -> Optional[Dict[str, str]]:
+    if not cells or ":" in cells[0]:
+        return None
+    plain_text = len(cells) == 1
+    if plain_text:
+        # Rows typed with single spaces between columns
+        cells = cells[0].split()
+    for index in range(1, len(cells)):
+        head, *rest = cells[index].split(None, 1)
+        if not value_rx.match(head):
+            continue
+        parameter = " ".join(cells[:index]).strip(" .-")
+        if not parameter or not re.search(r"[A-Za-z]", parameter):
+            return None
+        unit, interval, flag = _split_tail(rest + cells[index + 1:])
+        if plain_text and not interval:
+            # Without column gaps, only trust rows that carry a reference interval
+            return None
+        test = {"parameter": parameter, "value": head}
+        if unit:
+            test["unit"] = unit
+        if interval:
+            test["referenceInterval"] = interval
+        status = flag or _status_from_interval(head, interval)
+        if status:
+            test["status"] = status
+        return test
+    return None
+
+
+def _looks_like_result(cells: List[str]) -> bool:
+    """A row that reads like a test result: a name, then a number somewhere after it."""
+    text = " ".join(cells)
+    if ":" in text or date_rx.search(text) or time_rx.search(text) or page_counter_rx.search(text):
+        return False
+    words = text.split()
+    return (
+        len(words) >= 2
+        and re.search(r"[A-Za-z]", words[0]) is not None
+        and any(numeric_word_rx.match(word) for word in words[1:])
+    )
+
+
+def _is_category(cells: List[str]) -> bool:
+    if len(cells) != 1:
+        return False
+    text = cells[0].strip()
+    if not text or ":" in text or len(text) > 60 or date_rx.search(text):
+        return False
+    if title_rx.search(text):
+        # Report titles repeat on every page header
+        return False
+    words = re.findall(r"[A-Za-z]+", text)
+    if not words or sum(1 for w in words if w.lower() in HEADER_WORDS) >= 2:
+        return False
+    letters = [c for c in text if c.isalpha()]
+    return sum(c.isupper() for c in letters) / len(letters) > 0.8
+
+
+# ───────────────────────── metadata ────────────────────────────
+def _meta_pairs(text: str) -> List[Tuple[str, str]]:
+    matches = list(meta_rx.finditer(text))
+    pairs = []
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(text)
+        value = text[match.end():end].strip(" |,;")
+        if value:
+            pairs.append((match.lastgroup, value))
+    return pairs
+
+
+def _apply_meta(key: str, value: str, report: Dict[str, Any], patient: Dict[str, str]) -> None:
+    if key == "name":
+        patient.setdefault("name", re.sub(r"^(?:mr|mrs|ms|miss|dr)\.?\s+", "", value, flags=re.IGNORECASE))
+    elif key in ("age_gender", "gender_age"):
+        parts = [p.strip() for p in value.split("/", 1)]
+        if key == "gender_age":
+            parts.reverse()
+        if parts and parts[0]:
+            patient.setdefault("age", parts[0])
+        if len(parts) > 1 and parts[1]:
+            patient.setdefault("gender", _normalise_gender(parts[1]))
+    elif key == "age":
+        patient.setdefault("age", value)
+    elif key == "gender":
+        patient.setdefault("gender", _normalise_gender(value))
+    elif key in ("collection", "reporting"):
+        date = date_rx.search(value)
+        time = time_rx.search(value[date.end():] if date else value)
+        if date and not report.get(f"{key}Date"):
+            report[f"{key}Date"] = date.group(0)
+        if time and not report.get(f"{key}Time"):
+            report[f"{key}Time"] = time.group(0).strip()
+    elif key == "profile":
+        report.setdefault("profileName", value)
+    elif key == "lab":
+        report.setdefault("labName", value)
+    elif key == "title":
+        report.setdefault("reportTitle", value)
+
+
+def _normalise_gender(value: str) -> str:
+    value = value.strip().lower()
+    if value in ("m", "male"):
+        return "Male"
+    if value in ("f", "female"):
+        return "Female"
+    return value.title()
+
+
+# ───────────────────────── entry points ────────────────────────
+def parse_lab_report(pdf_document: fitz.Document) -> Optional[Dict[str, Any]]:
+    """
+    Builds a labReport dict from an open PyMuPDF document.
+
+    Args:
+        pdf_document: fitz.Document -> The opened lab-report PDF
+
+    Returns:
+        labReport dict (intake_agent schema + `patient`), or None when fewer
+        than MIN_TESTS test rows are recognised or less than MIN_COVERAGE of
+        the result-like rows in the table.
+    """
+    return parse_lab_report_rows([page_rows(page) for page in pdf_document])
+
+
+def parse_lab_report_rows(pages: List[List[List[str]]]) -> Optional[Dict[str, Any]]:
+    """
+    Builds a labReport dict from rows already grouped by `page_rows`, so pages
+    laid out while an upload was still streaming can be reused.
+
+    Args:
+        pages: List[List[List[str]]] -> For each page, its rows of cells
+
+    Returns:
+        Same as parse_lab_report.
+    """
+    report: Dict[str, Any] = {}
+    patient: Dict[str, str] = {}
+    categories: Dict[str, List[Dict[str, str]]] = {}
+    category = DEFAULT_CATEGORY
+    seen = set()
+    # Result-like rows inside a table that did not parse: those with table
+    # cells at once, single-cell ones (could be a signature line) only when
+    # another test follows them on the page
+    missed = 0
+
+    for page_number, rows in enumerate(pages):
+        in_table = False
+        pending = 0
+        for cells in rows:
+            text = " ".join(cells)
+            pairs = _meta_pairs(text)
+            if pairs:
+                for key, value in pairs:
+                    _apply_meta(key, value, report, patient)
+                continue
+
+            test = _parse_test_row(cells)
+            if test:
+                in_table = True
+                missed += pending
+                pending = 0
+                # Reports often repeat rows on continuation pages
+                fingerprint = (category, test["parameter"].lower(), test["value"])
+                if fingerprint not in seen:
+                    seen.add(fingerprint)
+                    categories.setdefault(category, []).append(test)
+                continue
+
+            if _is_category(cells):
+                category = cells[0].strip().title()
+                continue
+
+            if in_table and _looks_like_result(cells):
+                if len(cells) >= 3:
+                    missed += 1
+                else:
+                    pending += 1
+                continue
+
+            if page_number == 0 and len(cells) <= 2:
+                if "labName" not in report and lab_name_rx.search(text):
+                    report["labName"] = text.strip()
+                elif "reportTitle" not in report and title_rx.search(text):
+                    report["reportTitle"] = text.strip()
+
+    test_count = sum(len(tests) for tests in categories.values())
+    if test_count < MIN_TESTS or test_count < MIN_COVERAGE * (test_count + missed):
+        return None
+
+    lab_report = {
+        "labName": report.get("labName", ""),
+        "reportTitle": report.get("reportTitle", ""),
+        "profileName": report.get("profileName", ""),
+        "collectionDate": report.get("collectionDate", ""),
+        "collectionTime": report.get("collectionTime", ""),
+        "reportingDate": report.get("reportingDate", ""),
+        "reportingTime": report.get("reportingTime", ""),
+        "testResults": [
+            {"category": name, "tests": tests} for name, tests in categories.items()
+        ],
+        "resultsToFollow": [],
+        "patient": patient,
+    }
+    return lab_report
+
+
+def parse_lab_report_bytes(pdf_bytes: bytes) -> Optional[Dict[str, Any]]:
+    """Convenience wrapper around parse_lab_report for raw PDF bytes."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        return parse_lab_report(pdf_document)
@@ -0,0 +1,113 @@
+# ───────────────────────────────────────────────────────────────
+# Metrics – lightweight in-process counters, gauges and timings
+# Shared by the WebSocket server (main.py) and the functional tools
+# ───────────────────────────────────────────────────────────────
+# Values are per process (one uvicorn worker each). main.py exposes
+# the current snapshot as JSON on GET /metrics.
+#   metrics.incr("pdf_extraction.rejected")
+#   metrics.set_gauge("pdf_extraction.queue_depth", 3)
+#   metrics.observe("pdf_extraction.latency_ms", 41.7)
+# ───────────────────────────────────────────────────────────────
+
+from __future__ import annotations
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List
+
+# Number of most recent samples kept per timing for percentile estimates
+TIMING_WINDOW = 2048
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+_timings: Dict[str, Deque[float]] = {}
+_timing_totals: Dict[str, int] = {}
+
+
+def incr(name: str, value: float = 1) -> None:
+    """Increments a monotonically increasing counter."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name: str, value: float) -> None:
+    """Sets a gauge to an absolute value."""
+    with _lock:
+        _gauges[name] = value
+
+
+def add_gauge(name: str, delta: float) -> None:
+    """Moves a gauge up or down by `delta`."""
+    with _lock:
+        _gauges[name] = _gauges.get(name, 0) + delta
+
+
+def observe(name: str, value: float) -> None:
+    """Records one timing sample (milliseconds by convention)."""
+    with _lock:
+        samples = _timings.get(name)
+        if samples is None:
+            samples = _timings[name] = deque(maxlen=TIMING_WINDOW)
+        samples.append(value)
+        _timing_totals[name] = _timing_totals.get(name, 0) + 1
+
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    """Times the wrapped block and records it in milliseconds."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - start) * 1000)
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Returns count/mean/p50/p95/p99/max for a list of samples."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": round(_percentile(ordered, 0.50), 3),
+        "p95": round(_percentile(ordered, 0.95), 3),
+        "p99": round(_percentile(ordered, 0.99), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def get_counter(name: str) -> float:
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def snapshot() -> Dict[str, Any]:
+    """Returns a JSON-serialisable view of every metric in this process."""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        timings = {name: list(samples) for name, samples in _timings.items()}
+        totals = dict(_timing_totals)
+    summaries = {}
+    for name, samples in timings.items():
+        summary = summarize(samples)
+        summary["total"] = totals.get(name, 0)
+        summaries[name] = summary
+    return {"counters": counters, "gauges": gauges, "timings": summaries}
+
+
+def reset() -> None:
+    """Clears every metric (used by benchmarks between runs)."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _timings.clear()
+        _timing_totals.clear()
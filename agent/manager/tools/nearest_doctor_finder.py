@@ -10,22 +10,307 @@
 #    "radius_m": 5000}
 # The tool returns a JSON list of top results with distance, rating,
 # address, and a Google-Maps link, optimized for medical recommendations.
+# Maps calls go through resilience.budget("maps") (rate limit, retries,
+# circuit breaker); the client's own retry loop is capped at
+# MAPS_CLIENT_RETRY_TIMEOUT_S so the two don't stack.
+# Place details are fetched concurrently (MAPS_DETAILS_WORKERS) within
+# MAPS_DETAILS_DEADLINE_S; places whose details miss the deadline are
+# returned without phone/website/hours. A details lookup's reads and
+# retries are capped at the deadline too, so one that hangs holds its
+# worker for at most about twice the deadline.
+# Geocodes, searches and details are cached (geo_cache.py), so repeat
+# lookups of the same city/specialty make no Maps calls.
+# With PROVIDER_INDEX_DIR set, searches are answered from the offline
+# provider index (provider_index.py) instead of the Places API.
+# One googlemaps client (and its pooled keep-alive HTTP session) is
+# built on first use and shared by all calls and threads; a missing
+# GOOGLE_MAPS_API_KEY is only an error once a Maps call is needed.
+# Ranking: distances to every search result are computed in one NumPy
+# pass, results outside radius_m are dropped, the rest are scored on
+# distance, rating and open-now (RANK_*_WEIGHT) and only the top
+# max_results get a details lookup. open_now only counts when it is
+# fresh: from this call's search or from the details cache, never from
+# an hour-old cached search.
+# Agents get nearest_doctor_finder_async: ADK runs synchronous tools on
+# the event loop, where the rate-limit waits and retry back-offs above
+# would stall every live session, so the async variant runs the search
+# on a bounded thread pool (MAPS_EXECUTOR_WORKERS), giving up after
+# MAPS_CALL_TIMEOUT_S, and awaits the details lookups.
 # ───────────────────────────────────────────────────────────────
 
 from __future__ import annotations
+import asyncio
+import functools
 import os, json
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, Field
 import googlemaps
-from geopy.distance import geodesic
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
 
-# Get API key from environment
-GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
-if not GOOGLE_MAPS_API_KEY:
-    raise ValueError("GOOGLE_MAPS_API_KEY environment variable is required")
+from . import metrics, resilience
+from .geo_cache import geo_cache
+from .provider_index import PROVIDER_INDEX_FALLBACK, get_provider_index, haversine_km
+
+MAPS_CLIENT_RETRY_TIMEOUT_S = float(os.getenv("MAPS_CLIENT_RETRY_TIMEOUT_S", "1"))
+MAPS_CONNECT_TIMEOUT_S = float(os.getenv("MAPS_CONNECT_TIMEOUT_S", "3"))
+MAPS_READ_TIMEOUT_S = float(os.getenv("MAPS_READ_TIMEOUT_S", "10"))
+# Keep-alive connections kept open to maps.googleapis.com
+MAPS_POOL_SIZE = int(os.getenv("MAPS_POOL_SIZE", "16"))
+MAPS_DETAILS_WORKERS = int(os.getenv("MAPS_DETAILS_WORKERS", "8"))
+MAPS_DETAILS_DEADLINE_S = float(os.getenv("MAPS_DETAILS_DEADLINE_S", "5"))
+DETAILS_FIELDS = ["formatted_phone_number", "opening_hours", "website"]
+# Tool calls in flight per worker process; further calls queue
+MAPS_EXECUTOR_WORKERS = int(os.getenv("MAPS_EXECUTOR_WORKERS", "8"))
+MAPS_CALL_TIMEOUT_S = float(os.getenv("MAPS_CALL_TIMEOUT_S", "30"))
+# Places API limit on the search radius
+MAX_RADIUS_M = 50000
+
+# Score = distance share of the radius (0..1), minus bonuses: rating
+# (3★ → 0, 5★ → full weight; unrated counts as 3★) and open now
+RANK_DISTANCE_WEIGHT = float(os.getenv("RANK_DISTANCE_WEIGHT", "1.0"))
+RANK_RATING_WEIGHT = float(os.getenv("RANK_RATING_WEIGHT", "0.3"))
+RANK_OPEN_NOW_WEIGHT = float(os.getenv("RANK_OPEN_NOW_WEIGHT", "0.2"))
+
+# Shared by all calls, so concurrent tool calls can't open unbounded threads
+_details_executor = ThreadPoolExecutor(max_workers=MAPS_DETAILS_WORKERS, thread_name_prefix="maps-details")
+_executor = ThreadPoolExecutor(max_workers=MAPS_EXECUTOR_WORKERS, thread_name_prefix="maps-io")
 
 ReturnType = List[Dict[str, Any]]
 
+_client_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_clients: Dict[float, googlemaps.Client] = {}
+
+
+def get_maps_client(read_timeout_s: float = MAPS_READ_TIMEOUT_S) -> googlemaps.Client:
+    """
+    The shared googlemaps client for a read timeout, built on first use.
+
+    Raises:
+        ValueError: If GOOGLE_MAPS_API_KEY is not set
+    """
+    global _session
+    client = _clients.get(read_timeout_s)
+    if client is None:
+        with _client_lock:
+            client = _clients.get(read_timeout_s)
+            if client is None:
+                api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+                if not api_key:
+                    raise ValueError("GOOGLE_MAPS_API_KEY environment variable is required")
+                if _session is None:
+                    _session = requests.Session()
+                    # Enough pooled connections for the details fan-out plus concurrent calls
+                    _session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=MAPS_POOL_SIZE))
+                client = _clients[read_timeout_s] = googlemaps.Client(
+                    key=api_key,
+                    connect_timeout=MAPS_CONNECT_TIMEOUT_S,
+                    read_timeout=read_timeout_s,
+                    retry_timeout=MAPS_CLIENT_RETRY_TIMEOUT_S,
+                    retry_over_query_limit=False,
+                    requests_session=_session,
+                )
+    return client
+
+
+def _place_details(maps: resilience.Budget, place_id: str) -> Dict[str, Any]:
+    # Nobody waits for details past the deadline, so a lookup must not hold
+    # its executor slot much longer: neither its reads nor its retries
+    client = get_maps_client(min(MAPS_READ_TIMEOUT_S, MAPS_DETAILS_DEADLINE_S))
+    return maps.call(client.place, place_id, fields=DETAILS_FIELDS, deadline_s=MAPS_DETAILS_DEADLINE_S)
+
+
+def _cached_details(place_ids: List[str]):
+    """(details found in the cache by place_id, place_ids still to fetch)"""
+    details: Dict[str, Dict[str, Any]] = {}
+    missing = []
+    for place_id in place_ids:
+        cached = geo_cache.get_details(place_id)
+        if cached is not None:
+            details[place_id] = cached
+        else:
+            missing.append(place_id)
+    return details, missing
+
+
+def _collect_details(futures: Dict[str, Any], details: Dict[str, Dict[str, Any]]) -> None:
+    """Adds the finished lookups to details (and the cache); gives up on the rest."""
+    for place_id, future in futures.items():
+        if not future.done():
+            # Still running; its result is dropped (queued ones never start)
+            future.cancel()
+            metrics.incr("maps.details_timeouts")
+            print(f"Place details for {place_id} missed the {MAPS_DETAILS_DEADLINE_S:.0f} s deadline")
+        elif future.exception() is not None:
+            metrics.incr("maps.details_errors")
+            print(f"Place details failed for {place_id}: {future.exception()}")
+        else:
+            details[place_id] = future.result().get("result", {})
+            geo_cache.put_details(place_id, details[place_id])
+
+
+def _fetch_details(maps: resilience.Budget, place_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Place details by place_id, from cache or fetched in parallel; missing ones failed or timed out."""
+    details, missing = _cached_details(place_ids)
+    futures = {
+        place_id: _details_executor.submit(_place_details, maps, place_id) for place_id in missing
+    }
+    if futures:
+        with metrics.timer("maps.details_ms"):
+            wait(futures.values(), timeout=MAPS_DETAILS_DEADLINE_S)
+    _collect_details(futures, details)
+    return details
+
+
+async def _fetch_details_async(maps: resilience.Budget, place_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """_fetch_details for async callers: waits for the lookups without blocking the loop."""
+    details, missing = _cached_details(place_ids)
+    loop = asyncio.get_running_loop()
+    futures = {
+        place_id: loop.run_in_executor(_details_executor, _place_details, maps, place_id)
+        for place_id in missing
+    }
+    if futures:
+        with metrics.timer("maps.details_ms"):
+            await asyncio.wait(futures.values(), timeout=MAPS_DETAILS_DEADLINE_S)
+    _collect_details(futures, details)
+    return details
+
+
+def _open_now(place: Dict[str, Any]) -> Optional[bool]:
+    """A search result's open_now; cached searches drop it, so ask the details cache."""
+    hours = place.get("opening_hours", {})
+    if "open_now" in hours:
+        return hours["open_now"]
+    return geo_cache.open_now(place["place_id"])
+
+
+def _rank(places: List[Dict[str, Any]], lat: float, lng: float, radius_km: float, k: int):
+    """The k best places within radius_km as (place, distance_km), best first."""
+    if not places or k <= 0:
+        return []
+    locations = np.array(
+        [(p["geometry"]["location"]["lat"], p["geometry"]["location"]["lng"]) for p in places],
+        dtype=np.float64,
+    )
+    ratings = np.array([p.get("rating") or 3.0 for p in places], dtype=np.float64)
+    open_now = np.array([bool(_open_now(p)) for p in places])
+
+    distances = haversine_km(lat, lng, locations[:, 0], locations[:, 1])
+    inside = np.flatnonzero(distances <= radius_km)
+    scores = (
+        RANK_DISTANCE_WEIGHT * distances[inside] / radius_km
+        - RANK_RATING_WEIGHT * np.clip((ratings[inside] - 3.0) / 2.0, 0.0, 1.0)
+        - RANK_OPEN_NOW_WEIGHT * open_now[inside]
+    )
+    if len(inside) > k:
+        top = np.argpartition(scores, k - 1)[:k]
+    else:
+        top = np.arange(len(inside))
+    top = top[np.argsort(scores[top], kind="stable")]
+    return [(places[inside[i]], float(distances[inside[i]])) for i in top]
+
+
+def _provider_result(provider: Dict[str, Any]) -> Dict[str, Any]:
+    """An offline index entry in the tool's result format."""
+    if provider["place_id"]:
+        maps_url = f"https://www.google.com/maps/place/?q=place_id:{provider['place_id']}"
+    else:
+        maps_url = f"https://www.google.com/maps/search/?api=1&query={provider['lat']},{provider['lng']}"
+    return {
+        "name": provider["name"],
+        "address": provider["address"] or "Address not available",
+        "rating": provider["rating"] if provider["rating"] is not None else "No rating",
+        "distance_km": round(provider["distance_km"], 2),
+        "maps_url": maps_url,
+        "phone": provider["phone"] or "Phone not available",
+        "website": provider["website"] or "Website not available",
+        "open_now": "Hours not available",
+        "place_id": provider["place_id"] or "",
+    }
+
+
+def _search(
+    maps: resilience.Budget,
+    query: str,
+    location: Optional[Dict[str, float]],
+    address_str: Optional[str],
+    radius_m: int,
+    max_results: int,
+):
+    """
+    Resolves the location and searches it: (results, []) when the offline
+    index answered, else (None, ranked places still lacking their details).
+    """
+    # ── Resolve coordinates ───────────────────────────────────
+    if location:  # lat/lng already given
+        lat, lng = location["lat"], location["lng"]
+    else:  # need to geocode address_str
+        if not address_str:
+            raise ValueError("Either location or address_str must be provided")
+        cached = geo_cache.get_geocode(address_str)
+        if cached is not None:
+            lat, lng = cached
+        else:
+            geo = maps.call(get_maps_client().geocode, address_str)
+            if not geo:
+                raise ValueError(f"Could not geocode '{address_str}'. Please check the address.")
+            lat = geo[0]["geometry"]["location"]["lat"]
+            lng = geo[0]["geometry"]["location"]["lng"]
+            geo_cache.put_geocode(address_str, lat, lng)
+
+    radius_m = max(1, min(radius_m, MAX_RADIUS_M))
+
+    # ── Offline provider index ────────────────────────────────
+    index = get_provider_index()
+    if index is not None:
+        local = index.search(query, lat, lng, radius_m / 1000, k=max_results)
+        if local or not PROVIDER_INDEX_FALLBACK:
+            return [_provider_result(p) for p in local], []
+
+    # ── Search for medical facilities ─────────────────────────
+    places = geo_cache.get_places(query, lat, lng, radius_m)
+    if places is None:
+        resp = maps.call(
+            get_maps_client().places,
+            query=query,
+            location=(lat, lng),
+            radius=radius_m,  # Biases the search; results outside are dropped below
+            type="health"  # Use 'health' type for better medical facility results
+        )
+        places = resp.get("results", [])
+        geo_cache.put_places(query, lat, lng, radius_m, places)
+    
+    # ── Rank, then enrich only what is returned ───────────────
+    return None, _rank(places, lat, lng, radius_m / 1000, max_results)
+
+
+def _enrich(ranked, details: Dict[str, Dict[str, Any]]) -> ReturnType:
+    """The tool's results for ranked places, with whatever details were fetched."""
+    enriched: ReturnType = []
+    for p, distance_km in ranked:
+        place_details = details.get(p["place_id"], {})
+        open_now = place_details.get("opening_hours", p.get("opening_hours", {})).get("open_now")
+        
+        enriched.append({
+            "name": p["name"],
+            "address": p.get("formatted_address", "Address not available"),
+            "rating": p.get("rating", "No rating"),
+            "distance_km": round(distance_km, 2),
+            "maps_url": f"https://www.google.com/maps/place/?q=place_id:{p['place_id']}",
+            "phone": place_details.get("formatted_phone_number", "Phone not available"),
+            "website": place_details.get("website", "Website not available"),
+            "open_now": open_now if open_now is not None else "Hours not available",
+            "place_id": p["place_id"]
+        })
+    
+    return enriched
+
+
 def nearest_doctor_finder(
     query: str,
     location: Optional[Dict[str, float]] = None,
@@ -54,57 +339,47 @@ def nearest_doctor_finder(
         ValueError: If address cannot be geocoded or API key is missing
     """
     
-    gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
-    
-    # ── Resolve coordinates ───────────────────────────────────
-    if location:  # lat/lng already given
-        lat, lng = location["lat"], location["lng"]
-    else:  # need to geocode address_str
-        if not address_str:
-            raise ValueError("Either location or address_str must be provided")
-        geo = gmaps.geocode(address_str)
-        if not geo:
-            raise ValueError(f"Could not geocode '{address_str}'. Please check the address.")
-        lat = geo[0]["geometry"]["location"]["lat"]
-        lng = geo[0]["geometry"]["location"]["lng"]
+    maps = resilience.budget("maps")
+    results, ranked = _search(maps, query, location, address_str, radius_m, max_results)
+    if results is not None:
+        return results
+    # Get additional details for better recommendations
+    details = _fetch_details(maps, [p["place_id"] for p, _ in ranked])
+    return _enrich(ranked, details)
 
-    # ── Search for medical facilities ─────────────────────────
-    resp = gmaps.places(
-        query=query,
-        location=(lat, lng),
-        radius="distance",  # Prioritize closer facilities
-        type="health"  # Use 'health' type for better medical facility results
-    )
-    
-    places = resp.get("results", [])
-    
-    # ── Enrich and filter results ─────────────────────────────
-    enriched: ReturnType = []
-    for p in places[:max_results]:
-        place_loc = p["geometry"]["location"]
-        dist_km = round(
-            geodesic((lat, lng), (place_loc["lat"], place_loc["lng"])).km, 2
+
+@functools.wraps(nearest_doctor_finder)
+async def nearest_doctor_finder_async(
+    query: str,
+    location: Optional[Dict[str, float]] = None,
+    address_str: Optional[str] = None,
+    radius_m: int = 5000,
+    max_results: int = 5,
+) -> ReturnType:
+    # Same tool (name, docstring, arguments); blocking Maps calls run on executors
+    maps = resilience.budget("maps")
+    loop = asyncio.get_running_loop()
+    metrics.add_gauge("maps.executor.in_flight", 1)
+    try:
+        # A search still queued when the timeout hits is cancelled and never runs
+        results, ranked = await asyncio.wait_for(
+            loop.run_in_executor(
+                _executor,
+                functools.partial(_search, maps, query, location, address_str, radius_m, max_results),
+            ),
+            MAPS_CALL_TIMEOUT_S,
         )
-        
-        # Get additional details for better recommendations
-        place_details = gmaps.place(p["place_id"], fields=["formatted_phone_number", "opening_hours", "website"])
-        
-        enriched.append({
-            "name": p["name"],
-            "address": p.get("formatted_address", "Address not available"),
-            "rating": p.get("rating", "No rating"),
-            "distance_km": dist_km,
-            "maps_url": f"https://www.google.com/maps/place/?q=place_id:{p['place_id']}",
-            "phone": place_details.get("result", {}).get("formatted_phone_number", "Phone not available"),
-            "website": place_details.get("result", {}).get("website", "Website not available"),
-            "open_now": place_details.get("result", {}).get("opening_hours", {}).get("open_now", "Hours not available"),
-            "place_id": p["place_id"]
-        })
-    
-    # Sort by distance and rating for best recommendations
-    enriched.sort(key=lambda x: (x["distance_km"], -x["rating"] if isinstance(x["rating"], (int, float)) else 0))
-    
-    return enriched[:max_results]
+    except asyncio.TimeoutError:
+        metrics.incr("maps.timeouts")
+        raise resilience.UpstreamUnavailable(
+            "maps", f"no answer within {MAPS_CALL_TIMEOUT_S:.0f} seconds", MAPS_CALL_TIMEOUT_S
+        ) from None
+    finally:
+        metrics.add_gauge("maps.executor.in_flight", -1)
+    if results is not None:
+        return results
+    details = await _fetch_details_async(maps, [p["place_id"] for p, _ in ranked])
+    return _enrich(ranked, details)
 
 # Alias for backward compatibility
 map_finder_tool = nearest_doctor_finder
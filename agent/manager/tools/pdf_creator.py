@@ -6,13 +6,35 @@
 # package is import-scanned by ADK (e.g. listed in __init__.py).
 # Sub-agents can now invoke   PdfCreatorTool(plan_summary=..., user_info=...)
 # and the ADK runtime will call this function automatically.
+#
+# The tool renders the PDF on a worker pool (PDF_RENDER_WORKERS) and
+# returns a job id right away; the upload runs in the background
+# (PDF_UPLOAD_WORKERS) while the agent keeps talking. The agent then
+# calls pdf_upload_status(job_id), which waits up to PDF_STATUS_WAIT_S
+# for the upload and returns the link that works (or the error), so
+# no link is handed out before its object exists. If the upload fails
+# the rendered PDF is returned base64-encoded instead, as when GCS is
+# not configured at all. Both tools record the job in session state
+# under pdf_jobs.<job_id>:
+#   {"status": "uploading" | "ready" | "failed", "url", "object",
+#    "file_name", "created_at", "completed_at", "error"}
+# The URL is a public one when make_public worked on the object,
+# otherwise a V4 signed URL. Upload tasks are tracked in this process
+# for PDF_JOB_TTL_S; a job it does not know (another worker, evicted)
+# is answered from that session state and the bucket.
+# The GCS client is created on first use, not at import.
+# Metrics: pdf.render_ms, pdf.upload_ms, pdf.upload_errors,
+#          pdf.uploads_in_flight (gauge)
 # ───────────────────────────────────────────────────────────────
 
 from __future__ import annotations
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import asyncio
 import base64, io, re
 import os
+import threading
 import uuid
 import logging
 from google.api_core import exceptions
@@ -49,7 +71,12 @@ from reportlab.platypus import (
     TableStyle,
 )
 from reportlab.lib.units import mm
+from cachetools import TTLCache
 from pydantic import BaseModel, Field
+from google.adk.tools.tool_context import ToolContext
+
+from . import metrics
+from .session_manager import compute_state_delta
 
 # ─────────────── visual theme vars (tweak freely) ──────────────
 PRIMARY      = colors.HexColor("#4C7CF3")
@@ -61,9 +88,42 @@ BODY_FONT    = "Helvetica"
 # Google Cloud Storage configuration
 SIGNED_URL_TTL_HOURS = 1  # Adjust if needed
 GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME", "agent-binod")
-SERVICE_ACCOUNT_FILE = "/Users/abhay/EMVO/Hacko/Hacko-ADK/agent/manager/tools/hacko.json"  # replace with your file name if different
-creds = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE)
-client = storage.Client(credentials=creds)
+SERVICE_ACCOUNT_FILE = os.getenv(
+    "GCS_SERVICE_ACCOUNT_FILE",
+    "/Users/abhay/EMVO/Hacko/Hacko-ADK/agent/manager/tools/hacko.json",  # replace with your file name if different
+)
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+PDF_UPLOAD_WORKERS = int(os.getenv("PDF_UPLOAD_WORKERS", "4"))
+PDF_STATUS_WAIT_S = float(os.getenv("PDF_STATUS_WAIT_S", "20"))
+PDF_JOB_TTL_S = float(os.getenv("PDF_JOB_TTL_S", "3600"))
+
+_render_executor = ThreadPoolExecutor(max_workers=PDF_RENDER_WORKERS, thread_name_prefix="pdf-render")
+_upload_executor = ThreadPoolExecutor(max_workers=PDF_UPLOAD_WORKERS, thread_name_prefix="pdf-upload")
+# Running upload jobs (referenced so they are not garbage collected)
+_upload_jobs: Set[asyncio.Task] = set()
+# job_id -> upload task, for pdf_upload_status; only touched on the event loop
+_jobs_by_id: TTLCache = TTLCache(maxsize=1024, ttl=PDF_JOB_TTL_S)
+
+_gcs_lock = threading.Lock()
+client: Optional[storage.Client] = None
+creds: Optional[service_account.Credentials] = None
+# Whether make_public works on the bucket (None until the first upload tells)
+_public_access: Optional[bool] = None
+
+
+def get_gcs_client() -> storage.Client:
+    """The shared storage client, created on first use."""
+    global client, creds
+    if client is None:
+        with _gcs_lock:
+            if client is None:
+                if os.path.exists(SERVICE_ACCOUNT_FILE):
+                    creds = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE)
+                    client = storage.Client(credentials=creds)
+                else:
+                    # Application default credentials (e.g. on Cloud Run)
+                    client = storage.Client()
+    return client
 
 # ───────────────────────── schema ──────────────────────────────
 class PdfArgs(BaseModel):
@@ -82,57 +142,144 @@ GCS_AVAILABLE = True
 GCS_PROJECT_ID = " "
 GCS_BUCKET_NAME = "agent-binod"
 
-def upload_pdf_to_gcs(pdf_bytes: bytes, user_name: str) -> str:
-    """
-    Uploads PDF bytes to GCS and returns either:
-      • a public URL  (if UBLA *off* and org-policy allows), or
-      • a signed URL (if UBLA *on* or public access is blocked).
-    """
-    bucket = client.bucket(GCS_BUCKET_NAME)
+def _new_blob(user_name: str) -> Tuple[storage.Blob, str]:
+    """A blob with a safe, unique object name, and the file name to download it as."""
+    bucket = get_gcs_client().bucket(GCS_BUCKET_NAME)
 
     # Generate a safe, unique object name
     timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     safe_name = "".join(c for c in user_name if c.isalnum() or c in " -_").strip().replace(" ", "_")
     object_key = f"health_roadmaps/{safe_name}_{timestamp}_{uuid.uuid4().hex[:8]}.pdf"
+    return bucket.blob(object_key), safe_name
 
-    blob = bucket.blob(object_key)
-    blob.upload_from_string(pdf_bytes, content_type="application/pdf")
 
-    # Try public access first (only works if UBLA is off + org allows it)
-    try:
-        blob.make_public()
-        return blob.public_url
-    except (exceptions.Forbidden, exceptions.BadRequest):
-        pass  # Fall back to signed URL
-
-    # Generate signed URL
-    signed_url = blob.generate_signed_url(
+def _signed_url(blob: storage.Blob, safe_name: str) -> str:
+    return blob.generate_signed_url(
         version="v4",
         expiration=timedelta(hours=SIGNED_URL_TTL_HOURS),
         method="GET",
         response_disposition=f'attachment; filename="{safe_name}.pdf"',
         credentials=creds  # required for signing
     )
-    return signed_url
 
 
-def pdf_creator_tool(plan_summary: str, user_info: Dict[str, Any]) -> str:
-    """  Generate a polished, branded PDF roadmap (dietary or lifestyle guidance)
-    based on a lightweight markdown-style summary and user metadata.
+def object_url(blob: storage.Blob, safe_name: str) -> str:
+    """
+    The URL the object will be readable at once uploaded (no network call):
+      • a public URL  (if the bucket is known to allow public objects), or
+      • a signed URL (if UBLA *on*, public access is blocked, or not known yet).
+    """
+    if _public_access:
+        return blob.public_url
+    try:
+        return _signed_url(blob, safe_name)
+    except Exception as e:
+        # Credentials that cannot sign: hope for public access
+        logger.warning(f"Could not sign URL for {blob.name}: {e}")
+        return blob.public_url
 
-    Args:  
-        plan_summary: str -> Plain-text guideline supporting **bold**, **Heading**, and bullet
-            lines (– or •). This is the full content to render in the PDF.
-        user_info: object -> Dictionary containing at least:
-            • name (string): User's display name  
-            • location (string): User's locale  
-        Additional keys (e.g. goals) may be included and will be ignored or
-        optionally rendered in the metadata header.
-        
-    Returns str ->    Public URL to the uploaded PDF in Google Cloud Storage, or base64-encoded PDF
-    if GCS upload fails.
-."""
-    logger.info(f"pdf_creator_tool called with user_info: {user_info}")
+
+def _upload_blob(blob: storage.Blob, pdf_bytes: bytes, url: str, safe_name: str) -> str:
+    """Uploads the PDF; returns the URL that works for it (normally `url`)."""
+    global _public_access
+    blob.upload_from_string(pdf_bytes, content_type="application/pdf")
+
+    # Try public access (only works if UBLA is off + org allows it)
+    if _public_access is not False:
+        try:
+            blob.make_public()
+            _public_access = True
+            return url
+        except (exceptions.Forbidden, exceptions.BadRequest):
+            _public_access = False
+    if url == blob.public_url:
+        # The public URL handed out will not work: fall back to signed URL
+        return _signed_url(blob, safe_name)
+    return url
+
+
+def upload_pdf_to_gcs(pdf_bytes: bytes, user_name: str) -> str:
+    """
+    Uploads PDF bytes to GCS (blocking) and returns either a public URL or
+    a signed URL, see object_url().
+    """
+    blob, safe_name = _new_blob(user_name)
+    return _upload_blob(blob, pdf_bytes, object_url(blob, safe_name), safe_name)
+
+
+def _record_job(tool_context: ToolContext, job_id: str, job: Dict[str, Any]) -> None:
+    """Writes the job to pdf_jobs.<job_id> through the tool call's state delta."""
+    delta, _ = compute_state_delta(tool_context.state.to_dict(), {f"pdf_jobs.{job_id}": dict(job)})
+    for key, value in delta.items():
+        tool_context.state[key] = value
+
+
+async def _upload_job(
+    job_id: str,
+    blob: storage.Blob,
+    safe_name: str,
+    pdf_bytes: bytes,
+    url: str,
+    created_at: str,
+) -> Tuple[Dict[str, Any], Optional[bytes]]:
+    """Uploads in the background; returns the finished job record and, if it failed, the PDF."""
+    job = {"status": "uploading", "object": blob.name, "file_name": safe_name, "created_at": created_at}
+    loop = asyncio.get_running_loop()
+    metrics.add_gauge("pdf.uploads_in_flight", 1)
+    try:
+        with metrics.timer("pdf.upload_ms"):
+            # The URL that works once uploaded: signed if make_public failed
+            job["url"] = await loop.run_in_executor(
+                _upload_executor, _upload_blob, blob, pdf_bytes, url, safe_name
+            )
+        job["status"] = "ready"
+        logger.info(f"PDF job {job_id} uploaded to {blob.name}")
+    except Exception as e:
+        metrics.incr("pdf.upload_errors")
+        logger.error(f"PDF job {job_id} upload failed: {str(e)}")
+        job["status"] = "failed"
+        job["error"] = str(e)
+    finally:
+        metrics.add_gauge("pdf.uploads_in_flight", -1)
+    job["completed_at"] = datetime.utcnow().isoformat()
+    # Only a failed job keeps the PDF, so pdf_upload_status can still deliver it
+    return job, (pdf_bytes if job["status"] == "failed" else None)
+
+
+def _stored_object_url(job: Dict[str, Any]) -> Optional[str]:
+    """The URL of a job's object if it is in the bucket (blocking), else None."""
+    blob = get_gcs_client().bucket(GCS_BUCKET_NAME).blob(job["object"])
+    if not blob.exists():
+        return None
+    return object_url(blob, job.get("file_name") or "health_roadmap")
+
+
+async def _status_from_state(job_id: str, tool_context: ToolContext) -> Dict[str, Any]:
+    """pdf_upload_status for a job this process is not tracking."""
+    job = (tool_context.state.get("pdf_jobs") or {}).get(job_id)
+    if job and job.get("status") == "ready" and job.get("url"):
+        return {"status": "success", "job_id": job_id, "upload": "ready", "url": job["url"]}
+    if job and job.get("status") == "uploading" and job.get("object"):
+        # Started by another worker: the bucket says whether it finished
+        try:
+            url = await asyncio.get_running_loop().run_in_executor(_upload_executor, _stored_object_url, job)
+        except Exception as e:
+            logger.error(f"Could not look up PDF job {job_id}: {str(e)}")
+            url = None
+        if url:
+            _record_job(tool_context, job_id, {
+                **job, "status": "ready", "url": url, "completed_at": datetime.utcnow().isoformat()
+            })
+            return {"status": "success", "job_id": job_id, "upload": "ready", "url": url}
+    return {
+        "status": "error",
+        "job_id": job_id,
+        "message": "This PDF is no longer available; please create it again.",
+    }
+
+
+def render_pdf(plan_summary: str, user_info: Dict[str, Any]) -> bytes:
+    """Builds the roadmap PDF in memory (CPU-bound; runs on the render pool)."""
     # ----- style helpers ----------------------------------------------------
     def build_styles():
         styles = getSampleStyleSheet()
@@ -223,25 +370,94 @@ def pdf_creator_tool(plan_summary: str, user_info: Dict[str, Any]) -> str:
     pdf_bytes = buf.getvalue()
     buf.close()
     logger.info(f"PDF bytes generated. Size: {len(pdf_bytes)} bytes.")
-    
-    # ----- try to upload to GCS and return URL ----------------------------
+    return pdf_bytes
+
+
+async def pdf_creator_tool(
+    plan_summary: str,
+    user_info: Dict[str, Any],
+    tool_context: ToolContext,
+) -> Dict[str, Any]:
+    """  Generate a polished, branded PDF roadmap (dietary or lifestyle guidance)
+    based on a lightweight markdown-style summary and user metadata.
+
+    Args:  
+        plan_summary: str -> Plain-text guideline supporting **bold**, **Heading**, and bullet
+            lines (– or •). This is the full content to render in the PDF.
+        user_info: object -> Dictionary containing at least:
+            • name (string): User's display name  
+            • location (string): User's locale  
+        Additional keys (e.g. goals) may be included and will be ignored or
+        optionally rendered in the metadata header.
+        
+    Returns dict ->  {"status", "job_id", "upload"}: the PDF is being uploaded to Google
+    Cloud Storage; call pdf_upload_status(job_id) for its link before giving it to the user.
+    If GCS is unavailable, {"status", "pdf_base64"} with the base64-encoded PDF instead, and
+    {"status": "error", "message"} if the PDF could not be created.
+."""
+    logger.info(f"pdf_creator_tool called with user_info: {user_info}")
+    loop = asyncio.get_running_loop()
     try:
-        if GCS_AVAILABLE and GCS_BUCKET_NAME:
-            user_name = user_info.get('name', 'User')
-            logger.info(f"Attempting to upload PDF to GCS for user: {user_name}")
-            public_url = upload_pdf_to_gcs(pdf_bytes, user_name)
-            logger.info(f"PDF successfully uploaded. Public URL: {public_url}")
-            return public_url
-        else:
-            # Fallback to base64 if GCS is not available
-            logger.warning("GCS not available or bucket name missing. Returning base64 encoded PDF.")
-            encoded = base64.b64encode(pdf_bytes).decode("utf-8")
-            return encoded
+        with metrics.timer("pdf.render_ms"):
+            pdf_bytes = await loop.run_in_executor(_render_executor, render_pdf, plan_summary, user_info)
+    except Exception as e:
+        logger.error(f"PDF rendering failed: {str(e)}")
+        return {"status": "error", "message": f"The PDF could not be created: {e}"}
+
+    # ----- name the object, upload it in the background -------------------
+    try:
+        if not (GCS_AVAILABLE and GCS_BUCKET_NAME):
+            raise RuntimeError("GCS not available or bucket name missing")
+        user_name = user_info.get('name', 'User')
+        blob, safe_name = _new_blob(user_name)
+        url = object_url(blob, safe_name)
     except Exception as e:
-        logger.error(f"Failed to upload to GCS: {str(e)}. Returning base64 encoded PDF.")
+        logger.error(f"Cannot upload to GCS: {str(e)}. Returning base64 encoded PDF.")
         # Fallback to base64 encoding
         encoded = base64.b64encode(pdf_bytes).decode("utf-8")
-        return encoded
+        return {"status": "success", "pdf_base64": encoded}
+
+    job_id = uuid.uuid4().hex[:12]
+    created_at = datetime.utcnow().isoformat()
+    task = asyncio.create_task(_upload_job(job_id, blob, safe_name, pdf_bytes, url, created_at))
+    _upload_jobs.add(task)
+    task.add_done_callback(_upload_jobs.discard)
+    _jobs_by_id[job_id] = task
+    _record_job(tool_context, job_id, {
+        "status": "uploading", "object": blob.name, "file_name": safe_name, "created_at": created_at
+    })
+    logger.info(f"PDF job {job_id} started for user {user_name}: {blob.name}")
+    return {"status": "success", "job_id": job_id, "upload": "in_progress"}
+
+
+async def pdf_upload_status(job_id: str, tool_context: ToolContext) -> Dict[str, Any]:
+    """
+    Waits for a PDF started by pdf_creator_tool to finish uploading and returns its link.
+    Call it before giving the user a PDF link.
+
+    Args:
+        job_id: str -> The job_id returned by pdf_creator_tool
+
+    Returns:
+        Dict with status, job_id and, once uploaded, the url to give the user; while
+        still uploading upload is "in_progress" (call again). If the upload failed,
+        upload is "failed" and pdf_base64 holds the base64-encoded PDF instead; if the
+        PDF is gone, status is "error" with a message to relay.
+    """
+    task = _jobs_by_id.get(job_id)
+    if task is None:
+        return await _status_from_state(job_id, tool_context)
+    try:
+        # shield: a caller that stops waiting must not cancel the upload
+        job, pdf_bytes = await asyncio.wait_for(asyncio.shield(task), PDF_STATUS_WAIT_S)
+    except asyncio.TimeoutError:
+        return {"status": "success", "job_id": job_id, "upload": "in_progress"}
+    _record_job(tool_context, job_id, job)
+    if job["status"] != "ready":
+        # Like the GCS-less path: deliver the PDF itself
+        encoded = base64.b64encode(pdf_bytes).decode("utf-8")
+        return {"status": "success", "job_id": job_id, "upload": "failed", "pdf_base64": encoded}
+    return {"status": "success", "job_id": job_id, "upload": "ready", "url": job["url"]}
 
 
 if __name__ == "__main__":
@@ -259,5 +475,6 @@ if __name__ == "__main__":
         "location": "New York, USA"
     }
     
-    pdf_url = pdf_creator_tool(plan_summary, user_info)
-    print("Generated PDF URL or base64:", pdf_url)
+    pdf_bytes = render_pdf(plan_summary, user_info)
+    pdf_url = upload_pdf_to_gcs(pdf_bytes, user_info["name"])
+    print("Generated PDF URL:", pdf_url)
@@ -0,0 +1,254 @@
+# ───────────────────────────────────────────────────────────────
+# PdfExtractionStage – off-event-loop PDF text extraction
+# Runs PyMuPDF in a bounded process pool for uploaded lab reports
+# ───────────────────────────────────────────────────────────────
+# main.py awaits   pdf_extraction_stage.extract(pdf_bytes)
+# from a per-upload task, so audio frames and other WebSockets on the
+# same worker keep flowing while a long report is being parsed.
+#   • at most PDF_EXTRACT_WORKERS extractions run at once
+#   • at most PDF_EXTRACT_MAX_PENDING are accepted (running + queued);
+#     further uploads are rejected with ExtractionQueueFull
+#   • each caller waits at most PDF_EXTRACT_TIMEOUT_S; a timed-out run
+#     keeps its worker, and its place in the count, until it finishes
+# Partial uploads (chunked_upload.py) may call try_extract_prefix to
+# extract pages early; those runs never queue behind busy workers.
+# Metrics: pdf_extraction.queue_depth (gauge),
+#          pdf_extraction.latency_ms / .prefix_latency_ms (timings),
+#          .rejected / .timeouts / .reused_pages / .prefix_skipped
+# ───────────────────────────────────────────────────────────────
+
+from __future__ import annotations
+import asyncio
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+
+import fitz  # PyMuPDF
+
+from . import metrics
+from .lab_report_parser import page_rows, parse_lab_report_rows
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "2"))
+PDF_EXTRACT_MAX_PENDING = int(os.getenv("PDF_EXTRACT_MAX_PENDING", "8"))
+PDF_EXTRACT_TIMEOUT_S = float(os.getenv("PDF_EXTRACT_TIMEOUT_S", "30"))
+
+
+class ExtractionQueueFull(RuntimeError):
+    """Raised when the extraction stage is already at capacity."""
+
+
+class ExtractionTimeout(TimeoutError):
+    """Raised when a single extraction exceeds its deadline."""
+
+
+def _page_fingerprint(page: fitz.Page) -> str:
+    """Digest of the page object, its content streams and its resource dictionary."""
+    document = page.parent
+    digest = hashlib.sha1(document.xref_object(page.xref, compressed=True).encode())
+    for xref in page.get_contents():
+        digest.update(document.xref_stream_raw(xref) or b"")
+    kind, value = document.xref_get_key(page.xref, "Resources")
+    if kind == "xref":
+        digest.update(document.xref_object(int(value.split()[0]), compressed=True).encode())
+    return digest.hexdigest()
+
+
+def _extract_page(page: fitz.Page) -> Dict[str, Any]:
+    return {
+        "xref": page.xref,
+        "fingerprint": _page_fingerprint(page),
+        "text": page.get_text(),
+        "rows": page_rows(page),
+    }
+
+
+def extract_pdf(
+    pdf_bytes: bytes, known_pages: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Extracts per-page text from a PDF. Runs inside a worker process.
+
+    Args:
+        pdf_bytes: bytes -> Raw PDF file content
+        known_pages: List[Dict] -> Pages already extracted from a prefix of the
+            same upload (see extract_pdf_prefix); reused while their page
+            objects, content streams and resources are unchanged in the
+            complete file (an incremental update can redefine them)
+
+    Returns:
+        Dict with `pages` (list of page texts), `page_count`, `lab_report`
+        (deterministically parsed labReport, or None if it could not be parsed)
+        and `reused_pages`.
+    """
+    known_pages = known_pages or []
+    extracted: List[Dict[str, Any]] = []
+    reused = 0
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        for index, page in enumerate(pdf_document):
+            if (
+                index < len(known_pages)
+                and known_pages[index]["xref"] == page.xref
+                and known_pages[index].get("fingerprint") == _page_fingerprint(page)
+            ):
+                extracted.append(known_pages[index])
+                reused += 1
+            else:
+                # Page order or content differs from the prefix from here on; stop reusing
+                known_pages = []
+                extracted.append(_extract_page(page))
+    try:
+        lab_report = parse_lab_report_rows([page["rows"] for page in extracted])
+    except Exception:
+        # The model still gets the raw text if the local parser chokes
+        lab_report = None
+    return {
+        "pages": [page["text"] for page in extracted],
+        "page_count": len(extracted),
+        "lab_report": lab_report,
+        "reused_pages": reused,
+    }
+
+
+def extract_pdf_prefix(pdf_prefix: bytes, start_page: int) -> Dict[str, Any]:
+    """
+    Extracts whatever pages MuPDF can already load from the first bytes of an
+    upload that is still in flight. Runs inside a worker process.
+
+    Pages found here are only candidates: the caller accepts a page once two
+    successive prefixes give the same result for it.
+
+    Args:
+        pdf_prefix: bytes -> The bytes received so far
+        start_page: int -> First page index to extract
+
+    Returns:
+        Dict with `pages`: list of {xref, text, rows} from start_page onwards.
+    """
+    pages: List[Dict[str, Any]] = []
+    fitz.TOOLS.mupdf_display_errors(False)
+    try:
+        pdf_document = fitz.open(stream=pdf_prefix, filetype="pdf")
+    except Exception:
+        return {"pages": pages}
+    with pdf_document:
+        for index in range(start_page, pdf_document.page_count):
+            try:
+                pages.append(_extract_page(pdf_document[index]))
+            except Exception:
+                break
+    return {"pages": pages}
+
+
+class PdfExtractionStage:
+    """Bounded process-pool stage that extracts PDF text off the event loop."""
+
+    def __init__(
+        self,
+        max_workers: int = PDF_EXTRACT_WORKERS,
+        max_pending: int = PDF_EXTRACT_MAX_PENDING,
+        timeout_s: float = PDF_EXTRACT_TIMEOUT_S,
+    ):
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self.timeout_s = timeout_s
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Extractions currently running or waiting for a worker."""
+        return self._pending
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created lazily so importing main.py does not fork workers
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def extract(
+        self, pdf_bytes: bytes, known_pages: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Extracts a PDF in the process pool without blocking the event loop.
+
+        Raises:
+            ExtractionQueueFull: If max_pending extractions are already in flight
+            ExtractionTimeout: If the extraction does not finish within timeout_s
+        """
+        if self._pending >= self.max_pending:
+            metrics.incr("pdf_extraction.rejected")
+            raise ExtractionQueueFull(
+                f"{self._pending} PDF extractions already in flight"
+            )
+        result = await self._run("latency_ms", extract_pdf, pdf_bytes, known_pages)
+        metrics.incr("pdf_extraction.reused_pages", result["reused_pages"])
+        return result
+
+    async def try_extract_prefix(
+        self, pdf_prefix: bytes, start_page: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Speculatively extracts pages from a partial upload. Returns None instead
+        of queueing when every worker is busy, so complete uploads keep priority.
+        """
+        if self._pending >= self.max_workers:
+            metrics.incr("pdf_extraction.prefix_skipped")
+            return None
+        return await self._run("prefix_latency_ms", extract_pdf_prefix, pdf_prefix, start_page)
+
+    async def _run(
+        self, timing: str, fn: Callable[..., Dict[str, Any]], *args
+    ) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+        metrics.set_gauge("pdf_extraction.queue_depth", self._pending)
+        start = time.perf_counter()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is held until the worker is really done, not until the
+        # caller stops waiting, so timed-out runs still count against the pool
+        future.add_done_callback(lambda _: self._release_threadsafe(loop))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout_s)
+        except asyncio.TimeoutError:
+            # A queued extraction is cancelled; a running one finishes in its worker
+            metrics.incr("pdf_extraction.timeouts")
+            raise ExtractionTimeout(
+                f"PDF extraction exceeded {self.timeout_s:.0f}s"
+            ) from None
+        except BrokenProcessPool:
+            # A worker died (e.g. a malformed PDF crashed MuPDF); start a fresh pool
+            metrics.incr("pdf_extraction.pool_restarts")
+            self._reset_executor()
+            raise
+        finally:
+            metrics.observe(
+                f"pdf_extraction.{timing}", (time.perf_counter() - start) * 1000
+            )
+
+    def _release(self) -> None:
+        self._pending -= 1
+        metrics.set_gauge("pdf_extraction.queue_depth", self._pending)
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Done callbacks run on the executor's management thread
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # The loop is gone; nothing is waiting on the count any more
+            self._release()
+
+    def _reset_executor(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        """Stops the worker pool; queued extractions are cancelled."""
+        self._reset_executor()
@@ -0,0 +1,270 @@
+# ───────────────────────────────────────────────────────────────
+# ProviderIndex – offline spatial index of healthcare providers
+# Lets nearest_doctor_finder answer without the Maps API
+# ───────────────────────────────────────────────────────────────
+# Set PROVIDER_INDEX_DIR to a directory of *.csv / *.geojson files,
+# one provider per row / Point feature, with (aliases accepted):
+#   name, lat|latitude, lng|lon|longitude, specialty|specialties|
+#   category|type ("a; b" for several), address, phone, website,
+#   rating, place_id|id
+# The files are loaded at startup (main.py, in a thread) or on first
+# use into a shapely STRtree of points. Rows with unusable values (no
+# coordinates, rating "N/A", broken GeoJSON features) are skipped; a
+# directory that cannot be read at all leaves the index off.
+# A radius query takes the tree's candidates in the bounding box of
+# the circle and keeps those within the radius by exact haversine
+# distance (NumPy, one vectorized pass); k-nearest widens the radius
+# until k matches are inside it. Specialty matching is on word stems,
+# so "cardiologist" finds "Cardiology" and "dentist" "Dental clinic";
+# providers without a specialty are matched on their name.
+# Metrics: provider_index.query_ms, provider_index.load_ms,
+#          provider_index.skipped_rows, provider_index.providers (gauge)
+# ───────────────────────────────────────────────────────────────
+
+from __future__ import annotations
+import csv
+import json
+import math
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from . import metrics
+
+PROVIDER_INDEX_DIR = os.getenv("PROVIDER_INDEX_DIR", "")
+# Fall back to the live Maps search when the index has no match
+PROVIDER_INDEX_FALLBACK = os.getenv("PROVIDER_INDEX_FALLBACK", "true").lower() == "true"
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# k-nearest starts looking this far out and widens up to the max radius
+_KNN_START_KM = 1.0
+
+_ALIASES = {
+    "lat": ("lat", "latitude"),
+    "lng": ("lng", "lon", "long", "longitude"),
+    "specialty": ("specialty", "specialties", "category", "type", "types"),
+    "place_id": ("place_id", "id"),
+}
+_STEM_SUFFIXES = (
+    ("ologists", "olog"), ("ologist", "olog"), ("ology", "olog"), ("ological", "olog"),
+    ("ists", ""), ("ist", ""), ("icians", ""), ("ician", ""), ("ians", ""), ("ian", ""),
+    ("als", ""), ("al", ""), ("s", ""),
+)
+_WORD = re.compile(r"[a-z]+")
+
+
+def _stem(word: str) -> str:
+    for suffix, replacement in _STEM_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)] + replacement
+    return word
+
+
+def _stems(text: str) -> set:
+    return {_stem(word) for word in _WORD.findall(text.lower())}
+
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Great-circle distances (km) from one point to arrays of points, all in degrees."""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlng = np.radians(lngs) - math.radians(lng)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _field(row: Dict[str, Any], name: str) -> Any:
+    for alias in _ALIASES.get(name, (name,)):
+        value = row.get(alias)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _read_rows(path: Path) -> Iterator[Dict[str, Any]]:
+    if path.suffix.lower() == ".csv":
+        with path.open(newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield {key.strip().lower(): value for key, value in row.items() if key}
+        return
+    data = json.loads(path.read_text(encoding="utf-8"))
+    for feature in data.get("features", []):
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") != "Point":
+            continue
+        try:
+            lng, lat = geometry["coordinates"][:2]
+        except (KeyError, TypeError, ValueError):
+            metrics.incr("provider_index.skipped_rows")
+            continue
+        properties = {key.lower(): value for key, value in (feature.get("properties") or {}).items()}
+        yield {**properties, "lat": lat, "lng": lng}
+
+
+class ProviderIndex:
+    """Providers with an STRtree over their locations."""
+
+    def __init__(self, providers: List[Dict[str, Any]]):
+        self.providers = providers
+        self.lats = np.array([p["lat"] for p in providers], dtype=np.float64)
+        self.lngs = np.array([p["lng"] for p in providers], dtype=np.float64)
+        self.tree = STRtree(shapely.points(self.lngs, self.lats))
+        # Specialty strings repeat a lot: match each distinct one once per query
+        specialties: Dict[str, int] = {}
+        self._specialty_codes = np.array(
+            [specialties.setdefault(p["specialty"].lower(), len(specialties)) for p in providers],
+            dtype=np.int32,
+        )
+        self._specialty_stems = [_stems(text) for text in specialties]
+        self._no_specialty = specialties.get("", -1)
+        metrics.set_gauge("provider_index.providers", len(providers))
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "ProviderIndex":
+        providers = []
+        skipped = 0
+        for row in rows:
+            lat, lng = _field(row, "lat"), _field(row, "lng")
+            if lat is None or lng is None:
+                skipped += 1
+                continue
+            specialty = _field(row, "specialty") or ""
+            if isinstance(specialty, list):
+                specialty = "; ".join(map(str, specialty))
+            try:
+                lat, lng = float(lat), float(lng)
+            except (TypeError, ValueError):
+                skipped += 1
+                continue
+            try:
+                rating = float(_field(row, "rating"))
+            except (TypeError, ValueError):
+                # Missing or e.g. "N/A": the provider is still worth listing
+                rating = None
+            providers.append({
+                "name": str(_field(row, "name") or "Unnamed provider"),
+                "lat": lat,
+                "lng": lng,
+                "specialty": str(specialty),
+                "address": _field(row, "address"),
+                "phone": _field(row, "phone"),
+                "website": _field(row, "website"),
+                "rating": rating if rating is not None and math.isfinite(rating) else None,
+                "place_id": _field(row, "place_id"),
+            })
+        if skipped:
+            metrics.incr("provider_index.skipped_rows", skipped)
+            print(f"Skipped {skipped} provider rows without usable coordinates")
+        return cls(providers)
+
+    @classmethod
+    def from_directory(cls, directory: str) -> "ProviderIndex":
+        paths = sorted(
+            p for p in Path(directory).iterdir() if p.suffix.lower() in (".csv", ".geojson", ".json")
+        )
+        return cls.from_rows(row for path in paths for row in _read_rows(path))
+
+    def __len__(self) -> int:
+        return len(self.providers)
+
+    def _matches(self, candidates: np.ndarray, query: str) -> np.ndarray:
+        """Mask of candidates whose specialty (name if they have none) matches query."""
+        stems = _stems(query)
+        if not stems:
+            return np.ones(len(candidates), dtype=bool)
+        by_specialty = np.array([stems <= s for s in self._specialty_stems], dtype=bool)
+        codes = self._specialty_codes[candidates]
+        mask = by_specialty[codes]
+        for i in np.flatnonzero(codes == self._no_specialty):
+            mask[i] = stems <= _stems(self.providers[candidates[i]]["name"])
+        return mask
+
+    def _within(self, lat: float, lng: float, radius_km: float, query: str):
+        """(indices, distances) of matching providers within radius_km."""
+        dlat = radius_km / KM_PER_DEGREE
+        # Widest in longitude at its most poleward latitude
+        dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(min(abs(lat) + dlat, 90))), 1e-6))
+        box = shapely.box(lng - dlng, max(lat - dlat, -90), lng + dlng, min(lat + dlat, 90))
+        candidates = self.tree.query(box)
+        # Specialty first: it is a table lookup, distances are trig
+        candidates = candidates[self._matches(candidates, query)]
+        distances = haversine_km(lat, lng, self.lats[candidates], self.lngs[candidates])
+        keep = distances <= radius_km
+        return candidates[keep], distances[keep]
+
+    def search(
+        self,
+        query: str,
+        lat: float,
+        lng: float,
+        radius_km: float,
+        k: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Providers matching `query` within `radius_km`, nearest first.
+
+        Args:
+            k: Return only the k nearest (None: everything inside the radius)
+
+        Returns:
+            Provider dicts with an added "distance_km"
+        """
+        with metrics.timer("provider_index.query_ms"):
+            if k is None:
+                found, distances = self._within(lat, lng, radius_km, query)
+            else:
+                search_km = min(_KNN_START_KM, radius_km)
+                while True:
+                    found, distances = self._within(lat, lng, search_km, query)
+                    # Every provider nearer than search_km is in `found`
+                    if len(found) >= k or search_km >= radius_km:
+                        break
+                    # Grow the area by the shortfall (assuming even density), 2-8× per step
+                    growth = math.sqrt(1.5 * k / max(len(found), 1))
+                    search_km = min(search_km * min(max(growth, 2), 8), radius_km)
+            order = np.argsort(distances, kind="stable")
+            if k is not None:
+                order = order[:k]
+            return [
+                {**self.providers[found[i]], "distance_km": float(distances[i])}
+                for i in order
+            ]
+
+
+_lock = threading.Lock()
+_index: Optional[ProviderIndex] = None
+_loaded = False
+
+
+def get_provider_index() -> Optional[ProviderIndex]:
+    """
+    The index of PROVIDER_INDEX_DIR, loaded on first use; None if not
+    configured or unreadable. Loading blocks: call it from a thread.
+    """
+    global _index, _loaded
+    if _loaded:
+        return _index
+    with _lock:
+        if not _loaded:
+            try:
+                if PROVIDER_INDEX_DIR:
+                    start = time.perf_counter()
+                    _index = ProviderIndex.from_directory(PROVIDER_INDEX_DIR)
+                    metrics.observe("provider_index.load_ms", (time.perf_counter() - start) * 1000)
+                    print(f"Loaded {len(_index)} providers from {PROVIDER_INDEX_DIR}")
+            except (OSError, ValueError) as e:
+                # ValueError covers invalid JSON and undecodable text
+                print(f"Provider index not loaded from {PROVIDER_INDEX_DIR}: {e}")
+            finally:
+                # Never retried: a broken directory must not be re-read on every call
+                _loaded = True
+    return _index
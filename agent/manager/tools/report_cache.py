@@ -0,0 +1,247 @@
+# ───────────────────────────────────────────────────────────────
+# ReportCache – content-addressed cache for uploaded lab reports
+# In-memory LRU (size bounded) in front of an on-disk SQLite tier
+# ───────────────────────────────────────────────────────────────
+# Entries are keyed by the SHA-256 of the PDF bytes (first 16 hex
+# chars, short enough for the model to quote back) and hold:
+#   • pages       – extracted page texts (skips PyMuPDF on re-upload)
+#   • lab_report  – labReport JSON produced by intake_agent (skips the
+#                   model extraction round-trip on re-upload)
+# intake_agent stores its extraction via the `save_lab_report` tool.
+# The cache is shared by all users, so tools only accept document ids
+# the current session uploaded: main.py records each upload under
+# session state `uploaded_documents.<document_id>` (record_upload).
+# ───────────────────────────────────────────────────────────────
+
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from cachetools import LRUCache
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.tools.tool_context import ToolContext
+
+from . import metrics
+from .session_manager import update_session_state_async
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_DB = os.getenv("REPORT_CACHE_DB", "./report_cache.db")
+REPORT_CACHE_MEMORY_BYTES = int(os.getenv("REPORT_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+REPORT_CACHE_MAX_DISK_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_DISK_ENTRIES", "5000"))
+
+DOCUMENT_ID_LENGTH = 16
+
+
+def document_id_for(pdf_bytes: bytes) -> str:
+    """Content address of an uploaded file (truncated SHA-256 hex digest)."""
+    return hashlib.sha256(pdf_bytes).hexdigest()[:DOCUMENT_ID_LENGTH]
+
+
+def _entry_size(entry: Dict[str, Any]) -> int:
+    size = sum(len(page) for page in entry.get("pages") or [])
+    if entry.get("lab_report"):
+        size += len(json.dumps(entry["lab_report"]))
+    return max(size, 1)
+
+
+class ReportCache:
+    """Two-tier (memory LRU + SQLite) cache of extracted report data."""
+
+    def __init__(
+        self,
+        db_path: str = REPORT_CACHE_DB,
+        max_memory_bytes: int = REPORT_CACHE_MEMORY_BYTES,
+        max_disk_entries: int = REPORT_CACHE_MAX_DISK_ENTRIES,
+    ):
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self._memory: LRUCache = LRUCache(maxsize=max_memory_bytes, getsizeof=_entry_size)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        # Opened lazily; callers hold self._lock
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS report_cache (
+                    document_id  TEXT PRIMARY KEY,
+                    pages        TEXT,
+                    lab_report   TEXT,
+                    created_at   REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _remember(self, document_id: str, entry: Dict[str, Any]) -> None:
+        try:
+            self._memory[document_id] = entry
+        except ValueError:
+            # Larger than the whole memory tier; keep it on disk only
+            self._memory.pop(document_id, None)
+
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Looks up a report by document id.
+
+        Returns:
+            Dict with `pages` and `lab_report` (either may be None), or None on a miss.
+        """
+        with self._lock:
+            entry = self._memory.get(document_id)
+            if entry is not None:
+                metrics.incr("report_cache.memory_hits")
+                return entry
+
+            db = self._db()
+            row = db.execute(
+                "SELECT pages, lab_report FROM report_cache WHERE document_id = ?",
+                (document_id,),
+            ).fetchone()
+            if row is None:
+                metrics.incr("report_cache.misses")
+                return None
+
+            db.execute(
+                "UPDATE report_cache SET last_used_at = ? WHERE document_id = ?",
+                (time.time(), document_id),
+            )
+            db.commit()
+            entry = self._row_to_entry(row)
+            self._remember(document_id, entry)
+            metrics.incr("report_cache.disk_hits")
+            return entry
+
+    def _put(self, document_id: str, **fields: Any) -> None:
+        with self._lock:
+            now = time.time()
+            db = self._db()
+            db.execute(
+                """
+                INSERT INTO report_cache (document_id, pages, lab_report, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(document_id) DO UPDATE SET
+                    pages = COALESCE(excluded.pages, report_cache.pages),
+                    lab_report = COALESCE(excluded.lab_report, report_cache.lab_report),
+                    last_used_at = excluded.last_used_at
+                """,
+                (
+                    document_id,
+                    json.dumps(fields["pages"]) if fields.get("pages") is not None else None,
+                    json.dumps(fields["lab_report"]) if fields.get("lab_report") is not None else None,
+                    now,
+                    now,
+                ),
+            )
+            self._prune(db)
+            db.commit()
+            # Re-read so the memory tier mirrors the merged row
+            row = db.execute(
+                "SELECT pages, lab_report FROM report_cache WHERE document_id = ?",
+                (document_id,),
+            ).fetchone()
+            self._memory.pop(document_id, None)
+            if row is not None:
+                self._remember(document_id, self._row_to_entry(row))
+
+    @staticmethod
+    def _row_to_entry(row) -> Dict[str, Any]:
+        return {
+            "pages": json.loads(row[0]) if row[0] else None,
+            "lab_report": json.loads(row[1]) if row[1] else None,
+        }
+
+    def _prune(self, db: sqlite3.Connection) -> None:
+        db.execute(
+            """
+            DELETE FROM report_cache WHERE document_id IN (
+                SELECT document_id FROM report_cache
+                ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_disk_entries,),
+        )
+
+    def put_pages(self, document_id: str, pages: List[str]) -> None:
+        """Stores the extracted page texts for a document."""
+        self._put(document_id, pages=pages)
+
+    def put_lab_report(self, document_id: str, lab_report: Dict[str, Any]) -> None:
+        """Stores the structured labReport JSON for a document."""
+        self._put(document_id, lab_report=lab_report)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Process-wide instance shared by main.py and the save_lab_report tool
+report_cache = ReportCache()
+
+
+async def record_upload(
+    session_service: BaseSessionService,
+    session: Session,
+    document_id: str,
+    filename: str,
+) -> None:
+    """Records that the session uploaded document_id, so its tools may use it."""
+    try:
+        result = await update_session_state_async(
+            session_service, session.app_name, session.user_id, session.id,
+            updates={f"uploaded_documents.{document_id}": filename},
+        )
+    except Exception as e:
+        result = {"status": "error", "message": str(e)}
+    if result["status"] != "success":
+        logger.error(f"Could not record upload {document_id} in session {session.id}: {result['message']}")
+
+
+def uploaded_in_session(tool_context: ToolContext, document_id: str) -> bool:
+    """True if the current session uploaded document_id (see record_upload)."""
+    return document_id in (tool_context.state.get("uploaded_documents") or {})
+
+
+def save_lab_report(
+    document_id: str,
+    lab_report: Dict[str, Any],
+    tool_context: ToolContext,
+) -> Dict[str, Any]:
+    """
+    Saves the structured labReport extracted from an uploaded PDF so that the
+    same file never has to be extracted again.
+
+    Args:
+        document_id: str -> The document id given in the upload message
+        lab_report: Dict -> The labReport JSON extracted from the report
+
+    Returns:
+        Dict with the save status.
+    """
+    tool_context.state["parsed_report"] = lab_report
+    if not document_id:
+        return {"status": "error", "message": "document_id is required"}
+    if not uploaded_in_session(tool_context, document_id):
+        # Other users get this entry as-is: only a document this session uploaded
+        metrics.incr("report_cache.rejected_saves")
+        return {"status": "error", "message": f"Document {document_id} was not uploaded in this conversation."}
+    try:
+        report_cache.put_lab_report(document_id, lab_report)
+    except Exception as e:
+        logger.error(f"Failed to cache lab report {document_id}: {e}")
+        return {"status": "error", "message": f"Could not cache lab report: {e}"}
+    return {"status": "success", "document_id": document_id}
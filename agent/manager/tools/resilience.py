@@ -0,0 +1,351 @@
+# ───────────────────────────────────────────────────────────────
+# Resilience – rate limiting, retries and circuit breaking for the
+# Google APIs the functional tools call (Calendar, Maps)
+# ───────────────────────────────────────────────────────────────
+# Every upstream call goes through a Budget, one per (API, key); the
+# calendar tools use the signed-in account as key, so each user gets
+# their own share of the per-user quota. A Budget combines:
+#   • a token bucket (<API>_QPS, <API>_BURST): calls wait up to
+#     <API>_MAX_WAIT_S for a token, then fail fast instead of queueing
+#   • jittered exponential retries of transient failures (429, quota
+#     403s, 5xx, timeouts) up to <API>_MAX_ATTEMPTS and within
+#     <API>_RETRY_DEADLINE_S (or the caller's shorter deadline_s),
+#     honouring Retry-After. Non-idempotent
+#     calls (inserts) are only retried when the API rejected them
+#     outright (throttling), never after a 5xx that may have applied
+#   • a retry budget: retries may add at most <API>_RETRY_RATIO of
+#     the calls made, so a brownout does not multiply the load
+#   • a circuit breaker: after <API>_BREAKER_FAILURES consecutive
+#     transient failures calls fail at once for <API>_BREAKER_RESET_S,
+#     then one probe call decides whether to close it again
+#   resilience.budget("calendar", account).call(request.execute,
+#                                               idempotent=False)
+# Rejected calls raise UpstreamUnavailable, whose message is written
+# for the model to relay to the user.
+# Metrics: resilience.<api>.retries, .throttled (waited for a token),
+#          .rate_limited, .retry_budget_exhausted, .breaker_trips,
+#          .breaker_rejections, resilience.<api>.breaker_open (gauge)
+# ───────────────────────────────────────────────────────────────
+
+from __future__ import annotations
+import os
+import random
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from . import metrics
+
+# HTTP statuses worth retrying; everything else in 4xx is the caller's fault
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Reasons Google puts in 403s that are really throttling
+THROTTLE_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded"}
+# Statuses (strings) the Maps web services report in their JSON body
+MAPS_TRANSIENT_STATUSES = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+
+
+class UpstreamUnavailable(Exception):
+    """A call was not made: the API's breaker is open or its rate budget is spent."""
+
+    def __init__(self, api: str, reason: str, retry_after_s: float):
+        self.api = api
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+        super().__init__(
+            f"{_display_name(api)} is temporarily unavailable ({reason}). "
+            f"Please try again in about {max(1, round(retry_after_s))} seconds."
+        )
+
+
+# ── error classification ─────────────────────────────────────
+def _status(error: BaseException) -> Optional[int]:
+    # googleapiclient HttpError carries resp.status; googlemaps HTTPError status_code
+    resp = getattr(error, "resp", None)
+    status = getattr(resp, "status", None) or getattr(error, "status_code", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _reasons(error: BaseException) -> set:
+    details = getattr(error, "error_details", None)
+    if isinstance(details, list):
+        return {d.get("reason") for d in details if isinstance(d, dict)}
+    return set()
+
+
+def is_throttled(error: BaseException) -> bool:
+    """True if the API refused the call for rate/quota reasons (so it was not applied)."""
+    status = _status(error)
+    if status == 429:
+        return True
+    if status == 403 and _reasons(error) & THROTTLE_REASONS:
+        return True
+    return getattr(error, "status", None) == "OVER_QUERY_LIMIT"
+
+
+def is_transient(error: BaseException) -> bool:
+    """True if the same call may well succeed if tried again."""
+    if is_throttled(error) or _status(error) in RETRYABLE_STATUSES:
+        return True
+    if getattr(error, "status", None) in MAPS_TRANSIENT_STATUSES:
+        return True
+    if isinstance(error, (TimeoutError, socket.timeout, ConnectionError)):
+        return True
+    # googlemaps.exceptions.Timeout / TransportError (connection failures)
+    return type(error).__module__.startswith("googlemaps") and type(error).__name__ in (
+        "Timeout",
+        "TransportError",
+    )
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    resp = getattr(error, "resp", None)
+    value = resp.get("retry-after") if hasattr(resp, "get") else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+# ── building blocks ──────────────────────────────────────────
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `burst` saved up."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, cost: float) -> float:
+        """Takes `cost` tokens if available; otherwise returns the wait needed."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= cost:
+                self._tokens -= cost
+                return 0.0
+            return (cost - self._tokens) / self.rate
+
+    def acquire(self, cost: float = 1, max_wait_s: float = 0) -> Tuple[bool, float]:
+        """
+        Waits up to `max_wait_s` for `cost` tokens.
+
+        Returns:
+            (acquired, seconds waited or, if not acquired, seconds still needed)
+        """
+        # Batches larger than the bucket can still go through once it is full
+        cost = min(cost, self.burst)
+        deadline = time.monotonic() + max_wait_s
+        waited = 0.0
+        while True:
+            wait = self._reserve(cost)
+            if wait == 0:
+                return True, waited
+            if time.monotonic() + wait > deadline:
+                return False, wait
+            time.sleep(wait)
+            waited += wait
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed → open → half-open (one probe) → closed."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int, reset_after_s: float):
+        self.failure_threshold = failure_threshold
+        self.reset_after_s = reset_after_s
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> Tuple[bool, float]:
+        """Returns (call may proceed, seconds until the next probe if not)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True, 0.0
+            remaining = self._opened_at + self.reset_after_s - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                # This caller is the probe; others keep failing fast meanwhile
+                self.state = self.HALF_OPEN
+                return True, 0.0
+            return False, max(remaining, 1.0)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> bool:
+        """Counts a transient failure; returns True if this opened the breaker."""
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self._failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+
+# ── per-API settings ─────────────────────────────────────────
+# Calendar's default quota is 600 requests/minute per user; Maps web
+# services allow 50 QPS per project (the client shares it across users)
+_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "calendar": {
+        "display_name": "Google Calendar",
+        "QPS": 8, "BURST": 16, "MAX_WAIT_S": 2,
+        "MAX_ATTEMPTS": 4, "RETRY_BASE_S": 0.25, "RETRY_MAX_S": 4, "RETRY_DEADLINE_S": 10,
+        "RETRY_RATIO": 0.2, "BREAKER_FAILURES": 5, "BREAKER_RESET_S": 30,
+    },
+    "maps": {
+        "display_name": "Google Maps",
+        "QPS": 40, "BURST": 40, "MAX_WAIT_S": 2,
+        "MAX_ATTEMPTS": 3, "RETRY_BASE_S": 0.25, "RETRY_MAX_S": 2, "RETRY_DEADLINE_S": 8,
+        "RETRY_RATIO": 0.2, "BREAKER_FAILURES": 5, "BREAKER_RESET_S": 30,
+    },
+}
+
+
+def _display_name(api: str) -> str:
+    return _DEFAULTS.get(api, {}).get("display_name", api)
+
+
+def _setting(api: str, name: str) -> float:
+    return float(os.getenv(f"{api.upper()}_{name}", _DEFAULTS[api][name]))
+
+
+class Budget:
+    """Rate limit, retry policy and breaker for one (API, key)."""
+
+    def __init__(self, api: str):
+        self.api = api
+        self.bucket = TokenBucket(_setting(api, "QPS"), _setting(api, "BURST"))
+        self.breaker = CircuitBreaker(
+            int(_setting(api, "BREAKER_FAILURES")), _setting(api, "BREAKER_RESET_S")
+        )
+        self.max_wait_s = _setting(api, "MAX_WAIT_S")
+        self.max_attempts = int(_setting(api, "MAX_ATTEMPTS"))
+        self.retry_base_s = _setting(api, "RETRY_BASE_S")
+        self.retry_max_s = _setting(api, "RETRY_MAX_S")
+        self.retry_deadline_s = _setting(api, "RETRY_DEADLINE_S")
+        self.retry_ratio = _setting(api, "RETRY_RATIO")
+        # Starts with a little credit so the first failures can be retried
+        self._retry_credit = 3.0
+        self._lock = threading.Lock()
+
+    def _metric(self, name: str) -> str:
+        return f"resilience.{self.api}.{name}"
+
+    def _admit(self, cost: float, max_wait_s: float) -> None:
+        allowed, retry_after = self.breaker.allow()
+        if not allowed:
+            metrics.incr(self._metric("breaker_rejections"))
+            raise UpstreamUnavailable(self.api, "too many recent failures", retry_after)
+        acquired, wait = self.bucket.acquire(cost, max_wait_s)
+        if not acquired:
+            metrics.incr(self._metric("rate_limited"))
+            if self.breaker.state == CircuitBreaker.HALF_OPEN:
+                # The probe never ran; reopen so a later caller probes instead
+                self.breaker.record_failure()
+            raise UpstreamUnavailable(self.api, "request rate limit reached", wait)
+        if wait:
+            metrics.incr(self._metric("throttled"))
+
+    def _take_retry_credit(self) -> bool:
+        with self._lock:
+            if self._retry_credit < 1:
+                return False
+            self._retry_credit -= 1
+            return True
+
+    def call(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        idempotent: bool = True,
+        cost: float = 1,
+        deadline_s: Optional[float] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Calls fn(*args, **kwargs) within this budget.
+
+        Args:
+            idempotent: False for calls that must not run twice (e.g. inserts);
+                they are only retried when throttled
+            cost: Quota units the call uses (e.g. number of requests in a batch)
+            deadline_s: Caller's own limit on waiting for a token and retrying,
+                when shorter than the API's
+
+        Raises:
+            UpstreamUnavailable: The call was not made (breaker open / rate limited)
+            Exception: The last error of fn when it is not retryable or retries ran out
+        """
+        with self._lock:
+            self._retry_credit = min(10.0, self._retry_credit + self.retry_ratio)
+        retry_deadline_s = self.retry_deadline_s
+        if deadline_s is not None:
+            retry_deadline_s = min(retry_deadline_s, deadline_s)
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            self._admit(cost, max(0.0, min(self.max_wait_s, start + retry_deadline_s - time.monotonic())))
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_transient(e):
+                    # The API answered; the request itself was wrong
+                    self.breaker.record_success()
+                    raise
+                if self.breaker.record_failure():
+                    metrics.incr(self._metric("breaker_trips"))
+                    print(f"{_display_name(self.api)} circuit opened after repeated failures: {e}")
+                metrics.set_gauge(self._metric("breaker_open"), int(self.breaker.state == CircuitBreaker.OPEN))
+
+                if attempt >= self.max_attempts or not (idempotent or is_throttled(e)):
+                    raise
+                # Full jitter, but never sooner than the server asked
+                delay = random.uniform(0, min(self.retry_max_s, self.retry_base_s * 2 ** (attempt - 1)))
+                delay = max(delay, min(_retry_after(e) or 0, self.retry_max_s))
+                if time.monotonic() - start + delay > retry_deadline_s:
+                    raise
+                if not self._take_retry_credit():
+                    metrics.incr(self._metric("retry_budget_exhausted"))
+                    raise
+                metrics.incr(self._metric("retries"))
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            metrics.set_gauge(self._metric("breaker_open"), 0)
+            return result
+
+
+_budgets_lock = threading.Lock()
+_budgets: Dict[Tuple[str, str], Budget] = {}
+
+
+def budget(api: str, key: str = "") -> Budget:
+    """The shared Budget of an API ("calendar", "maps") for one key (e.g. account)."""
+    budget_ = _budgets.get((api, key))
+    if budget_ is None:
+        with _budgets_lock:
+            budget_ = _budgets.get((api, key))
+            if budget_ is None:
+                budget_ = _budgets[(api, key)] = Budget(api)
+    return budget_
+
+
+def reset() -> None:
+    """Forgets all budgets (breaker state, buckets); used by tests."""
+    with _budgets_lock:
+        _budgets.clear()
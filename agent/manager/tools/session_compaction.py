@@ -0,0 +1,445 @@
+# ───────────────────────────────────────────────────────────────
+# SessionCompaction – checkpoint old events, archive expired sessions
+# Keeps my_agent_data.db and session load times bounded
+# ───────────────────────────────────────────────────────────────
+# One pass (compact_and_archive) does, for sessions idle for at least
+# COMPACT_IDLE_S so live connections are never touched:
+#   1. archive: sessions not updated for SESSION_ARCHIVE_TTL_DAYS are
+#      written to SESSION_ARCHIVE_DIR/<app>/<user>/<session>.json.gz
+#      (session row + every event) and deleted from the database
+#   2. compact: sessions with more than COMPACT_KEEP_EVENTS +
+#      COMPACT_MIN_EXCESS events keep their newest COMPACT_KEEP_EVENTS.
+#      Older events are appended to <session>.events.jsonl.gz in the
+#      archive, then replaced by one checkpoint event carrying a plain
+#      text digest of them; the same digest is stored in session state
+#      under `conversation_checkpoint`. Session state itself is already
+#      the fold of every state_delta, so nothing structured is lost.
+# The pass returns a report with DB size and session load time measured
+# before and after. main.py runs it every COMPACTION_INTERVAL_S;
+# compact_sessions.py runs it once from the command line.
+# A pass first takes a lease row in `maintenance_leases`; with several
+# uvicorn workers (or the CLI) only the lease holder runs, the others
+# skip. main.py keeps the lease for the whole interval, so one worker
+# compacts per interval.
+# Async URLs are mapped to their sync driver (postgresql+asyncpg →
+# postgresql+psycopg, sqlite+aiosqlite → sqlite, mysql+aiomysql →
+# mysql+pymysql), since the pass runs in a thread with a sync engine.
+# ───────────────────────────────────────────────────────────────
+
+from __future__ import annotations
+import asyncio
+import gzip
+import json
+import os
+import re
+import socket
+import statistics
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from google.adk.events.event import Event
+from google.adk.sessions.database_session_service import Base, StorageEvent, StorageSession
+from google.genai import types
+from sqlalchemy import (
+    Column,
+    Float,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    func,
+    insert,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as OrmSession, sessionmaker
+
+from . import metrics
+from .session_store import SESSION_DB_URL, _get_session
+
+COMPACT_KEEP_EVENTS = int(os.getenv("COMPACT_KEEP_EVENTS", "50"))
+COMPACT_MIN_EXCESS = int(os.getenv("COMPACT_MIN_EXCESS", "50"))
+COMPACT_IDLE_S = float(os.getenv("COMPACT_IDLE_S", "900"))
+COMPACT_SUMMARY_CHARS = int(os.getenv("COMPACT_SUMMARY_CHARS", "4000"))
+SESSION_ARCHIVE_TTL_DAYS = float(os.getenv("SESSION_ARCHIVE_TTL_DAYS", "30"))
+SESSION_ARCHIVE_DIR = os.getenv("SESSION_ARCHIVE_DIR", "./session_archive")
+COMPACTION_INTERVAL_S = float(os.getenv("COMPACTION_INTERVAL_S", "3600"))
+
+CHECKPOINT_PREFIX = "[Conversation checkpoint]"
+# Sessions whose load time is sampled for the report
+LOAD_SAMPLE_SESSIONS = 20
+# Characters kept from each older message in the digest
+DIGEST_LINE_CHARS = 200
+
+_whitespace_rx = re.compile(r"\s+")
+
+
+# Async driver → sync driver for the same database
+_SYNC_DRIVERS = {
+    "aiosqlite": "pysqlite",
+    "asyncpg": "psycopg",
+    "psycopg_async": "psycopg",
+    "aiomysql": "pymysql",
+    "asyncmy": "pymysql",
+}
+
+_LEASE_NAME = "session_compaction"
+_leases = Table(
+    "maintenance_leases",
+    MetaData(),
+    Column("name", String(64), primary_key=True),
+    Column("holder", String(128), nullable=False),
+    Column("expires_at", Float, nullable=False),
+)
+
+
+def _sync_url(db_url: str) -> str:
+    # The job uses a synchronous engine even when the app runs an async driver
+    url = make_url(db_url)
+    driver = url.get_driver_name()
+    if driver in _SYNC_DRIVERS:
+        url = url.set(drivername=f"{url.get_backend_name()}+{_SYNC_DRIVERS[driver]}")
+    return url.render_as_string(hide_password=False)
+
+
+def _lease_holder() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _acquire_lease(engine, holder: str, lease_s: float) -> bool:
+    """Takes (or renews) the compaction lease unless another holder has a live one."""
+    _leases.create(engine, checkfirst=True)
+    now = time.time()
+    with engine.begin() as connection:
+        taken = connection.execute(
+            update(_leases)
+            .where(_leases.c.name == _LEASE_NAME)
+            .where(or_(_leases.c.expires_at < now, _leases.c.holder == holder))
+            .values(holder=holder, expires_at=now + lease_s)
+        ).rowcount
+    if taken:
+        return True
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                insert(_leases).values(name=_LEASE_NAME, holder=holder, expires_at=now + lease_s)
+            )
+        return True
+    except IntegrityError:
+        # The row exists and someone else holds it
+        return False
+
+
+def _release_lease(engine, holder: str) -> None:
+    with engine.begin() as connection:
+        connection.execute(
+            update(_leases)
+            .where(_leases.c.name == _LEASE_NAME)
+            .where(_leases.c.holder == holder)
+            .values(expires_at=0)
+        )
+
+
+def _safe(part: str) -> str:
+    return re.sub(r"[^A-Za-z0-9@._-]", "_", part)
+
+
+def _archive_path(archive_dir: Path, storage_session: StorageSession, suffix: str) -> Path:
+    path = archive_dir / _safe(storage_session.app_name) / _safe(storage_session.user_id)
+    path.mkdir(parents=True, exist_ok=True)
+    return path / f"{_safe(storage_session.id)}{suffix}"
+
+
+def _event_line(event: Event) -> Optional[str]:
+    """One digest line for an event, or None when it carries nothing readable."""
+    if not event.content or not event.content.parts:
+        return None
+    pieces = []
+    for part in event.content.parts:
+        if part.text:
+            pieces.append(part.text)
+        elif part.function_call:
+            pieces.append(f"(called {part.function_call.name})")
+        elif part.function_response:
+            pieces.append(f"({part.function_response.name} returned)")
+    text_value = _whitespace_rx.sub(" ", " ".join(pieces)).strip()
+    if not text_value:
+        return None
+    if text_value.startswith(CHECKPOINT_PREFIX):
+        # An earlier checkpoint: carry its digest over in full
+        return text_value[len(CHECKPOINT_PREFIX):].strip()
+    return f"{event.author}: {text_value[:DIGEST_LINE_CHARS]}"
+
+
+def build_digest(events: List[Event], max_chars: int = COMPACT_SUMMARY_CHARS) -> str:
+    """Plain-text digest of events, keeping the most recent lines that fit."""
+    lines = [line for line in map(_event_line, events) if line]
+    kept, used = [], 0
+    for line in reversed(lines):
+        if used + len(line) + 1 > max_chars:
+            break
+        kept.append(line)
+        used += len(line) + 1
+    return "\n".join(reversed(kept))
+
+
+def _storage_size(engine) -> Optional[int]:
+    if engine.url.get_backend_name() != "sqlite" or not engine.url.database:
+        return None
+    database = Path(engine.url.database)
+    return sum(
+        path.stat().st_size
+        for path in (database, Path(f"{database}-wal"))
+        if path.exists()
+    )
+
+
+def _measure_load(factory: sessionmaker, keys: List[tuple]) -> Optional[float]:
+    """Median time (ms) to load the given sessions with all their events."""
+    if not keys:
+        return None
+    timings = []
+    for app_name, user_id, session_id in keys:
+        start = time.perf_counter()
+        with factory() as db:
+            _get_session(db, app_name, user_id, session_id, None)
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 2)
+
+
+def _largest_sessions(db: OrmSession, limit: int) -> List[tuple]:
+    rows = db.execute(
+        select(StorageEvent.app_name, StorageEvent.user_id, StorageEvent.session_id)
+        .group_by(StorageEvent.app_name, StorageEvent.user_id, StorageEvent.session_id)
+        .order_by(func.count().desc())
+        .limit(limit)
+    ).all()
+    return [tuple(row) for row in rows]
+
+
+def _archive_session(db: OrmSession, storage_session: StorageSession, archive_dir: Path) -> int:
+    events = db.scalars(
+        select(StorageEvent)
+        .where(StorageEvent.app_name == storage_session.app_name)
+        .where(StorageEvent.user_id == storage_session.user_id)
+        .where(StorageEvent.session_id == storage_session.id)
+        .order_by(StorageEvent.timestamp)
+    ).all()
+    record = {
+        "app_name": storage_session.app_name,
+        "user_id": storage_session.user_id,
+        "id": storage_session.id,
+        "state": storage_session.state,
+        "create_time": storage_session.create_time.isoformat(),
+        "update_time": storage_session.update_time.isoformat(),
+        "events": [json.loads(e.to_event().model_dump_json(exclude_none=True)) for e in events],
+    }
+    path = _archive_path(archive_dir, storage_session, ".json.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as archive:
+        json.dump(record, archive)
+
+    for storage_event in events:
+        db.delete(storage_event)
+    db.delete(storage_session)
+    db.commit()
+    return len(events)
+
+
+def _compact_session(
+    db: OrmSession, storage_session: StorageSession, keep_events: int, archive_dir: Path
+) -> int:
+    events = db.scalars(
+        select(StorageEvent)
+        .where(StorageEvent.app_name == storage_session.app_name)
+        .where(StorageEvent.user_id == storage_session.user_id)
+        .where(StorageEvent.session_id == storage_session.id)
+        .order_by(StorageEvent.timestamp)
+    ).all()
+    split = len(events) - keep_events
+    if split <= 0:
+        return 0
+    old, recent = events[:split], events[split:]
+    old_events = [e.to_event() for e in old]
+
+    # Cold copy first, so a crash after this point loses nothing
+    path = _archive_path(archive_dir, storage_session, ".events.jsonl.gz")
+    with gzip.open(path, "at", encoding="utf-8") as archive:
+        for event in old_events:
+            archive.write(event.model_dump_json(exclude_none=True) + "\n")
+
+    digest = build_digest(old_events)
+    checkpoint = Event(
+        invocation_id=old_events[-1].invocation_id,
+        author="user",
+        content=types.Content(
+            role="user",
+            parts=[types.Part(text=f"{CHECKPOINT_PREFIX}\n{digest}")],
+        ),
+        # Sorts right before the first event that is kept
+        timestamp=recent[0].timestamp.timestamp() - 0.001,
+    )
+    for storage_event in old:
+        db.delete(storage_event)
+    db.add(StorageEvent.from_event(storage_session, checkpoint))
+    previous = storage_session.state.get("conversation_checkpoint", {})
+    state = {
+        **storage_session.state,
+        "conversation_checkpoint": {
+            "compacted_events": len(old) + previous.get("compacted_events", 0),
+            "through": old_events[-1].timestamp,
+            "digest": digest,
+        },
+    }
+    # Keep update_time as is: a connection that still holds this session
+    # must not see it as stale on its next append
+    db.execute(
+        update(StorageSession)
+        .where(StorageSession.app_name == storage_session.app_name)
+        .where(StorageSession.user_id == storage_session.user_id)
+        .where(StorageSession.id == storage_session.id)
+        .values(state=state, update_time=StorageSession.update_time)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return len(old)
+
+
+def compact_and_archive(
+    db_url: str = SESSION_DB_URL,
+    keep_events: int = COMPACT_KEEP_EVENTS,
+    min_excess: int = COMPACT_MIN_EXCESS,
+    idle_s: float = COMPACT_IDLE_S,
+    ttl_days: float = SESSION_ARCHIVE_TTL_DAYS,
+    archive_dir: str = SESSION_ARCHIVE_DIR,
+    vacuum: bool = False,
+    lease_s: float = COMPACTION_INTERVAL_S,
+    keep_lease: bool = False,
+) -> Dict[str, Any]:
+    """
+    Runs one compaction and archiving pass over the session database.
+
+    Args:
+        db_url: str -> Session database URL (as in SESSION_DB_URL)
+        keep_events: int -> Newest events kept per compacted session
+        min_excess: int -> Only compact sessions with this many events beyond keep_events
+        idle_s: float -> Skip sessions updated more recently than this
+        ttl_days: float -> Archive sessions idle for longer than this
+        archive_dir: str -> Directory for the gzip archives
+        vacuum: bool -> Reclaim free pages afterwards (SQLite; locks the DB briefly)
+        lease_s: float -> How long the compaction lease is held
+        keep_lease: bool -> Keep the lease after the pass, so no other process
+            runs one before it expires (main.py's periodic loop)
+
+    Returns:
+        Dict report: sessions archived / compacted, events removed, and
+        `before` / `after` with db_bytes and load_ms_p50 for the largest sessions;
+        {"skipped": True} if another process holds the lease.
+
+    Raises:
+        ValueError: If keep_events is below 1 (the checkpoint sorts before the
+            first kept event) or min_excess is negative
+    """
+    if keep_events < 1:
+        raise ValueError(f"keep_events must be at least 1, got {keep_events}")
+    if min_excess < 0:
+        raise ValueError(f"min_excess must not be negative, got {min_excess}")
+    engine = create_engine(_sync_url(db_url))
+    holder = _lease_holder()
+    if not _acquire_lease(engine, holder, lease_s):
+        engine.dispose()
+        metrics.incr("session_compaction.skipped")
+        return {"skipped": True}
+    try:
+        return _compact_and_archive(
+            engine, keep_events, min_excess, idle_s, ttl_days, Path(archive_dir), vacuum
+        )
+    finally:
+        if not keep_lease:
+            _release_lease(engine, holder)
+        engine.dispose()
+
+
+def _compact_and_archive(
+    engine,
+    keep_events: int,
+    min_excess: int,
+    idle_s: float,
+    ttl_days: float,
+    archive_path: Path,
+    vacuum: bool,
+) -> Dict[str, Any]:
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    start = time.perf_counter()
+
+    with factory() as db:
+        sample = _largest_sessions(db, LOAD_SAMPLE_SESSIONS)
+    report: Dict[str, Any] = {
+        "before": {"db_bytes": _storage_size(engine), "load_ms_p50": _measure_load(factory, sample)},
+        "archived_sessions": 0,
+        "compacted_sessions": 0,
+        "events_removed": 0,
+    }
+
+    with factory() as db:
+        # update_time comes from the database clock (UTC on SQLite), so use it too
+        now = db.scalar(select(func.now()))
+        idle_before = now - timedelta(seconds=idle_s)
+        archive_before = now - timedelta(days=ttl_days)
+
+        expired = db.scalars(
+            select(StorageSession).where(StorageSession.update_time < archive_before)
+        ).all()
+        for storage_session in expired:
+            report["events_removed"] += _archive_session(db, storage_session, archive_path)
+            report["archived_sessions"] += 1
+
+        counts = db.execute(
+            select(StorageEvent.app_name, StorageEvent.user_id, StorageEvent.session_id, func.count())
+            .group_by(StorageEvent.app_name, StorageEvent.user_id, StorageEvent.session_id)
+            .having(func.count() > keep_events + min_excess)
+        ).all()
+        for app_name, user_id, session_id, _count in counts:
+            storage_session = db.get(StorageSession, (app_name, user_id, session_id))
+            if storage_session is None or storage_session.update_time > idle_before:
+                continue
+            report["events_removed"] += _compact_session(db, storage_session, keep_events, archive_path)
+            report["compacted_sessions"] += 1
+
+    if vacuum and engine.url.get_backend_name() == "sqlite":
+        # VACUUM cannot run in a transaction, and in WAL mode it writes the
+        # rebuilt file into the WAL, so checkpoint afterwards
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("VACUUM"))
+            connection.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+
+    # Archived sessions drop out of the sample; measure the ones that remain
+    with factory() as db:
+        remaining = [key for key in sample if db.get(StorageSession, key)]
+    report["after"] = {"db_bytes": _storage_size(engine), "load_ms_p50": _measure_load(factory, remaining)}
+    report["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    metrics.incr("session_compaction.runs")
+    metrics.incr("session_compaction.events_removed", report["events_removed"])
+    metrics.incr("session_compaction.archived_sessions", report["archived_sessions"])
+    metrics.observe("session_compaction.duration_ms", report["duration_ms"])
+    return report
+
+
+async def run_compaction_forever(interval_s: float = COMPACTION_INTERVAL_S) -> None:
+    """Background loop for main.py: one pass every interval_s, off the event loop."""
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            # Every worker wakes up; the lease lets one of them run per interval
+            report = await asyncio.to_thread(compact_and_archive, lease_s=interval_s, keep_lease=True)
+            if not report.get("skipped"):
+                print(f"Session compaction: {json.dumps(report)}")
+        except Exception as e:
+            print(f"Session compaction failed: {e}")
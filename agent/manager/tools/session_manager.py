@@ -7,11 +7,19 @@
 # ───────────────────────────────────────────────────────────────
 
 from __future__ import annotations
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple, Union
 from datetime import datetime
 from pydantic import BaseModel, Field
+import copy
+import re
 import uuid
 
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions
+from google.adk.sessions import BaseSessionService
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.adk.tools.tool_context import ToolContext
+
 # ───────────────────────── schema ──────────────────────────────
 class SessionArgs(BaseModel):
     """Arguments required by SessionManagerTool."""
@@ -140,52 +148,302 @@ def session_manager_tool(
     return session_info
 
 
+# ───────────────────────── partial updates ─────────────────────
+# Paths address nested state: "user_profile.weight",
+# "health_report.test_results[3]", "analysis_results.follow_up_actions[-]"
+# ("[-]" appends to a list, as "/-" does in JSON Patch).
+_segment_rx = re.compile(r"([^.\[\]]+)|\[(\d+|-)\]")
+_MISSING: Any = object()
+_APPEND: Any = object()
+
+
+def parse_path(path: str) -> List[Union[str, int]]:
+    """
+    Splits a state path into dict keys (str) and list indexes (int, or
+    _APPEND for "[-]").
+
+    Raises:
+        ValueError: If the path is empty or malformed
+    """
+    segments: List[Union[str, int]] = []
+    position = 0
+    for match in _segment_rx.finditer(path):
+        gap = path[position:match.start()]
+        if gap not in ("", "."):
+            break
+        key, index = match.groups()
+        if key is not None:
+            segments.append(key)
+        else:
+            segments.append(_APPEND if index == "-" else int(index))
+        position = match.end()
+    if not segments or position != len(path) or not isinstance(segments[0], str):
+        raise ValueError(f"Invalid state path '{path}'")
+    return segments
+
+
+def _child(container: Any, segment: Union[str, int], path: str) -> Any:
+    if segment is not _APPEND and isinstance(segment, str):
+        if not isinstance(container, dict):
+            raise ValueError(f"'{path}': {segment} is not inside an object")
+        return container.setdefault(segment, {})
+    if not isinstance(container, list) or segment is _APPEND or segment >= len(container):
+        raise ValueError(f"'{path}': index {segment} does not exist")
+    return container[segment]
+
+
+def _set(container: Any, segment: Union[str, int], value: Any, path: str) -> bool:
+    """Sets one value; returns False when it was already equal."""
+    if segment is not _APPEND and isinstance(segment, str):
+        if not isinstance(container, dict):
+            raise ValueError(f"'{path}': {segment} is not inside an object")
+        if segment in container and container[segment] == value:
+            return False
+        container[segment] = value
+        return True
+    if not isinstance(container, list):
+        raise ValueError(f"'{path}': not a list")
+    if segment is _APPEND or segment == len(container):
+        container.append(value)
+        return True
+    if segment > len(container):
+        raise ValueError(f"'{path}': index {segment} is past the end of the list")
+    if container[segment] == value:
+        return False
+    container[segment] = value
+    return True
+
+
+def _existing_child(container: Any, segment: Union[str, int]) -> Any:
+    # Read-only counterpart of _child for removals; _MISSING if absent
+    if isinstance(segment, str) and segment is not _APPEND and isinstance(container, dict):
+        return container.get(segment, _MISSING)
+    if isinstance(segment, int) and isinstance(container, list) and segment < len(container):
+        return container[segment]
+    return _MISSING
+
+
+def _remove(container: Any, segment: Union[str, int], path: str) -> bool:
+    if isinstance(segment, str) and isinstance(container, dict) and segment in container:
+        del container[segment]
+        return True
+    if isinstance(segment, int) and isinstance(container, list) and segment < len(container):
+        del container[segment]
+        return True
+    return False
+
+
+def get_path(state: Dict[str, Any], path: str) -> Any:
+    """Returns the value at a state path, or None if it does not exist."""
+    value: Any = state
+    for segment in parse_path(path):
+        if isinstance(segment, str) and isinstance(value, dict) and segment in value:
+            value = value[segment]
+        elif isinstance(segment, int) and isinstance(value, list) and segment < len(value):
+            value = value[segment]
+        else:
+            return None
+    return value
+
+
+def compute_state_delta(
+    state: Dict[str, Any],
+    updates: Optional[Dict[str, Any]] = None,
+    remove: Optional[List[str]] = None,
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Applies path updates to a copy of the touched top-level keys only.
+
+    Args:
+        state: Dict -> Current session state (not modified)
+        updates: Dict -> {path: new value}
+        remove: List[str] -> Paths to delete
+
+    Returns:
+        (delta, changed_paths): `delta` maps each top-level key that actually
+        changed to its new value, ready to be used as an ADK state_delta.
+        Removing a path that does not exist changes nothing.
+
+    Raises:
+        ValueError: For malformed paths or list indexes that do not exist
+    """
+    working: Dict[str, Any] = {}
+    changed_paths: List[str] = []
+    operations = [(path, value, False) for path, value in (updates or {}).items()]
+    operations += [(path, None, True) for path in (remove or [])]
+
+    for path, value, is_removal in operations:
+        segments = parse_path(path)
+        top = segments[0]
+        if top not in working:
+            working[top] = copy.deepcopy(state.get(top))
+
+        if len(segments) == 1:
+            # ADK state keys cannot be deleted; removal stores None
+            new_value = None if is_removal else value
+            changed = working[top] != new_value
+            working[top] = new_value
+        elif is_removal:
+            # Never create the parents of a path that is not there
+            container = working[top]
+            for segment in segments[1:-1]:
+                container = _existing_child(container, segment)
+                if container is _MISSING:
+                    break
+            changed = container is not _MISSING and _remove(container, segments[-1], path)
+        else:
+            if working[top] is None:
+                working[top] = {}
+            container = working[top]
+            for segment in segments[1:-1]:
+                container = _child(container, segment, path)
+            changed = _set(container, segments[-1], value, path)
+        if changed:
+            changed_paths.append(path)
+
+    delta = {key: value for key, value in working.items() if value != state.get(key)}
+    return delta, changed_paths
+
+
 def update_session_state(
-    session_id: str,
-    updates: Dict[str, Any]
+    updates: Dict[str, Any],
+    tool_context: ToolContext,
+    remove: Optional[List[str]] = None,
 ) -> Dict[str, Any]:
     """
-    Updates an existing session's state with new data.
-    
+    Updates parts of the session state without rewriting the rest of it.
+
     Args:
-        session_id: str -> The session ID to update
-        updates: Dict -> Key-value pairs to update in the state
-    
+        updates: Dict -> {path: new value}; paths look like "user_profile.weight",
+            "health_report.test_results[3]" or "analysis_results.follow_up_actions[-]"
+            (append to a list)
+        remove: List[str] -> Optional paths to delete
+
     Returns:
-        Dict containing update status and new state
+        Dict with the paths that changed and their new values.
     """
-    
-    # In a real implementation, this would interact with your session service
-    # For now, we'll return a mock response
-    
-    updated_at = datetime.utcnow().isoformat()
-    
+    try:
+        delta, changed_paths = compute_state_delta(tool_context.state.to_dict(), updates, remove)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+
+    # Only top-level keys that changed end up in the event's state_delta
+    for key, value in delta.items():
+        tool_context.state[key] = value
+    if delta:
+        tool_context.state["last_updated"] = datetime.utcnow().isoformat()
     return {
         "status": "success",
-        "session_id": session_id,
-        "updated_at": updated_at,
-        "updates_applied": list(updates.keys()),
-        "message": f"Session {session_id} updated successfully"
+        "changed": {path: updates[path] for path in changed_paths if path in (updates or {})},
+        "removed": [path for path in changed_paths if path in (remove or [])],
+        "not_found": [path for path in (remove or []) if path not in changed_paths],
     }
 
 
-def get_session_info(session_id: str) -> Dict[str, Any]:
+def get_session_info(
+    tool_context: ToolContext,
+    paths: Optional[List[str]] = None,
+) -> Dict[str, Any]:
     """
-    Retrieves information about an existing session.
-    
+    Reads values from the session state.
+
     Args:
-        session_id: str -> The session ID to retrieve
-    
+        paths: List[str] -> Optional state paths to read, e.g. ["user_profile.weight"].
+            Without paths only the top-level keys are listed.
+
     Returns:
-        Dict containing session information
+        Dict with the requested values, or the list of available keys.
     """
-    
-    # In a real implementation, this would query your session service
-    # For now, we'll return a mock response
-    
+    state = tool_context.state.to_dict()
+    if not paths:
+        return {"status": "success", "keys": sorted(state)}
+    try:
+        return {"status": "success", "values": {path: get_path(state, path) for path in paths}}
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+
+
+# ───────────────────────── outside a tool call ─────────────────
+# For code that runs outside the agent loop (background jobs, HTTP
+# handlers). The update is stored as an event carrying only the state
+# delta; if the session is live in this process, it goes through that
+# in-memory session so the connection does not see its session as stale.
+
+async def update_session_state_async(
+    session_service: BaseSessionService,
+    app_name: str,
+    user_id: str,
+    session_id: str,
+    updates: Optional[Dict[str, Any]] = None,
+    remove: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Applies path updates to a stored session.
+
+    Returns:
+        Dict with status, the session id and the changed paths.
+    """
+    session = None
+    if hasattr(session_service, "live_session"):
+        session = session_service.live_session(app_name, user_id, session_id)
+    if session is None:
+        session = await session_service.get_session(
+            app_name=app_name,
+            user_id=user_id,
+            session_id=session_id,
+            config=GetSessionConfig(num_recent_events=1),
+        )
+    if session is None:
+        return {"status": "error", "message": f"Session {session_id} not found"}
+
+    try:
+        delta, changed_paths = compute_state_delta(session.state, updates, remove)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    if delta:
+        delta["last_updated"] = datetime.utcnow().isoformat()
+        event = Event(
+            invocation_id=f"state-{uuid.uuid4()}",
+            author="system",
+            actions=EventActions(state_delta=delta),
+        )
+        await session_service.append_event(session, event)
     return {
         "status": "success",
         "session_id": session_id,
-        "message": f"Session {session_id} information retrieved",
-        "note": "This is a mock response. Implement actual session service integration."
-    } 
\ No newline at end of file
+        "changed": changed_paths,
+        "not_found": [path for path in (remove or []) if path not in changed_paths],
+    }
+
+
+async def get_session_info_async(
+    session_service: BaseSessionService,
+    app_name: str,
+    user_id: str,
+    session_id: str,
+    paths: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Reads a stored session's state, optionally only some paths.
+
+    Returns:
+        Dict with status, session id, last update time and the state or values.
+    """
+    session = await session_service.get_session(
+        app_name=app_name,
+        user_id=user_id,
+        session_id=session_id,
+        config=GetSessionConfig(num_recent_events=1),
+    )
+    if session is None:
+        return {"status": "error", "message": f"Session {session_id} not found"}
+    info = {
+        "status": "success",
+        "session_id": session_id,
+        "last_update_time": session.last_update_time,
+    }
+    if paths:
+        info["values"] = {path: get_path(session.state, path) for path in paths}
+    else:
+        info["state"] = session.state
+    return info
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Test script for the async calendar tools.
+
+Simulates several live sessions relaying 20 ms audio frames on one event
+loop while calendar tool calls are in flight against a Calendar API that
+takes CALENDAR_DELAY_S to answer. A frame's relay latency is how late it
+goes out compared with its schedule. With the synchronous tools every
+calendar call freezes the loop; with the async variants the latency
+should stay where it is without any calendar traffic.
+"""
+
+import sys
+from pathlib import Path
+
+# tools/calendar would shadow the standard library's calendar module
+TOOLS_DIR = Path(__file__).resolve().parent
+sys.path[:] = [p for p in sys.path if Path(p or ".").resolve() != TOOLS_DIR]
+
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import statistics  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+import types  # noqa: E402
+from datetime import datetime, timedelta  # noqa: E402
+from unittest import mock  # noqa: E402
+
+import httplib2  # noqa: E402
+
+# Load the tools as a package without importing the agent graph
+sys.modules.setdefault("manager", types.ModuleType("manager")).__path__ = [str(TOOLS_DIR.parent)]
+from manager.tools.calendar import calendar_utils, event_mirror  # noqa: E402
+from manager.tools.calendar import create_event, create_event_async, list_events, list_events_async  # noqa: E402
+
+SESSIONS = 20
+FRAME_S = 0.02
+DURATION_S = 1.5
+CALENDAR_CALLS = 6
+CALENDAR_DELAY_S = 0.25
+
+
+def fake_calendar_api(self, uri, method="GET", body=None, headers=None, **kwargs):
+    """Stands in for googleapis.com: slow, always successful."""
+    time.sleep(CALENDAR_DELAY_S)
+    if "/events" in uri and method == "POST":
+        payload = {"id": "evt1", "htmlLink": ""}
+    elif "/events" in uri:
+        payload = {"items": [], "nextSyncToken": "token"}
+    else:
+        payload = {"timeZone": "UTC"}
+    return httplib2.Response({"status": "200"}), json.dumps(payload).encode()
+
+
+async def relay_audio(latencies: list) -> None:
+    """One session forwarding a frame every FRAME_S."""
+    start = time.perf_counter()
+    frame = 0
+    while time.perf_counter() - start < DURATION_S:
+        frame += 1
+        due = start + frame * FRAME_S
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        latencies.append((time.perf_counter() - due) * 1000)
+
+
+async def call_calendar(tools) -> None:
+    create, list_ = tools
+    in_flight = []
+    for i in range(CALENDAR_CALLS):
+        await asyncio.sleep(DURATION_S / (CALENDAR_CALLS + 1))
+        if i % 2:
+            result = list_("", 7)
+        else:
+            result = create("Walk", "2030-01-01 07:00", "2030-01-01 07:30")
+        if asyncio.iscoroutine(result):
+            # Like ADK, don't wait for the tool before relaying more audio
+            in_flight.append(asyncio.ensure_future(result))
+    results = await asyncio.gather(*in_flight)
+    assert all(r["status"] == "success" for r in results), results
+
+
+async def run_scenario(tools) -> dict:
+    latencies: list = []
+    tasks = [relay_audio(latencies) for _ in range(SESSIONS)]
+    if tools is not None:
+        tasks.append(call_calendar(tools))
+    await asyncio.gather(*tasks)
+    ordered = sorted(latencies)
+    return {
+        "p50": statistics.median(ordered),
+        "p99": ordered[int(0.99 * (len(ordered) - 1))],
+        "max": ordered[-1],
+    }
+
+
+def test_audio_latency_with_calendar_calls():
+    print("🧪 Testing async calendar tools")
+    print("=" * 50)
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock.patch.object(calendar_utils, "TOKEN_PATH", Path(tmp) / "calendar_token.json"), \
+            mock.patch.object(event_mirror.event_mirror, "db_path", str(Path(tmp) / "calendar_mirror.db")), \
+            mock.patch.object(httplib2.Http, "request", fake_calendar_api):
+        calendar_utils.TOKEN_PATH.write_text(json.dumps({
+            "token": "test-token",
+            "refresh_token": "test-refresh",
+            "client_id": "test.apps.googleusercontent.com",
+            "client_secret": "test-secret",
+            "token_uri": "https://oauth2.googleapis.com/token",
+            "scopes": calendar_utils.SCOPES,
+            "expiry": (datetime.utcnow() + timedelta(hours=1)).isoformat() + "Z",
+        }))
+        try:
+            results = {}
+            for name, tools in (
+                ("no calendar calls", None),
+                ("sync tools", (create_event, list_events)),
+                ("async tools", (create_event_async, list_events_async)),
+            ):
+                results[name] = asyncio.run(run_scenario(tools))
+                r = results[name]
+                print(f"{name:<18} relay latency p50 {r['p50']:6.1f} ms  p99 {r['p99']:6.1f} ms  max {r['max']:6.1f} ms")
+        finally:
+            # Nothing built on the temporary token may outlive the test
+            event_mirror.event_mirror.close()
+            calendar_utils.reset_calendar_service()
+            calendar_utils.invalidate_calendar_timezone()
+
+    baseline = results["no calendar calls"]
+    # Blocking calls hold every session's frames for a whole API round trip
+    assert results["sync tools"]["max"] >= CALENDAR_DELAY_S * 1000 * 0.8, results
+    # Off-loop calls keep the relay flat
+    assert results["async tools"]["max"] < baseline["max"] + 50, results
+    assert results["async tools"]["p99"] < baseline["p99"] + 20, results
+    print("✅ Audio relay latency stays flat while calendar calls are in flight")
+
+
+def test_timeout_returns_error():
+    print("\n⏱️  Testing per-call timeout...")
+    from manager.tools.calendar import async_tools
+
+    def hung_tool(summary: str) -> dict:
+        time.sleep(0.5)
+        return {"status": "success"}
+
+    wrapped = async_tools._async_tool(hung_tool, writes=True)
+    original = async_tools.CALENDAR_CALL_TIMEOUT_S
+    async_tools.CALENDAR_CALL_TIMEOUT_S = 0.1
+    try:
+        result = asyncio.run(wrapped("Walk"))
+    finally:
+        async_tools.CALENDAR_CALL_TIMEOUT_S = original
+    assert result["status"] == "error" and "may still be applied" in result["message"], result
+    assert wrapped.__name__ == "hung_tool"
+    print("✅ Timed-out calls return an error instead of blocking")
+
+
+if __name__ == "__main__":
+    test_audio_latency_with_calendar_calls()
+    test_timeout_returns_error()
+    print("\n🎉 All tests completed successfully!")
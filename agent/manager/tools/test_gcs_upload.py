@@ -3,8 +3,20 @@
 Test script for Google Cloud Storage PDF upload functionality.
 """
 
-import os
-from pdf_creator import pdf_creator_tool
+import sys
+from pathlib import Path
+
+# tools/calendar would shadow the standard library's calendar module
+TOOLS_DIR = Path(__file__).resolve().parent
+sys.path[:] = [p for p in sys.path if Path(p or ".").resolve() != TOOLS_DIR]
+
+import base64  # noqa: E402
+import os  # noqa: E402
+import types  # noqa: E402
+
+# Load the tools as a package without importing the agent graph
+sys.modules.setdefault("manager", types.ModuleType("manager")).__path__ = [str(TOOLS_DIR.parent)]
+from manager.tools.pdf_creator import render_pdf, upload_pdf_to_gcs  # noqa: E402
 
 def test_pdf_upload():
     """Test the PDF creation and upload to Google Cloud Storage."""
@@ -39,8 +51,13 @@ Aim for 2.5 L water daily; include 1 ORS sachet post‑workout if exercising in
     print(f"Location: {sample_user_info['location']}")
     
     try:
-        # Call the PDF creator tool
-        result = pdf_creator_tool(sample_plan, sample_user_info)
+        # Render and upload as the PDF creator tool does (its upload runs in the background)
+        pdf_bytes = render_pdf(sample_plan, sample_user_info)
+        try:
+            result = upload_pdf_to_gcs(pdf_bytes, sample_user_info["name"])
+        except Exception as e:
+            print(f"   Upload error: {str(e)}")
+            result = base64.b64encode(pdf_bytes).decode("utf-8")
         
         # Check if result is a URL (GCS upload successful) or base64 (fallback)
         if result.startswith('http'):
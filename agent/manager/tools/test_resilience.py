@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Test script for the resilience layer (resilience.py).
+
+Checks retries, the circuit breaker and the rate limit on their own, then
+runs the calendar tools against the local Calendar API stand-in while it
+returns errors and quota rejections.
+"""
+
+import sys
+from pathlib import Path
+
+# tools/calendar would shadow the standard library's calendar module
+TOOLS_DIR = Path(__file__).resolve().parent
+sys.path[:] = [p for p in sys.path if Path(p or ".").resolve() != TOOLS_DIR]
+
+import os  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+import types  # noqa: E402
+from unittest import mock  # noqa: E402
+
+# Load the tools as a package without importing the agent graph
+sys.modules.setdefault("manager", types.ModuleType("manager")).__path__ = [str(TOOLS_DIR.parent)]
+from manager.tools import metrics, resilience  # noqa: E402
+from manager.tools.calendar import calendar_utils, event_mirror  # noqa: E402
+from manager.tools.calendar import create_event, list_events  # noqa: E402
+from manager.tools.calendar.fake_calendar_api import shared_fake_api  # noqa: E402
+
+# Budgets read their settings when created, i.e. after resilience.reset()
+FAST_SETTINGS = {"CALENDAR_RETRY_BASE_S": "0.01", "CALENDAR_BREAKER_RESET_S": "0.5"}
+
+
+class FakeHttpError(Exception):
+    """Looks like googleapiclient's HttpError to the classifier."""
+
+    def __init__(self, status: int, reason: str = ""):
+        super().__init__(f"HTTP {status}")
+        self.resp = types.SimpleNamespace(status=status, get=lambda name, default=None: default)
+        self.error_details = [{"reason": reason}] if reason else ""
+
+
+def flaky(failures: list):
+    """A call that raises the queued errors first, then succeeds."""
+    calls = []
+
+    def call():
+        calls.append(1)
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    return call, calls
+
+
+@mock.patch.dict(os.environ, FAST_SETTINGS)
+def test_retries():
+    print("🔁 Testing retries...")
+    resilience.reset()
+    budget = resilience.budget("calendar", "retries")
+
+    call, calls = flaky([FakeHttpError(503), FakeHttpError(429)])
+    assert budget.call(call) == "ok" and len(calls) == 3
+
+    # A 5xx on an insert may have been applied: not retried
+    call, calls = flaky([FakeHttpError(503)])
+    try:
+        budget.call(call, idempotent=False)
+        raise AssertionError("expected the 503")
+    except FakeHttpError:
+        assert len(calls) == 1
+    # ...but a quota rejection was not, so it is
+    call, calls = flaky([FakeHttpError(403, "rateLimitExceeded")])
+    assert budget.call(call, idempotent=False) == "ok" and len(calls) == 2
+
+    # A caller's shorter deadline leaves no time for retries
+    call, calls = flaky([FakeHttpError(503)])
+    try:
+        budget.call(call, deadline_s=0)
+        raise AssertionError("expected the 503")
+    except FakeHttpError:
+        assert len(calls) == 1
+
+    # Client errors are returned at once
+    call, calls = flaky([FakeHttpError(404)])
+    try:
+        budget.call(call)
+        raise AssertionError("expected the 404")
+    except FakeHttpError:
+        assert len(calls) == 1
+    print("✅ Transient errors are retried, inserts only when throttled")
+
+
+@mock.patch.dict(os.environ, FAST_SETTINGS)
+def test_circuit_breaker():
+    print("\n🔌 Testing circuit breaker...")
+    resilience.reset()
+    budget = resilience.budget("calendar", "breaker")
+    failures = [FakeHttpError(503)] * 50
+    call, calls = flaky(failures)
+    for _ in range(3):
+        try:
+            budget.call(call)
+        except (FakeHttpError, resilience.UpstreamUnavailable):
+            pass
+    assert budget.breaker.state == "open", budget.breaker.state
+    made = len(calls)
+    try:
+        budget.call(call)
+        raise AssertionError("expected a fast failure")
+    except resilience.UpstreamUnavailable as e:
+        assert "Google Calendar is temporarily unavailable" in str(e)
+    assert len(calls) == made, "no call may reach the API while the breaker is open"
+
+    time.sleep(0.6)
+    failures.clear()
+    assert budget.call(call) == "ok" and budget.breaker.state == "closed"
+    print(f"✅ Breaker opened after {made} failed calls and closed after a good probe")
+
+
+def test_rate_limit():
+    print("\n🪣 Testing rate limit...")
+    bucket = resilience.TokenBucket(rate=20, burst=5)
+    start = time.perf_counter()
+    for _ in range(15):
+        assert bucket.acquire(max_wait_s=2)[0]
+    elapsed = time.perf_counter() - start
+    assert 0.4 < elapsed < 0.8, elapsed
+    # Callers that would wait longer than they may fail at once
+    empty = resilience.TokenBucket(rate=1, burst=1)
+    empty.acquire()
+    assert not empty.acquire(max_wait_s=0.1)[0]
+    print(f"✅ 15 calls at 20/s with burst 5 took {elapsed:.2f} s")
+
+
+@mock.patch.dict(os.environ, FAST_SETTINGS)
+def test_calendar_tools_under_errors():
+    print("\n📅 Testing calendar tools against a failing API...")
+    # The flags are read at import, maybe by another test: patch the modules
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock.patch.object(calendar_utils, "CALENDAR_FAKE_API", True), \
+            mock.patch.object(event_mirror.event_mirror, "db_path", str(Path(tmp) / "calendar_mirror.db")):
+        # Clients built for another API root must not be reused
+        calendar_utils.reset_calendar_service()
+        try:
+            _calendar_tools_under_errors()
+        finally:
+            event_mirror.event_mirror.close()
+            calendar_utils.reset_calendar_service()
+
+
+def _calendar_tools_under_errors():
+    resilience.reset()
+    metrics.reset()
+    fake = shared_fake_api()
+    fake.reset()
+    # Warm up, so the time zone lookup does not take the injected errors
+    assert create_event("Walk", "2030-01-01 07:00", "2030-01-01 07:30")["status"] == "success"
+
+    fake.fail_next(503, "backendError", times=2)
+    assert list_events("2030-01-01", 7)["status"] == "success"
+
+    fake.fail_next(429, "rateLimitExceeded")
+    result = create_event("Walk", "2030-01-02 07:00", "2030-01-02 07:30")
+    assert result["status"] == "success", result
+
+    fake.fail_next(503, "backendError")
+    result = create_event("Walk", "2030-01-03 07:00", "2030-01-03 07:30")
+    assert result["status"] == "error", result
+    assert fake.stats()["events.insert"] == 4, fake.stats()
+
+    retries = metrics.snapshot()["counters"]["resilience.calendar.retries"]
+    assert retries == 3, retries
+    print(f"✅ {retries} retries turned injected failures into successes; the failed insert was not repeated")
+
+
+if __name__ == "__main__":
+    test_retries()
+    test_circuit_breaker()
+    test_rate_limit()
+    test_calendar_tools_under_errors()
+    print("\n🎉 All tests completed successfully!")
@@ -3,7 +3,31 @@
 Test script for SessionManagerTool functionality.
 """
 
-from session_manager import session_manager_tool, update_session_state, get_session_info
+import sys
+from pathlib import Path
+
+# tools/calendar would shadow the standard library's calendar module
+TOOLS_DIR = Path(__file__).resolve().parent
+sys.path[:] = [p for p in sys.path if Path(p or ".").resolve() != TOOLS_DIR]
+sys.path.append(str(TOOLS_DIR))
+
+import asyncio
+
+from google.adk.agents import LlmAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events.event import Event
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import FunctionTool
+from google.adk.tools.tool_context import ToolContext
+
+from session_manager import (
+    compute_state_delta,
+    get_session_info,
+    get_session_info_async,
+    session_manager_tool,
+    update_session_state,
+    update_session_state_async,
+)
 
 def test_session_creation():
     """Test creating a new session with default state."""
@@ -60,30 +84,163 @@ def test_session_creation():
         else:
             print(f"❌ {section}: Missing")
     
-    # Test 4: Session update (mock)
-    print("\n4. Testing session update...")
+    # Test 4: Partial update of nested paths
+    print("\n4. Testing partial state update...")
     session_id = result['session_id']
     updates = {
         "user_profile.name": "Jane Smith",
+        "user_profile.weight": 64,
+        "health_report.test_results[-]": {"parameter": "Hemoglobin", "value": "13.5"},
         "current_step": "intake_complete",
         "completed_steps": ["session_created", "intake_started"]
     }
-    
-    update_result = update_session_state(session_id, updates)
-    print(f"✅ Update result: {update_result['status']}")
-    print(f"📝 Updates applied: {update_result['updates_applied']}")
-    
-    # Test 5: Session info retrieval (mock)
-    print("\n5. Testing session info retrieval...")
-    info_result = get_session_info(session_id)
+
+    delta, changed = compute_state_delta(state, updates)
+    assert set(delta) == {"user_profile", "health_report", "current_step", "completed_steps"}
+    assert delta["user_profile"]["weight"] == 64 and delta["user_profile"]["age"] is None
+    assert state["user_profile"]["name"] is None, "input state must not be modified"
+    assert changed == list(updates)
+    print(f"✅ Changed top-level keys: {sorted(delta)}")
+
+    updated_state = {**state, **delta}
+    delta, changed = compute_state_delta(updated_state, {
+        "user_profile.name": "Jane Smith",
+        "health_report.test_results[0].value": "14.1",
+    })
+    assert set(delta) == {"health_report"} and changed == ["health_report.test_results[0].value"]
+    print(f"✅ Unchanged values skipped, only {changed} written")
+
+    try:
+        compute_state_delta(updated_state, {"health_report.test_results[5].value": "1"})
+        raise AssertionError("missing list index should be rejected")
+    except ValueError as e:
+        print(f"✅ Invalid path rejected: {e}")
+
+    delta, changed = compute_state_delta(updated_state, remove=[
+        "user_profile.address.city", "medical_history.allergies", "health_report.test_results[7].unit",
+    ])
+    assert delta == {} and changed == [], delta
+    assert "address" not in updated_state["user_profile"]
+    print("✅ Removing missing paths writes nothing")
+
+    # Test 5: Updates and reads through a session service
+    print("\n5. Testing session service integration...")
+    info_result = asyncio.run(_round_trip(state, updates))
     print(f"✅ Info result: {info_result['status']}")
-    print(f"📄 Message: {info_result['message']}")
-    
+    print(f"📄 Values: {info_result['values']}")
+
     print("\n" + "=" * 50)
     print("🎉 All tests completed successfully!")
     
     return result['session_id']
 
+async def _round_trip(state, updates):
+    service = InMemorySessionService()
+    session = await service.create_session(
+        app_name="HealthManagerAgent", user_id="test@example.com", state=state
+    )
+    update_result = await update_session_state_async(
+        service, "HealthManagerAgent", "test@example.com", session.id, updates
+    )
+    assert update_result["status"] == "success", update_result
+    stored = await service.get_session(
+        app_name="HealthManagerAgent", user_id="test@example.com", session_id=session.id
+    )
+    last_delta = stored.events[-1].actions.state_delta
+    assert "analysis_results" not in last_delta, "untouched keys must not be rewritten"
+    print(f"✅ Persisted delta keys: {sorted(last_delta)}")
+
+    events_before = len(stored.events)
+    remove_result = await update_session_state_async(
+        service, "HealthManagerAgent", "test@example.com", session.id,
+        remove=["user_profile.address.city"],
+    )
+    assert remove_result["not_found"] == ["user_profile.address.city"], remove_result
+    stored = await service.get_session(
+        app_name="HealthManagerAgent", user_id="test@example.com", session_id=session.id
+    )
+    assert len(stored.events) == events_before, "a no-op removal must not append an event"
+    assert "address" not in stored.state["user_profile"]
+    print("✅ Missing path reported as not found, session untouched")
+
+    return await get_session_info_async(
+        service, "HealthManagerAgent", "test@example.com", session.id,
+        paths=["user_profile.name", "health_report.test_results[0].parameter"],
+    )
+
+def test_tools_with_tool_context():
+    """Test update_session_state / get_session_info as the agent calls them."""
+    print("\n🧪 Testing state tools through a ToolContext")
+    print("=" * 50)
+    asyncio.run(_tool_round_trip())
+    print("🎉 State tools work through the ADK tool path!")
+
+async def _tool_round_trip():
+    service = InMemorySessionService()
+    state = session_manager_tool(email_id="tool@example.com")["state"]
+    session = await service.create_session(
+        app_name="HealthManagerAgent", user_id="tool@example.com", state=state
+    )
+    invocation = InvocationContext(
+        session_service=service,
+        invocation_id="test-invocation",
+        agent=LlmAgent(name="manager"),
+        session=session,
+    )
+    tool_context = ToolContext(invocation)
+    update_tool = FunctionTool(update_session_state)
+    info_tool = FunctionTool(get_session_info)
+
+    result = await update_tool.run_async(
+        args={
+            "updates": {
+                "user_profile.weight": 64,
+                "user_profile.name": None,
+                "analysis_results.follow_up_actions[-]": "Repeat HbA1c in 3 months",
+            },
+        },
+        tool_context=tool_context,
+    )
+    assert result["status"] == "success", result
+    assert set(result["changed"]) == {
+        "user_profile.weight", "analysis_results.follow_up_actions[-]"
+    }, result
+    delta = tool_context.actions.state_delta
+    assert set(delta) == {"user_profile", "analysis_results", "last_updated"}, delta
+    print(f"✅ state_delta carries only the touched keys: {sorted(delta)}")
+
+    # Reads see the pending delta before it is committed
+    result = await info_tool.run_async(
+        args={"paths": ["user_profile.weight", "analysis_results.follow_up_actions[0]"]},
+        tool_context=tool_context,
+    )
+    assert result["values"] == {
+        "user_profile.weight": 64,
+        "analysis_results.follow_up_actions[0]": "Repeat HbA1c in 3 months",
+    }, result
+    result = await info_tool.run_async(args={}, tool_context=tool_context)
+    assert "user_profile" in result["keys"], result
+    print(f"✅ get_session_info read {len(result['keys'])} keys and nested values")
+
+    result = await update_tool.run_async(
+        args={"updates": {"health_report.test_results[4].value": "1"}},
+        tool_context=tool_context,
+    )
+    assert result["status"] == "error", result
+    print(f"✅ Bad path reported to the model: {result['message']}")
+
+    # The runner commits the delta with the tool's event
+    await service.append_event(
+        session, Event(author="manager", invocation_id="test-invocation", actions=tool_context.actions)
+    )
+    stored = await service.get_session(
+        app_name="HealthManagerAgent", user_id="tool@example.com", session_id=session.id
+    )
+    assert stored.state["user_profile"]["weight"] == 64
+    assert stored.state["user_profile"]["age"] is None, "siblings must survive a path update"
+    print("✅ Committed state keeps untouched fields")
+
 if __name__ == "__main__":
     session_id = test_session_creation()
+    test_tools_with_tool_context()
     print(f"\n📋 Generated Session ID for further testing: {session_id}") 
\ No newline at end of file
@@ -0,0 +1,235 @@
+# ───────────────────────────────────────────────────────────────
+# WriteBehindSessionService – batched persistence of session events
+# Coalesces the many small appends of a live session into few commits
+# ───────────────────────────────────────────────────────────────
+# Wraps a store from session_store.py. append_event updates the
+# in-memory session right away (the agent sees its own events) and
+# queues the event; queued events of a session are written in one
+# transaction when:
+#   • WRITE_BEHIND_MAX_EVENTS events are queued, or
+#   • WRITE_BEHIND_MAX_DELAY_S passed since the first queued event, or
+#   • a turn_complete / interrupted event arrives (awaited, so a
+#     finished turn is on disk before the runner moves on), or
+#   • detach()/close() is called: main.py does that when a WebSocket
+#     closes and on shutdown
+# Reads (get_session / list_sessions) flush the user's queue first.
+# attach()/live_session() let out-of-band state updates
+# (session_manager.update_session_state_async) go through the session
+# object a connection is using instead of a stale copy. Every attach()
+# is paired with a detach(): two connections resuming the same session
+# share its entry, which is dropped only when the last one detaches.
+# Entries no connection is attached to (out-of-band writes) are dropped
+# as soon as their events are written.
+# A failed write keeps the events queued for the next attempt.
+# Metrics: write_behind.queued (gauge), .flushes, .flush_errors,
+#          write_behind.batch_size (summary)
+# ───────────────────────────────────────────────────────────────
+
+from __future__ import annotations
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.events.event import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+
+from . import metrics
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+WRITE_BEHIND_MAX_EVENTS = int(os.getenv("WRITE_BEHIND_MAX_EVENTS", "20"))
+WRITE_BEHIND_MAX_DELAY_S = float(os.getenv("WRITE_BEHIND_MAX_DELAY_S", "1.0"))
+
+SessionKey = Tuple[str, str, str]
+
+
+class _PendingWrites:
+    """Events of one session waiting to be written."""
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.events: List[Event] = []
+        self.lock = asyncio.Lock()
+        self.timer: Optional[asyncio.Task] = None
+        # Sessions of the connections attached to this entry, oldest first
+        self.connections: List[Session] = []
+
+
+class WriteBehindSessionService(BaseSessionService):
+    """Session service that batches event writes to an underlying store."""
+
+    def __init__(
+        self,
+        store: BaseSessionService,
+        max_events: int = WRITE_BEHIND_MAX_EVENTS,
+        max_delay_s: float = WRITE_BEHIND_MAX_DELAY_S,
+    ):
+        self.store = store
+        self.max_events = max_events
+        self.max_delay_s = max_delay_s
+        self._pending: Dict[SessionKey, _PendingWrites] = {}
+
+    @staticmethod
+    def _key(app_name: str, user_id: str, session_id: str) -> SessionKey:
+        return (app_name, user_id, session_id)
+
+    def _update_gauge(self) -> None:
+        metrics.set_gauge("write_behind.queued", sum(len(p.events) for p in self._pending.values()))
+
+    # ───────────── reads and lifecycle go straight to the store ─────────────
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        return await self.store.create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        await self.flush_session(self._key(app_name, user_id, session_id))
+        return await self.store.get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        await self.flush(app_name=app_name, user_id=user_id)
+        return await self.store.list_sessions(app_name=app_name, user_id=user_id)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        pending = self._pending.pop(self._key(app_name, user_id, session_id), None)
+        if pending and pending.timer:
+            pending.timer.cancel()
+        self._update_gauge()
+        await self.store.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+
+    def attach(self, session: Session) -> None:
+        """Registers a session a connection is about to run, see live_session."""
+        key = self._key(session.app_name, session.user_id, session.id)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = _PendingWrites(session)
+        pending.session = session
+        pending.connections.append(session)
+
+    async def detach(self, session: Session) -> None:
+        """
+        Flushes and unregisters a session attached by a connection that closed.
+
+        The entry stays while other connections are attached to the same session.
+        """
+        key = self._key(session.app_name, session.user_id, session.id)
+        pending = self._pending.get(key)
+        if pending is None:
+            return
+        if any(attached is session for attached in pending.connections):
+            pending.connections = [attached for attached in pending.connections if attached is not session]
+            if pending.session is session and pending.connections:
+                pending.session = pending.connections[-1]
+        await self.flush_session(key)
+
+    def live_session(self, app_name: str, user_id: str, session_id: str) -> Optional[Session]:
+        """The in-memory session of a connection on this worker, if there is one."""
+        pending = self._pending.get(self._key(app_name, user_id, session_id))
+        return pending.session if pending else None
+
+    # ───────────────────────────── writes ─────────────────────────────
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        # The agent reads its own events back from the in-memory session
+        await super().append_event(session=session, event=event)
+
+        key = self._key(session.app_name, session.user_id, session.id)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = _PendingWrites(session)
+        pending.session = session
+        pending.events.append(event)
+        self._update_gauge()
+
+        if event.turn_complete or event.interrupted or len(pending.events) >= self.max_events:
+            await self.flush_session(key)
+        elif pending.timer is None or pending.timer.done():
+            pending.timer = asyncio.create_task(self._flush_later(key))
+        return event
+
+    def _drop_if_unused(self, key: SessionKey, pending: _PendingWrites) -> None:
+        # Nothing queued and no connection attached; forget the entry
+        if (
+            self._pending.get(key) is pending
+            and not pending.connections
+            and not pending.events
+            and not pending.lock.locked()
+        ):
+            del self._pending[key]
+
+    async def _flush_later(self, key: SessionKey) -> None:
+        await asyncio.sleep(self.max_delay_s)
+        pending = self._pending.get(key)
+        if pending is not None:
+            # Not cancelled from here on: flush_session must not cancel itself
+            pending.timer = None
+        await self.flush_session(key)
+
+    async def flush_session(self, key: SessionKey) -> None:
+        """Writes the queued events of one session in a single transaction."""
+        pending = self._pending.get(key)
+        if pending is None:
+            return
+        if pending.timer is not None:
+            pending.timer.cancel()
+            pending.timer = None
+        async with pending.lock:
+            events, pending.events = pending.events, []
+            if events:
+                try:
+                    await self.store.persist_events(pending.session, events)
+                except Exception as e:
+                    # Keep them queued; the next trigger or close() retries
+                    pending.events[:0] = events
+                    metrics.incr("write_behind.flush_errors")
+                    print(f"Write-behind flush failed for session {key[2]}: {e}")
+                    if not pending.connections and (pending.timer is None or pending.timer.done()):
+                        # No connection will append again to trigger the retry
+                        pending.timer = asyncio.create_task(self._flush_later(key))
+                    return
+                finally:
+                    self._update_gauge()
+                metrics.incr("write_behind.flushes")
+                metrics.observe("write_behind.batch_size", len(events))
+        self._drop_if_unused(key, pending)
+
+    async def flush(self, app_name: Optional[str] = None, user_id: Optional[str] = None) -> None:
+        """Flushes every queued session, optionally only those of one app/user."""
+        keys = [
+            key for key in list(self._pending)
+            if (app_name is None or key[0] == app_name) and (user_id is None or key[1] == user_id)
+        ]
+        await asyncio.gather(*(self.flush_session(key) for key in keys))
+
+    async def close(self) -> None:
+        await self.flush()
+        for pending in self._pending.values():
+            if pending.timer is not None:
+                pending.timer.cancel()
+        self._pending.clear()
+        if hasattr(self.store, "close"):
+            await self.store.close()
+
+
+def with_write_behind(store: BaseSessionService) -> BaseSessionService:
+    """Wraps `store` unless write-behind is disabled or the store cannot batch."""
+    if not WRITE_BEHIND_ENABLED or not hasattr(store, "persist_events"):
+        return store
+    return WriteBehindSessionService(store)